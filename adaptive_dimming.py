@@ -0,0 +1,247 @@
+import time
+import importlib.util
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QImage
+from PyQt5.QtWidgets import QApplication
+
+# NumPy在第一次采样时才导入，避免拖慢启动
+np = None
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+# 采样参数的上下限，保证CPU占用低于1%
+MIN_SAMPLE_INTERVAL_MS = 2000
+DEFAULT_SAMPLE_INTERVAL_MS = 5000
+MAX_SAMPLE_INTERVAL_MS = 60000
+SAMPLE_WIDTH = 64
+SAMPLE_HEIGHT = 36
+CPU_BUDGET = 0.01
+
+# 使用电池时采样间隔放大的倍数
+POWER_SAVING_INTERVAL_FACTOR = 4
+
+# 调节参数
+DEFAULT_TARGET_LUMINANCE = 0.45  # 目标感知亮度（0-1）
+DEFAULT_HYSTERESIS = 4  # 与当前亮度相差小于该值时不调节
+MAX_STEP = 8  # 每次采样最多调节的亮度
+PERCENTILE = 90
+
+# sRGB亮度系数
+LUMA_WEIGHTS = (0.2126, 0.7152, 0.0722)
+
+
+def load_numpy():
+    """导入NumPy（只在第一次调用时真正导入）"""
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def image_to_rgb_array(image):
+    """将QImage转换为 (h, w, 3) 的RGB浮点数组（0-1）"""
+    image = image.convertToFormat(QImage.Format_RGB32)
+    width, height = image.width(), image.height()
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    # Format_RGB32在内存中按BGRA排列
+    data = np.frombuffer(ptr, np.uint8).reshape(height, image.bytesPerLine() // 4, 4)
+    return data[:, :width, 2::-1].astype(np.float32) / 255.0
+
+
+def grab_sample(screen):
+    """抓取屏幕内容的缩小采样，返回 (SAMPLE_HEIGHT, SAMPLE_WIDTH, 3) 的RGB数组，无法抓取时返回None
+
+    不抓取整个屏幕：只读取均匀分布的SAMPLE_HEIGHT行（每行1像素高）并缩小到SAMPLE_WIDTH，
+    从窗口系统复制的像素数只有全屏的SAMPLE_HEIGHT/高度。
+    """
+    size = screen.geometry().size()
+    width, height = size.width(), size.height()
+    if width <= 0 or height <= 0:
+        return None
+    rows = []
+    for row in range(SAMPLE_HEIGHT):
+        y = (2 * row + 1) * height // (2 * SAMPLE_HEIGHT)
+        pixmap = screen.grabWindow(0, 0, y, width, 1)
+        if pixmap.isNull():
+            return None
+        image = pixmap.toImage().scaled(SAMPLE_WIDTH, 1, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+        rows.append(image_to_rgb_array(image))
+    return np.concatenate(rows)
+
+
+def remove_overlay(rgb, overlay_rgba):
+    """从截图中去除遮罩的影响，还原遮罩下方的真实内容
+
+    遮罩按SourceOver合成：截图 = 内容 × (1 - a) + 颜色 × a
+    """
+    alpha = overlay_rgba[3] / 255.0
+    if alpha <= 0:
+        return rgb
+    if alpha >= 0.99:
+        # 遮罩几乎不透明，无法还原
+        return None
+    color = np.array(overlay_rgba[:3], dtype=np.float32) / 255.0
+    return np.clip((rgb - color * alpha) / (1.0 - alpha), 0.0, 1.0)
+
+
+def luminance_stats(rgb):
+    """返回 (平均亮度, 百分位亮度)"""
+    luma = rgb @ np.array(LUMA_WEIGHTS, dtype=np.float32)
+    return float(luma.mean()), float(np.percentile(luma, PERCENTILE))
+
+
+class AdaptiveDimmer(QObject):
+    """根据屏幕内容自动调节亮度
+
+    定期抓取每个屏幕上均匀分布的几十行像素并缩小到很小的尺寸，计算平均亮度和百分位亮度，
+    让感知亮度（内容亮度 × 遮罩亮度）趋近目标值：白色文档调暗，深色IDE调亮。
+    """
+
+    # 建议的新亮度，由调用方应用（通常经由亮度滑动条同步界面）
+    level_suggested = pyqtSignal(int)
+
+    def __init__(self, brightness_control, interval=DEFAULT_SAMPLE_INTERVAL_MS,
+                 target=DEFAULT_TARGET_LUMINANCE, hysteresis=DEFAULT_HYSTERESIS,
+                 min_level=30, max_level=100, parent=None):
+        super(AdaptiveDimmer, self).__init__(parent)
+        self.brightness_control = brightness_control
+        self.base_interval = max(MIN_SAMPLE_INTERVAL_MS, min(MAX_SAMPLE_INTERVAL_MS, interval))
+        self.target = target
+        self.hysteresis = hysteresis
+        self.min_level = min_level
+        self.max_level = max_level
+
+        # 开销统计
+        self.samples = 0
+        self.adjustments = 0
+        self.total_cost = 0.0  # 采样消耗的CPU时间（秒）
+        self.last_cost = 0.0
+        self.last_luminance = None
+        self._enabled_since = None
+        self._enabled_time = 0.0
+        self._resume_enabled = False
+        self.power_saving = False
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.base_interval)
+        self.timer.timeout.connect(self.sample)
+
+    @property
+    def available(self):
+        """缺少NumPy时不可用"""
+        return NUMPY_AVAILABLE
+
+    def set_enabled(self, enabled):
+        if enabled and self.available:
+            if not self.timer.isActive():
+                self._enabled_since = time.monotonic()
+                self.timer.start()
+        else:
+            if self.timer.isActive():
+                self._enabled_time += time.monotonic() - self._enabled_since
+                self._enabled_since = None
+            self.timer.stop()
+
+    def set_suspended(self, suspended):
+        """屏幕休眠或会话锁定时暂停采样，恢复时回到原来的启用状态"""
+        if suspended:
+            self._resume_enabled = self.timer.isActive()
+            self.set_enabled(False)
+        elif self._resume_enabled:
+            self._resume_enabled = False
+            self.set_enabled(True)
+
+    def set_power_saving(self, enabled):
+        """使用电池时按POWER_SAVING_INTERVAL_FACTOR放大采样间隔"""
+        self.power_saving = enabled
+        self._enforce_budget()
+
+    def min_interval(self):
+        """当前允许的最短采样间隔"""
+        if self.power_saving:
+            return min(MAX_SAMPLE_INTERVAL_MS, self.base_interval * POWER_SAVING_INTERVAL_FACTOR)
+        return self.base_interval
+
+    def cpu_fraction(self):
+        """启用期间采样占用的CPU比例"""
+        elapsed = self._enabled_time
+        if self._enabled_since is not None:
+            elapsed += time.monotonic() - self._enabled_since
+        return self.total_cost / elapsed if elapsed > 0 else 0.0
+
+    def cost_report(self):
+        """开销统计，用于诊断"""
+        return {
+            "samples": self.samples,
+            "adjustments": self.adjustments,
+            "interval_ms": self.timer.interval(),
+            "last_cost_ms": self.last_cost * 1000.0,
+            "avg_cost_ms": self.total_cost * 1000.0 / self.samples if self.samples else 0.0,
+            "cpu_fraction": self.cpu_fraction(),
+        }
+
+    def measure(self):
+        """测量所有屏幕去除遮罩影响后的内容亮度，无法测量时返回None"""
+        state = self.brightness_control.current_state
+        if state.areas:
+            # 区域模式下只调节局部，不自动调节
+            return None
+
+        weighted_mean = weighted_percentile = 0.0
+        total_weight = 0
+        for index, screen in enumerate(QApplication.screens()):
+            overlay_rgba = self.brightness_control.overlay_fill(index)
+            rgb = grab_sample(screen)
+            if rgb is None:
+                continue
+            rgb = remove_overlay(rgb, overlay_rgba)
+            if rgb is None:
+                continue
+
+            mean, percentile = luminance_stats(rgb)
+            weight = screen.geometry().width() * screen.geometry().height()
+            weighted_mean += mean * weight
+            weighted_percentile += percentile * weight
+            total_weight += weight
+
+        if not total_weight:
+            return None
+        return weighted_mean / total_weight, weighted_percentile / total_weight
+
+    def sample(self):
+        """采样一次并在需要时调节亮度
+
+        开销按本线程的CPU时间计算，不包括使用记录、硬件后端等其他线程的工作。
+        """
+        start = time.thread_time()
+        load_numpy()
+        measured = self.measure()
+        if measured is not None:
+            mean, percentile = measured
+            self.last_luminance = measured
+            # 亮部区域对眩光的影响更大，兼顾平均亮度和高百分位亮度
+            content = max(0.02, 0.5 * mean + 0.5 * percentile)
+            self.nudge(self.target / content * 100.0)
+
+        self.last_cost = time.thread_time() - start
+        self.total_cost += self.last_cost
+        self.samples += 1
+        self._enforce_budget()
+
+    def nudge(self, desired):
+        """以限定步长向期望亮度靠近，差值小于滞回阈值时不动作"""
+        current = self.brightness_control.current_state.level
+        desired = max(self.min_level, min(self.max_level, int(round(desired))))
+        if abs(desired - current) < self.hysteresis:
+            return
+        step = max(-MAX_STEP, min(MAX_STEP, desired - current))
+        self.adjustments += 1
+        self.level_suggested.emit(current + step)
+
+    def _enforce_budget(self):
+        """单次采样开销过大时拉长采样间隔，保证CPU占用低于预算"""
+        required = int(self.last_cost * 1000.0 / CPU_BUDGET)
+        interval = max(self.min_interval(), min(MAX_SAMPLE_INTERVAL_MS, required))
+        if interval != self.timer.interval():
+            self.timer.setInterval(interval)
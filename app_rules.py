@@ -0,0 +1,295 @@
+import re
+import json
+from collections import namedtuple, OrderedDict
+from PyQt5.QtCore import QObject, pyqtSignal
+from brightness_control import temperature_tint
+from presets import VALID_MODES
+from x11_connection import X11Connection
+
+# 正则规则的前缀，其余规则按窗口类名精确匹配（不区分大小写）
+REGEX_PREFIX = "re:"
+
+# 匹配结果缓存的条目数
+MATCH_CACHE_SIZE = 256
+
+# 窗口类名缓存的条目数（窗口销毁时也会移除）
+WINDOW_CLASS_CACHE_SIZE = 64
+
+
+class ActiveWindowProvider(QObject):
+    """活动窗口变化的提供者基类
+
+    active_app_changed在焦点切换到另一个应用时发出，参数为窗口类名列表
+    （X11下为WM_CLASS的实例名和类名）。
+    """
+
+    active_app_changed = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super(ActiveWindowProvider, self).__init__(parent)
+        self.active_app = None
+
+    def _publish(self, app):
+        if app != self.active_app:
+            self.active_app = app
+            self.active_app_changed.emit(list(app))
+
+    def close(self):
+        pass
+
+
+class FakeActiveWindowProvider(ActiveWindowProvider):
+    """用于测试的活动窗口提供者，通过activate()模拟焦点切换"""
+
+    def activate(self, *app_classes):
+        self._publish(tuple(app_classes))
+
+
+class X11ActiveWindowProvider(ActiveWindowProvider):
+    """监听根窗口 _NET_ACTIVE_WINDOW 属性的PropertyNotify事件，不轮询
+
+    读到的WM_CLASS按窗口ID缓存，窗口销毁（DestroyNotify）时移除，避免窗口ID被复用后得到旧的类名。
+    """
+
+    def __init__(self, connection, parent=None):
+        super(X11ActiveWindowProvider, self).__init__(parent)
+        from Xlib import X
+
+        self.connection = connection
+        self.atom_active_window = connection.atom("_NET_ACTIVE_WINDOW")
+        self._active_window = None
+        self._class_by_window = OrderedDict()  # 窗口ID -> WM_CLASS
+
+        connection.add_handler(X.PropertyNotify, self._on_property)
+        connection.add_handler(X.DestroyNotify, self._on_destroy)
+        connection.select_root_events(X.PropertyChangeMask)
+        self._read_active_window()
+
+    def _read_active_window(self):
+        from Xlib import X
+
+        root = self.connection.root
+        prop = root.get_full_property(self.atom_active_window, X.AnyPropertyType)
+        window_id = prop.value[0] if prop is not None and len(prop.value) else 0
+        if window_id == self._active_window:
+            return
+        self._active_window = window_id
+        if not window_id:
+            self._publish(())
+            return
+
+        wm_class = self._class_by_window.get(window_id)
+        if wm_class is None:
+            wm_class = self._read_class(window_id)
+        else:
+            self._class_by_window.move_to_end(window_id)
+        self._publish(wm_class)
+
+    def _read_class(self, window_id):
+        """读取WM_CLASS，并监听窗口的销毁以便移除缓存"""
+        from Xlib import X
+
+        try:
+            window = self.connection.display.create_resource_object("window", window_id)
+            wm_class = tuple(window.get_wm_class() or ())
+            # 在已有的事件掩码上追加，不影响共享连接上其他模块对该窗口的监听
+            mask = window.get_attributes().your_event_mask
+            if not mask & X.StructureNotifyMask:
+                window.change_attributes(event_mask=mask | X.StructureNotifyMask)
+        except Exception:
+            # 窗口已经销毁，不缓存
+            return ()
+        self._class_by_window[window_id] = wm_class
+        if len(self._class_by_window) > WINDOW_CLASS_CACHE_SIZE:
+            self._class_by_window.popitem(last=False)
+        return wm_class
+
+    def _on_property(self, event):
+        if event.window.id == self.connection.root.id and event.atom == self.atom_active_window:
+            self._read_active_window()
+
+    def _on_destroy(self, event):
+        self._class_by_window.pop(event.window.id, None)
+
+    def close(self):
+        from Xlib import X
+
+        self.connection.remove_handler(X.PropertyNotify, self._on_property)
+        self.connection.remove_handler(X.DestroyNotify, self._on_destroy)
+
+
+def create_active_window_provider(connection=None):
+    """创建当前平台的活动窗口提供者，不支持时返回None"""
+    connection = connection or X11Connection.instance()
+    if connection is None:
+        return None
+    try:
+        return X11ActiveWindowProvider(connection)
+    except Exception:
+        return None
+
+
+def compile_match(match):
+    """编译正则规则（不区分大小写），精确类名规则返回None；正则无效时抛出ValueError"""
+    if not match.startswith(REGEX_PREFIX):
+        return None
+    try:
+        return re.compile(match[len(REGEX_PREFIX):], re.IGNORECASE)
+    except re.error as exc:
+        raise ValueError(f"无效的正则表达式 {match!r}: {exc}")
+
+
+class AppRule(namedtuple("AppRule", ["match", "preset", "changes", "pattern"])):
+    """应用规则
+
+    match: 窗口类名，或以 "re:" 开头的正则表达式
+    preset: 要应用的预设名称，None表示使用changes
+    changes: 渲染状态的字段修改（由level/mode/temperature编译而来）
+    pattern: 编译后的正则表达式，精确类名规则为None
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data):
+        """从JSON字典创建规则，例如 {"match": "mpv", "level": 100}，无效时抛出ValueError"""
+        match = str(data.get("match", "")).strip()
+        if not match:
+            raise ValueError("规则缺少match")
+        pattern = compile_match(match)
+
+        preset = data.get("preset")
+        changes = {}
+        if data.get("level") is not None:
+            changes["level"] = max(0, min(100, int(data["level"])))
+        if data.get("mode") is not None:
+            if data["mode"] not in VALID_MODES:
+                raise ValueError(f"未知的模式: {data['mode']}")
+            changes["mode"] = data["mode"]
+        if data.get("temperature") is not None:
+            changes["tint"] = temperature_tint(int(data["temperature"]))
+        if preset is None and not changes:
+            raise ValueError("规则没有指定任何效果")
+        return cls(match, preset, changes, pattern)
+
+
+class RuleMatcher:
+    """编译后的规则匹配器
+
+    靠前的规则优先。精确类名规则放入字典（类名 -> 第一条规则的序号），
+    正则规则各自编译（用户的分组和反向引用保持不变），只需尝试排在命中的精确规则之前的正则规则。
+    匹配结果按类名缓存，重复切换到同一应用时的查找为常数时间。
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._exact = {}
+        self._patterns = []  # [(规则序号, 编译后的正则), ...]，按规则顺序
+        for index, rule in enumerate(self.rules):
+            pattern = rule.pattern or compile_match(rule.match)
+            if pattern is not None:
+                self._patterns.append((index, pattern))
+            else:
+                self._exact.setdefault(rule.match.lower(), index)
+        self._cache = OrderedDict()
+
+    def match(self, app_classes):
+        """返回第一个匹配的规则，没有匹配时返回None"""
+        key = tuple(app_classes)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        exact = [self._exact[name.lower()] for name in key if name.lower() in self._exact]
+        index = min(exact) if exact else None
+        for pattern_index, pattern in self._patterns:
+            if index is not None and pattern_index > index:
+                break
+            if any(pattern.fullmatch(name) for name in key):
+                index = pattern_index
+                break
+
+        rule = self.rules[index] if index is not None else None
+        self._cache[key] = rule
+        if len(self._cache) > MATCH_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return rule
+
+
+def load_rules(settings):
+    """从QSettings的"app_rules"键读取规则，忽略无效条目"""
+    try:
+        entries = json.loads(settings.value("app_rules", "[]", type=str) or "[]")
+    except ValueError:
+        return []
+
+    rules = []
+    for entry in entries:
+        try:
+            rules.append(AppRule.from_dict(entry))
+        except (ValueError, TypeError, AttributeError):
+            continue
+    return rules
+
+
+class AppRuleEngine(QObject):
+    """焦点切换到有规则的应用时自动应用对应亮度，离开后恢复原来的状态
+
+    规则生效期间用户手动修改的字段不会在离开时被恢复：这些字段的新值并入原来的状态，
+    离开时保持用户的修改，只恢复规则改动且用户没有再修改的字段。
+    """
+
+    def __init__(self, provider, matcher, brightness_control, apply_state, presets=None, parent=None):
+        """
+        Args:
+            provider: ActiveWindowProvider
+            matcher: RuleMatcher
+            apply_state: 应用完整渲染状态的函数（通常同时同步界面）
+            presets: PresetManager，用于解析引用预设的规则
+        """
+        super(AppRuleEngine, self).__init__(parent)
+        self.provider = provider
+        self.matcher = matcher
+        self.brightness_control = brightness_control
+        self.apply_state = apply_state
+        self.presets = presets
+        self.active_rule = None
+        self.base_state = None  # 应用规则前的状态
+        self.applied_state = None  # 规则应用的状态，用于识别用户之后的手动修改
+        self.focus_changes = 0
+        provider.active_app_changed.connect(self.on_active_app_changed)
+
+    def on_active_app_changed(self, app_classes):
+        self.focus_changes += 1
+        rule = self.matcher.match(app_classes)
+        if rule is self.active_rule:
+            return
+
+        if self.active_rule is None:
+            self.base_state = self.brightness_control.current_state
+        else:
+            self.base_state = self._base_with_user_changes()
+
+        if rule is None:
+            state = self.base_state
+        elif rule.preset is not None and self.presets is not None:
+            state = self.presets.resolve(rule.preset, self.base_state)
+            if state is None:
+                return
+            if rule.changes:
+                state = state._replace(**rule.changes)
+        else:
+            state = self.base_state._replace(**rule.changes)
+
+        self.active_rule = rule
+        self.applied_state = state if rule is not None else None
+        self.apply_state(state)
+
+    def _base_with_user_changes(self):
+        """把规则生效期间用户手动修改的字段并入规则前的状态"""
+        current = self.brightness_control.current_state
+        changes = {field: getattr(current, field) for field in current._fields
+                   if getattr(current, field) != getattr(self.applied_state, field)}
+        return self.base_state._replace(**changes)
+
+    def close(self):
+        self.provider.close()
@@ -0,0 +1,157 @@
+"""输入到绘制完成的延迟基准
+
+沿真实的信号路径调节亮度：
+    brightness_slider.valueChanged → BrightnessControl.set_brightness → BrightnessOverlay.paintEvent
+记录每一步的时间，并读取遮罩绘制的像素确认新的透明度，最后输出p50/p99延迟。
+
+默认使用offscreen平台，也可以在Xvfb下运行：
+    python benchmarks/latency.py [--samples 200] [--source main|floating] [--span] [--budget-p99 毫秒]
+    QT_QPA_PLATFORM=xcb xvfb-run python benchmarks/latency.py
+"""
+import os
+import sys
+import math
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import Qt, QPoint
+from PyQt5.QtGui import QImage, QRegion
+from PyQt5.QtWidgets import QApplication
+from brightness_control import BrightnessControl
+from main_window import MainWindow
+from floating_button import FloatingButton
+
+# 等待绘制完成的超时时间（秒）
+PAINT_TIMEOUT = 1.0
+
+# 默认的p99预算：60Hz下的一帧
+DEFAULT_BUDGET_P99_MS = 16.7
+
+
+def percentile(values, p):
+    """最近秩法计算百分位数"""
+    ordered = sorted(values)
+    index = max(0, math.ceil(p / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class LatencyProbe:
+    """驱动亮度滑动条并测量每次变化到遮罩绘制完成的延迟"""
+
+    def __init__(self, app, source="main", span_screens=False):
+        self.app = app
+        self.brightness_control = BrightnessControl(span_screens=span_screens)
+        self.main_window = MainWindow()
+        self.main_window.set_brightness_control(self.brightness_control)
+        # 与main.BrightnessApp.connect_signals中的连接相同
+        self.main_window.brightness_slider.valueChanged.connect(self.brightness_control.set_brightness)
+
+        if source == "floating":
+            floating_button = FloatingButton(parent=self.main_window, brightness_control=self.brightness_control)
+            self.set_value = floating_button.set_brightness
+        else:
+            self.set_value = self.main_window.brightness_slider.setValue
+
+        self.overlay = self.brightness_control._overlay[0]
+        self.verified = 0
+
+    def wait_for_paint(self, since):
+        """处理事件直到遮罩在since之后完成绘制，返回绘制完成的时间"""
+        deadline = since + PAINT_TIMEOUT
+        while time.perf_counter() < deadline:
+            self.app.processEvents()
+            if self.overlay.last_paint_time is not None and self.overlay.last_paint_time > since:
+                return self.overlay.last_paint_time
+        raise TimeoutError("遮罩在超时时间内没有重绘")
+
+    def painted_alpha(self):
+        """读取遮罩左上角像素的透明度
+
+        从屏幕抓取窗口（grabWindow）在offscreen等平台上不保留透明通道，这里让遮罩把自己
+        绘制到带透明通道的QImage中；透明度模式的遮罩是不透明的，透明度由窗口透明度决定。
+        """
+        if self.overlay.opacity_mode:
+            return round(self.overlay.windowOpacity() * 255)
+        image = QImage(1, 1, QImage.Format_ARGB32)
+        image.fill(Qt.transparent)
+        # 抓取时的绘制不计入遮罩的绘制统计
+        paint_count, last_paint_time = self.overlay.paint_count, self.overlay.last_paint_time
+        self.overlay.render(image, QPoint(), QRegion(0, 0, 1, 1))
+        self.overlay.paint_count, self.overlay.last_paint_time = paint_count, last_paint_time
+        return image.pixelColor(0, 0).alpha()
+
+    def sample(self, value):
+        """
+        Returns:
+            (提交耗时, 输入到绘制完成, 输入到确认) 单位毫秒
+        """
+        start = time.perf_counter()
+        self.set_value(value)
+        committed = time.perf_counter()
+        painted = self.wait_for_paint(start)
+
+        expected = self.overlay.compiled.rgba[3]
+        alpha = self.painted_alpha()
+        if abs(alpha - expected) > 1:
+            raise AssertionError(f"亮度{value}: 绘制的透明度为{alpha}，应为{expected}")
+        self.verified += 1
+        verified = time.perf_counter()
+
+        return ((committed - start) * 1000.0, (painted - start) * 1000.0, (verified - start) * 1000.0)
+
+    def run(self, samples):
+        # 先显示遮罩并完成第一次绘制
+        start = time.perf_counter()
+        self.main_window.brightness_slider.setValue(50)
+        self.brightness_control.set_brightness(50)
+        self.wait_for_paint(start)
+
+        results = []
+        for i in range(samples):
+            # 在30-90之间以步长7循环取值，相邻两次一定不同，遮罩保持可见且每次都需要重绘
+            value = 30 + (i * 7 + 1) % 61
+            results.append(self.sample(value))
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="亮度调节输入到绘制完成的延迟基准")
+    parser.add_argument("--samples", type=int, default=200, help="采样次数")
+    parser.add_argument("--source", choices=("main", "floating"), default="main",
+                        help="驱动主窗口滑动条或悬浮窗滑动条")
+    parser.add_argument("--span", action="store_true", help="使用覆盖所有屏幕的单个遮罩")
+    parser.add_argument("--budget-p99", type=float, default=DEFAULT_BUDGET_P99_MS,
+                        help="输入到绘制完成的p99预算（毫秒）")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    probe = LatencyProbe(app, args.source, args.span)
+    results = probe.run(args.samples)
+    stats = probe.brightness_control.overlay_stats()
+    probe.brightness_control.cleanup()
+
+    print(f"平台: {app.platformName()}, 采样: {args.samples}, 来源: {args.source}")
+    print(f"遮罩模式: {stats['mode']}, 窗口: {stats['windows']}, 定时器: {stats['timers']}, "
+          f"重绘: {stats['repaints']}")
+    for label, column in (("提交", 0), ("输入到绘制", 1), ("输入到确认", 2)):
+        values = [r[column] for r in results]
+        print(f"{label:<8} p50 {percentile(values, 50):7.3f}ms  p99 {percentile(values, 99):7.3f}ms  "
+              f"max {max(values):7.3f}ms")
+    print(f"确认绘制: {probe.verified}/{args.samples}")
+    if not probe.verified:
+        print("没有任何采样确认了绘制的透明度", file=sys.stderr)
+        return 1
+
+    p99 = percentile([r[1] for r in results], 99)
+    if p99 > args.budget_p99:
+        print(f"输入到绘制的p99 {p99:.3f}ms 超出预算 {args.budget_p99}ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
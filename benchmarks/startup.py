@@ -0,0 +1,129 @@
+"""启动性能基准
+
+1. 以 python -X importtime 导入main模块，按累计耗时列出最慢的导入
+2. 多次启动程序直到托盘图标出现，统计耗时并与预算比较，超出预算时返回非零退出码
+3. 使用 --daemon 时同样启动无界面的遮罩守护进程，对比启动耗时和常驻内存
+
+用法（需先退出正在运行的实例）：
+    python benchmarks/startup.py [--runs 5] [--top 15] [--budget 毫秒] [--daemon]
+"""
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+PROBE_LINE = re.compile(r"time_to_tray_ms=([\d.]+) budget_ms=(\d+)")
+DAEMON_LINE = re.compile(r"time_to_ready_ms=([\d.]+)")
+RSS_LINE = re.compile(r"rss_kb=(\d+)")
+MEMORY_LINE = re.compile(r"overlay_memory screen=(\d+) mode=(\w+) surface_bytes=(\d+) saved_bytes=(-?\d+)")
+
+
+def import_times(module="main"):
+    """导入指定模块并解析 -X importtime 的输出
+
+    Returns:
+        [(模块名, 自身耗时us, 累计耗时us, 嵌套层级), ...]
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def probe(script):
+    """以探测模式启动一次程序，返回其标准输出"""
+    result = subprocess.run(
+        [sys.executable, script],
+        cwd=ROOT, env=dict(os.environ, BRIGHTNESS_STARTUP_PROBE="1"),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=60,
+    )
+    if not RSS_LINE.search(result.stdout):
+        raise RuntimeError(f"未能读取{script}的启动耗时: {result.stderr.strip()}")
+    return result.stdout
+
+
+def time_to_tray(runs):
+    """启动程序若干次
+
+    Returns:
+        (每次启动到托盘图标出现的耗时, 程序配置的预算, 最后一次启动时各屏幕遮罩的内存占用,
+         每次启动的常驻内存KB)
+    """
+    samples, budget, memory, rss = [], None, [], []
+    for _ in range(runs):
+        output = probe("main.py")
+        match = PROBE_LINE.search(output)
+        samples.append(float(match.group(1)))
+        budget = int(match.group(2))
+        memory = MEMORY_LINE.findall(output)
+        rss.append(int(RSS_LINE.search(output).group(1)))
+    return samples, budget, memory, rss
+
+
+def daemon_startup(runs):
+    """启动遮罩守护进程若干次
+
+    Returns:
+        (每次启动到就绪的耗时, 每次启动的常驻内存KB)
+    """
+    samples, rss = [], []
+    for _ in range(runs):
+        output = probe("daemon.py")
+        samples.append(float(DAEMON_LINE.search(output).group(1)))
+        rss.append(int(RSS_LINE.search(output).group(1)))
+    return samples, rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description="屏幕亮度调节工具启动性能基准")
+    parser.add_argument("--runs", type=int, default=5, help="启动次数")
+    parser.add_argument("--top", type=int, default=15, help="列出累计耗时最长的导入数量")
+    parser.add_argument("--budget", type=int, default=None, help="启动预算（毫秒），默认使用程序配置")
+    parser.add_argument("--daemon", action="store_true", help="同时测量无界面的遮罩守护进程")
+    args = parser.parse_args()
+
+    entries = import_times()
+    total_us = sum(cumulative for _, _, cumulative, level in entries if level == 0)
+    print(f"导入main模块总耗时: {total_us / 1000.0:.1f}ms")
+    print(f"{'累计(ms)':>10} {'自身(ms)':>10}  模块")
+    for name, self_us, cumulative_us, level in sorted(entries, key=lambda e: -e[2])[:args.top]:
+        print(f"{cumulative_us / 1000.0:10.1f} {self_us / 1000.0:10.1f}  {'  ' * level}{name}")
+
+    samples, budget, memory, rss = time_to_tray(args.runs)
+    for screen, mode, surface_bytes, saved_bytes in memory:
+        print(f"屏幕{screen}遮罩 ({mode}): 缓冲区 {int(surface_bytes) / 1048576:.1f}MB, "
+              f"比逐像素透明遮罩节省 {int(saved_bytes) / 1048576:.1f}MB")
+    budget = args.budget if args.budget is not None else budget
+    median = statistics.median(samples)
+    print(f"\n启动到托盘: 中位数 {median:.1f}ms, 最大 {max(samples):.1f}ms, 预算 {budget}ms ({args.runs}次)")
+    print(f"常驻内存: {statistics.median(rss) / 1024.0:.1f}MB")
+
+    if args.daemon:
+        daemon_samples, daemon_rss = daemon_startup(args.runs)
+        daemon_median = statistics.median(daemon_samples)
+        print(f"\n{'':10}{'启动(ms)':>12}{'常驻内存(MB)':>14}")
+        print(f"{'完整程序':10}{median:12.1f}{statistics.median(rss) / 1024.0:14.1f}")
+        print(f"{'守护进程':10}{daemon_median:12.1f}{statistics.median(daemon_rss) / 1024.0:14.1f}")
+
+    if median > budget:
+        print("超出启动预算", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""主题切换延迟基准
+
+通过主窗口的"暗黑模式"复选框反复切换主题，测量从切换到事件处理完毕（包括重新应用样式、布局和绘制）
+的耗时，并统计被重新应用样式的部件数量（StyleChange事件）。--legacy 按原来的方式切换作为对比：
+每次重新构建调色板并对整个程序设置样式表，所有部件（包括悬浮窗和隐藏的菜单）都会重新应用样式。
+
+默认使用offscreen平台，也可以在Xvfb下运行：
+    python benchmarks/theme_switch.py [--switches 50] [--hidden] [--menus 20] [--legacy]
+"""
+import os
+import sys
+import math
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QObject, QEvent
+from PyQt5.QtWidgets import QApplication, QMenu
+from main_window import MainWindow
+from floating_button import FloatingButton
+from themes import DARK_STYLESHEET, LIGHT_STYLESHEET, dark_palette
+
+
+def percentile(values, p):
+    """最近秩法计算百分位数"""
+    ordered = sorted(values)
+    index = max(0, math.ceil(p / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class StyleChangeCounter(QObject):
+    """统计所有部件收到的StyleChange事件"""
+
+    def __init__(self):
+        super(StyleChangeCounter, self).__init__()
+        self.count = 0
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.StyleChange:
+            self.count += 1
+        return False
+
+
+def legacy_toggle(main_window, enabled):
+    """原来的切换方式：每次重新构建调色板，并对整个程序设置样式表"""
+    app = QApplication.instance()
+    main_window.dark_mode = enabled
+    if enabled:
+        app.setPalette(dark_palette())
+        app.setStyleSheet(DARK_STYLESHEET)
+    else:
+        app.setPalette(app.style().standardPalette())
+        app.setStyleSheet(LIGHT_STYLESHEET)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="主题切换延迟基准")
+    parser.add_argument("--switches", type=int, default=50, help="切换次数（至少1次）")
+    parser.add_argument("--hidden", action="store_true",
+                        help="切换时主窗口隐藏（最小化到托盘、显示悬浮窗），切换后再显示一次主窗口")
+    parser.add_argument("--menus", type=int, default=0, help="预先创建并显示过的隐藏菜单数量")
+    parser.add_argument("--legacy", action="store_true", help="使用原来的切换方式作为对比")
+    args = parser.parse_args()
+
+    args.switches = max(1, args.switches)
+
+    app = QApplication(sys.argv)
+    main_window = MainWindow()
+    floating_button = FloatingButton(parent=main_window)
+    main_window.set_floating_button(floating_button)
+    main_window.show()
+    menus = []
+    for _ in range(args.menus):
+        menu = QMenu(floating_button)
+        menu.addAction("菜单项")
+        menu.show()
+        menu.hide()
+        menus.append(menu)
+    app.processEvents()
+
+    if args.legacy:
+        main_window.dark_mode_checkbox.toggled.disconnect()
+        main_window.setStyleSheet("")
+        main_window.dark_mode_checkbox.toggled.connect(lambda enabled: legacy_toggle(main_window, enabled))
+
+    counter = StyleChangeCounter()
+    app.installEventFilter(counter)
+    latencies = []
+    show_latencies = []
+    repolished = []
+    show_repolished = []
+    for _ in range(args.switches):
+        if args.hidden:
+            main_window.hide()
+            app.processEvents()
+        before = counter.count
+        start = time.perf_counter()
+        main_window.dark_mode_checkbox.setChecked(not main_window.dark_mode_checkbox.isChecked())
+        app.processEvents()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        repolished.append(counter.count - before)
+        if args.hidden:
+            # 推迟的样式在下次显示主窗口时应用，单独计时
+            before = counter.count
+            start = time.perf_counter()
+            main_window.show()
+            app.processEvents()
+            show_latencies.append((time.perf_counter() - start) * 1000.0)
+            show_repolished.append(counter.count - before)
+
+    print(f"平台: {app.platformName()}, 方式: {'原来' if args.legacy else '缓存'}, 切换: {args.switches}, "
+          f"主窗口{'隐藏' if args.hidden else '可见'}, 隐藏菜单: {args.menus}")
+    print(f"每次切换重新应用样式的部件: 切换时 {max(repolished)}"
+          + (f"，显示主窗口时 {max(show_repolished)}" if show_repolished else ""))
+    print(f"切换   p50 {percentile(latencies, 50):7.3f}ms  p99 {percentile(latencies, 99):7.3f}ms  "
+          f"max {max(latencies):7.3f}ms")
+    if show_latencies:
+        print(f"显示   p50 {percentile(show_latencies, 50):7.3f}ms  p99 {percentile(show_latencies, 99):7.3f}ms  "
+              f"max {max(show_latencies):7.3f}ms")
+    app.removeEventFilter(counter)
+    floating_button.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,276 @@
 import sys
+import math
+import time
 import platform
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
 from PyQt5.QtWidgets import QWidget, QApplication, QRubberBand
 from PyQt5.QtCore import Qt, QTimer, QRect, QPoint, QSize
-from PyQt5.QtGui import QPainter, QColor, QScreen, QCursor
+from PyQt5.QtGui import QPainter, QColor, QScreen, QCursor, QRegion
+from clock import SYSTEM_CLOCK
+
+# 遮罩模式
+MODE_NORMAL = "normal"
+MODE_HIGH_CONTRAST = "high_contrast"
+MODE_BLUE_LIGHT = "blue_light"
+
+# 色温：中性色温不叠加色调，色温越低暖色调越强
+NEUTRAL_TEMPERATURE = 6500
+MIN_TEMPERATURE = 1900
+MAX_TINT_ALPHA = 90
+
+# 编译缓存的最大条目数（拖动滑动条等临时状态按最近使用淘汰）
+COMPILE_CACHE_SIZE = 64
+# 预编译状态（预设）单独缓存的最大条目数，不会被临时状态挤出
+PRECOMPILED_CACHE_SIZE = 64
+
+# 遮罩检查屏幕几何的间隔（毫秒），使用电池时延长
+CHECK_INTERVAL_MS = 1000
+POWER_SAVING_CHECK_INTERVAL_MS = 5000
+
+
+def temperature_to_rgb(kelvin):
+    """将色温（开尔文）近似转换为白点颜色 (r, g, b)"""
+    t = max(1000, min(40000, kelvin)) / 100.0
+
+    if t <= 66:
+        red = 255
+        green = 99.4708025861 * math.log(t) - 161.1195681661
+    else:
+        red = 329.698727446 * ((t - 60) ** -0.1332047592)
+        green = 288.1221695283 * ((t - 60) ** -0.0755148492)
+
+    if t >= 66:
+        blue = 255
+    elif t <= 19:
+        blue = 0
+    else:
+        blue = 138.5177312231 * math.log(t - 10) - 305.0447927307
+
+    return tuple(int(max(0, min(255, round(c)))) for c in (red, green, blue))
+
+
+def temperature_tint(kelvin):
+    """将色温转换为遮罩色调 (r, g, b, a)，中性色温返回None"""
+    if kelvin is None or kelvin >= NEUTRAL_TEMPERATURE:
+        return None
+    strength = min(1.0, (NEUTRAL_TEMPERATURE - kelvin) / float(NEUTRAL_TEMPERATURE - MIN_TEMPERATURE))
+    return temperature_to_rgb(kelvin) + (int(round(strength * MAX_TINT_ALPHA)),)
+
+
+def tint_temperature(tint):
+    """temperature_tint的逆运算：返回产生该色调的色温，没有色调时返回中性色温"""
+    if not tint:
+        return NEUTRAL_TEMPERATURE
+    # 色调的alpha随色温单调变化，只需比较alpha附近的色温
+    span = NEUTRAL_TEMPERATURE - MIN_TEMPERATURE
+    center = NEUTRAL_TEMPERATURE - int(round(tint[3] * span / float(MAX_TINT_ALPHA)))
+    step = int(math.ceil(span / float(MAX_TINT_ALPHA)))
+    candidates = range(max(MIN_TEMPERATURE, center - step), min(NEUTRAL_TEMPERATURE, center + step + 1))
+    # 多个色温得到相同色调时优先取整百的色温
+    return min(candidates, key=lambda kelvin: (
+        sum(abs(a - b) for a, b in zip(temperature_tint(kelvin) or (0, 0, 0, 0), tint)), kelvin % 100 != 0))
+
+
+def composite_rgba(top, bottom):
+    """将两层半透明颜色按SourceOver合成为一层等效颜色
+
+    Args:
+        top: 上层颜色 (r, g, b, a)
+        bottom: 下层颜色 (r, g, b, a)
+    """
+    top_alpha = top[3] / 255.0
+    bottom_alpha = bottom[3] / 255.0
+    alpha = top_alpha + bottom_alpha * (1 - top_alpha)
+    if alpha <= 0:
+        return (0, 0, 0, 0)
+
+    # 预乘颜色合成后再还原为非预乘颜色
+    channels = tuple(
+        int(round((t * top_alpha + b * bottom_alpha * (1 - top_alpha)) / alpha))
+        for t, b in zip(top[:3], bottom[:3])
+    )
+    return channels + (int(round(alpha * 255)),)
+
+
+class RenderState(namedtuple("RenderState", ["level", "mode", "tint", "areas"])):
+    """不可变的渲染状态
+
+    level: 0-100之间的亮度值
+    mode: 遮罩模式（MODE_NORMAL / MODE_HIGH_CONTRAST / MODE_BLUE_LIGHT）
+    tint: 叠加在遮罩上的色调 (r, g, b, a)，None表示无色调
+    areas: 全局坐标下的区域 ((x, y, w, h), ...)，空元组表示全屏
+    """
+    __slots__ = ()
+
+    def fill_rgba(self):
+        """计算遮罩的填充颜色 (r, g, b, a)"""
+        # 亮度值反转为透明度：亮度100%对应alpha=0，亮度0%对应alpha=255
+        alpha = max(0, min(255, int(255 * (100 - self.level) / 100)))
+
+        if self.mode == MODE_HIGH_CONTRAST:
+            # 高对比度模式使用蓝色滤镜
+            rgba = (0, 0, 255, alpha)
+        elif self.mode == MODE_BLUE_LIGHT:
+            # 防蓝光模式使用淡橙色滤镜（过滤蓝光）
+            rgba = (255, 155, 30, 40 + alpha // 10)
+        else:
+            # 普通模式使用黑色遮罩
+            rgba = (0, 0, 0, alpha)
+
+        if self.tint:
+            rgba = composite_rgba(self.tint, rgba)
+        return rgba
+
+
+DEFAULT_RENDER_STATE = RenderState(100, MODE_NORMAL, None, ())
+
+# 状态变化的来源，传给状态监听者（如使用记录）
+SOURCE_USER = 0
+SOURCE_PRESET = 1
+SOURCE_SCHEDULE = 2
+SOURCE_RULE = 3
+
+# 编译后的单个遮罩绘制参数：填充颜色和本地坐标区域（None表示整个遮罩）
+CompiledOverlay = namedtuple("CompiledOverlay", ["rgba", "rects"])
+
+# 不显示的遮罩
+HIDDEN_OVERLAY = CompiledOverlay((0, 0, 0, 0), None)
+
+
+def compile_overlay(state, geometry):
+    """将渲染状态编译为某个遮罩的填充颜色和绘制区域
+
+    Args:
+        state: RenderState
+        geometry: 遮罩窗口的全局几何信息 (x, y, w, h)
+    """
+    rgba = state.fill_rgba()
+    if not state.areas:
+        return CompiledOverlay(rgba, None)
+
+    gx, gy, gw, gh = geometry
+    rects = []
+    for x, y, w, h in state.areas:
+        # 与遮罩求交集并转换为遮罩本地坐标
+        left, top = max(x, gx), max(y, gy)
+        right, bottom = min(x + w, gx + gw), min(y + h, gy + gh)
+        if right > left and bottom > top:
+            rects.append((left - gx, top - gy, right - left, bottom - top))
+    return CompiledOverlay(rgba, tuple(rects))
+
+
+def area_pieces(areas, screens):
+    """把选定区域按屏幕切分，每一块由一个区域大小的遮罩窗口覆盖
+
+    Args:
+        areas: 全局坐标的区域 ((x, y, w, h), ...)
+        screens: [(屏幕索引, 屏幕全局几何 (x, y, w, h)), ...]
+
+    Returns:
+        [(屏幕索引, 全局坐标 (x, y, w, h)), ...]
+    """
+    pieces = []
+    for x, y, w, h in areas:
+        for index, (sx, sy, sw, sh) in screens:
+            left, top = max(x, sx), max(y, sy)
+            right, bottom = min(x + w, sx + sw), min(y + h, sy + sh)
+            if right > left and bottom > top:
+                pieces.append((index, (left, top, right - left, bottom - top)))
+    return pieces
+
+
+def window_opacity_supported():
+    """窗口级透明度是否可用：X11下需要合成管理器，否则不透明的遮罩会完全挡住屏幕"""
+    app = QApplication.instance()
+    if app is not None and app.platformName() == "xcb":
+        from x11_connection import X11Connection
+
+        connection = X11Connection.instance()
+        try:
+            return connection is not None and connection.compositor_running()
+        except Exception:
+            return False
+    # Windows和macOS始终由系统合成窗口；Qt5在Wayland下没有实现setWindowOpacity，遮罩会完全不透明
+    return app is not None and app.platformName() in ("windows", "cocoa")
+
+
+def rect_to_tuple(rect):
+    """QRect转换为 (x, y, w, h) 元组"""
+    return (rect.x(), rect.y(), rect.width(), rect.height())
+
 
 class BrightnessControl:
-    def __init__(self):
+    def __init__(self, opacity_overlays=False, span_screens=False, clock=SYSTEM_CLOCK,
+                 battery_opacity_overlays=False):
+        """
+        Args:
+            opacity_overlays: 使用窗口级透明度的不透明遮罩（节省内存，调节亮度无需重绘），
+                没有合成管理器时自动退回逐像素透明的遮罩
+            battery_opacity_overlays: 使用电池时改用窗口级透明度的遮罩（切换时重建遮罩会闪烁一次，默认关闭）
+            span_screens: 多屏幕时用一个覆盖整个虚拟桌面的遮罩代替每屏一个遮罩，
+                屏幕缩放比例不一致或有屏幕由硬件后端调节时自动退回每屏一个遮罩
+            clock: 遮罩定时器的来源，模拟时传入clock.VirtualClock
+        """
+        self.clock = clock
         self._overlay = None
-        self.is_high_contrast = False
-        self.is_blue_light_filter = False
+        self._area_overlays = []  # 区域模式下按区域大小创建的遮罩，复用不销毁
+        self._requested_opacity_overlays = opacity_overlays
+        self.battery_opacity_overlays = battery_opacity_overlays
+        self.opacity_overlays = opacity_overlays and window_opacity_supported()
+        self.span_screens = span_screens
+        self.spanning = False  # 当前是否使用跨屏遮罩
+        self.suspended = False  # 屏幕休眠或会话锁定时暂停遮罩工作
+        self.power_saving = False  # 使用电池时降低遮罩的唤醒频率
+        self.check_interval = CHECK_INTERVAL_MS
+        self._watching_screens = False
         self.screens = []
-        self.selected_area = None  # 存储选定的屏幕区域
         self.is_area_selected = False  # 是否使用区域模式
+
+        # 当前已应用的渲染状态和待提交的渲染状态
+        self.state = None
+        self._pending_state = DEFAULT_RENDER_STATE
+        self._pending_source = SOURCE_USER
+        self._transaction_depth = 0
+        self._compile_cache = OrderedDict()
+        self._precompiled = OrderedDict()
+
+        # 管理员策略限制的最低亮度和允许的模式，提交时对渲染状态生效
+        self.min_level = 0
+        self.allowed_modes = None
+
+        # 状态提交后调用的监听者 listener(state, source)，必须足够快
+        self.state_listeners = []
+
+        # 硬件亮度后端及其负责的屏幕
+        self.hardware_backends = []
+        self._screen_backends = {}
+
+        # 不应被调暗的特殊窗口区域（全局坐标）
+        self.exclusion_rects = []
+
+        # 已销毁遮罩的累计重绘和定时器唤醒次数（遮罩重建后计数不归零）
+        self.retired_paints = 0
+        self.retired_wakeups = 0
+
         self.initialize_screens()
         
         # 区域选择器
         self.area_selector = None
+
+    @property
+    def is_high_contrast(self):
+        return self._pending_state.mode == MODE_HIGH_CONTRAST
+
+    @property
+    def is_blue_light_filter(self):
+        return self._pending_state.mode == MODE_BLUE_LIGHT
+
+    @property
+    def selected_area(self):
+        """当前选定的屏幕区域（全局坐标QRect），未选择时为None"""
+        areas = self._pending_state.areas
+        return QRect(*areas[0]) if areas else None
     
     def initialize_screens(self):
         """初始化所有屏幕的遮罩"""
@@ -27,67 +282,378 @@ class BrightnessControl:
         # 清理已有遮罩
         if self._overlay:
             for overlay in self._overlay:
-                overlay.close()
-                overlay.deleteLater()
+                self._destroy_overlay(overlay)
         
         self._overlay = []
+        self.screens = []
         screen_count = app.desktop().screenCount()
+        qscreens = app.screens()
         
-        # 为每个屏幕创建遮罩
         for i in range(screen_count):
-            screen_geometry = app.desktop().screenGeometry(i)
-            overlay = BrightnessOverlay(i, screen_geometry)
+            name = qscreens[i].name() if i < len(qscreens) else ""
+            self.screens.append({"index": i, "geometry": app.desktop().screenGeometry(i), "name": name})
+        self._map_screen_backends()
+        
+        # 跨屏遮罩要求所有屏幕缩放比例一致，且亮度完全由遮罩实现
+        ratios = {screen.devicePixelRatio() for screen in qscreens}
+        self.spanning = (self.span_screens and screen_count > 1 and len(ratios) == 1
+                         and not self._screen_backends)
+        
+        if self.spanning:
+            # 一个遮罩覆盖所有屏幕的外接矩形，形状限制为各屏幕区域的并集
+            bounds = QRect()
+            for screen in self.screens:
+                bounds = bounds.united(screen["geometry"])
+            screen_rects = [screen["geometry"].translated(-bounds.topLeft()) for screen in self.screens]
+            overlay = BrightnessOverlay(0, bounds, self.opacity_overlays, follow_screen=False,
+                                        screen_rects=screen_rects, clock=self.clock)
+            overlay.screen_indexes = tuple(range(screen_count))
             self._overlay.append(overlay)
-            self.screens.append({"index": i, "geometry": screen_geometry})
             
-        # 默认亮度设为100%（完全透明）
-        self.set_brightness(100)
-    
-    def set_brightness(self, brightness_value):
-        """设置屏幕亮度
+            # 跨屏遮罩没有逐屏的几何检查定时器，屏幕布局变化时重新创建遮罩
+            if not self._watching_screens:
+                app.desktop().resized.connect(self._on_screens_changed)
+                app.desktop().screenCountChanged.connect(self._on_screens_changed)
+                self._watching_screens = True
+        else:
+            # 为每个屏幕创建遮罩
+            for screen in self.screens:
+                self._overlay.append(
+                    BrightnessOverlay(screen["index"], screen["geometry"], self.opacity_overlays,
+                                      check_interval=self.check_interval, clock=self.clock))
         
+        self._apply_exclusions()
+        if self.suspended:
+            for overlay in self._overlay:
+                overlay.set_timers_active(False)
+            
+        # 新建的遮罩需要重新应用状态，默认亮度为100%（完全透明）
+        self.state = None
+        self._commit()
+
+    def _on_screens_changed(self, *args):
+        if self.spanning:
+            self.initialize_screens()
+
+    def set_suspended(self, suspended):
+        """屏幕休眠或会话锁定时暂停遮罩的定时器和重绘
+
+        暂停期间的状态变化像事务一样暂存，恢复时一次性提交。遮罩在暂停期间保持显示，
+        唤醒时不会先亮后暗地闪烁。
+        """
+        if suspended == self.suspended:
+            return
+        self.suspended = suspended
+        for overlay in (self._overlay or []) + self._area_overlays:
+            overlay.set_timers_active(not suspended)
+
+        if suspended:
+            self._transaction_depth += 1
+        else:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self._commit()
+
+    def set_power_saving(self, enabled):
+        """使用电池时延长遮罩的屏幕几何检查间隔
+
+        只有启用了battery_opacity_overlays时才在合成器可用时改用开销最小的窗口透明度遮罩
+        （需要重建所有遮罩）。接通交流电源后恢复原来的检查间隔和遮罩模式。
+        """
+        if enabled == self.power_saving:
+            return
+        self.power_saving = enabled
+        self.check_interval = POWER_SAVING_CHECK_INTERVAL_MS if enabled else CHECK_INTERVAL_MS
+
+        opacity = ((self._requested_opacity_overlays or (enabled and self.battery_opacity_overlays))
+                   and window_opacity_supported())
+        if opacity != self.opacity_overlays:
+            # 遮罩模式在创建时确定，重建所有遮罩（区域遮罩在下次提交时按需重新创建）
+            self.opacity_overlays = opacity
+            for overlay in self._area_overlays:
+                self._destroy_overlay(overlay)
+            self._area_overlays = []
+            self.initialize_screens()
+        else:
+            for overlay in self._overlay or ():
+                overlay.set_check_interval(self.check_interval)
+
+    def set_limits(self, min_level=0, allowed_modes=None):
+        """设置最低亮度和允许的模式（None表示不限制），限制后的状态不变时不会重绘"""
+        if (min_level, allowed_modes) == (self.min_level, self.allowed_modes):
+            return
+        self.min_level = min_level
+        self.allowed_modes = allowed_modes
+        if self._transaction_depth == 0:
+            self._commit()
+
+    def _constrain(self, state):
+        """按策略限制调整渲染状态"""
+        if state.level < self.min_level:
+            state = state._replace(level=self.min_level)
+        if self.allowed_modes is not None and state.mode not in self.allowed_modes:
+            state = state._replace(mode=MODE_NORMAL)
+        return state
+
+    def timers(self):
+        """所有遮罩的定时器，用于统计唤醒频率"""
+        return [overlay.update_timer for overlay in (self._overlay or []) + self._area_overlays]
+
+    @contextmanager
+    def transaction(self):
+        """在事务中合并多次状态修改，退出时只应用一次
+
+        用法:
+            with brightness_control.transaction():
+                brightness_control.set_brightness(70)
+                brightness_control.toggle_blue_light_filter(True)
+        """
+        self._transaction_depth += 1
+        try:
+            yield self
+        finally:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self._commit()
+
+    def apply_state(self, state, source=SOURCE_USER):
+        """应用新的渲染状态（事务中延迟到事务结束时应用）
+
         Args:
-            brightness_value: 0-100之间的亮度值，100表示原始亮度
+            source: 状态变化的来源（SOURCE_*），传给状态监听者
+        """
+        self._pending_state = state
+        self._pending_source = source
+        if self._transaction_depth == 0:
+            self._commit()
+
+    def update_state(self, **changes):
+        """基于当前状态修改部分字段并应用"""
+        self.apply_state(self._pending_state._replace(**changes))
+
+    @property
+    def current_state(self):
+        """当前（包括事务中尚未提交的）渲染状态"""
+        return self._pending_state
+
+    def set_exclusion_rects(self, rects):
+        """设置不应被调暗的特殊窗口区域
+
+        Args:
+            rects: 全局坐标下的 [(x, y, w, h), ...]
+        """
+        rects = list(rects)
+        if rects == self.exclusion_rects:
+            return
+        self.exclusion_rects = rects
+        self._apply_exclusions()
+
+    def _apply_exclusions(self):
+        """把特殊窗口区域转换到各遮罩的本地坐标，只有区域变化的遮罩才会重绘"""
+        for overlay in (self._overlay or []) + self._area_overlays:
+            self._apply_exclusions_to(overlay)
+            self._update_visibility(overlay)
+
+    def _apply_exclusions_to(self, overlay):
+        """把与遮罩相交的特殊窗口区域转换到遮罩的本地坐标"""
+        geometry = overlay.geometry()
+        gx, gy = geometry.x(), geometry.y()
+        local = [(x - gx, y - gy, w, h) for x, y, w, h in self.exclusion_rects
+                 if QRect(x - gx, y - gy, w, h).intersects(overlay.rect())]
+        overlay.set_special_window_rects(local)
+
+    def memory_report(self):
+        """各屏幕遮罩的像素缓冲区占用，以及相对逐像素透明遮罩节省的内存（字节）"""
+        report = []
+        for overlay in self._overlay or ():
+            used = overlay.surface_bytes()
+            translucent = overlay.translucent_surface_bytes()
+            report.append({
+                "screen": overlay.screen_index,
+                "mode": "opacity" if overlay.opacity_mode else "translucent",
+                "surface_bytes": used,
+                "saved_bytes": translucent - used,
+            })
+        return report
+
+    def overlay_stats(self):
+        """遮罩窗口数量、运行中的定时器数量和累计重绘次数，用于比较两种遮罩模式"""
+        overlays = (self._overlay or []) + self._area_overlays
+        return {
+            "mode": "spanning" if self.spanning else "per_screen",
+            "windows": len(overlays),
+            "visible_windows": sum(1 for overlay in overlays if overlay.isVisible()),
+            "timers": sum(1 for timer in self.timers() if timer.isActive()),
+            "repaints": sum(overlay.paint_count for overlay in overlays),
+        }
+
+    def overlay_counters(self):
+        """累计重绘和定时器唤醒次数（包括已销毁的遮罩），只增不减，用于指标导出"""
+        overlays = (self._overlay or []) + self._area_overlays
+        return {
+            "paints": self.retired_paints + sum(overlay.paint_count for overlay in overlays),
+            "wakeups": self.retired_wakeups + sum(overlay.wakeups for overlay in overlays),
+        }
+
+    def _destroy_overlay(self, overlay):
+        self.retired_paints += overlay.paint_count
+        self.retired_wakeups += overlay.wakeups
+        overlay.close()
+        overlay.deleteLater()
+
+    def overlay_fill(self, screen_index):
+        """指定屏幕上遮罩当前实际显示的填充颜色 (r, g, b, a)，遮罩隐藏时alpha为0"""
+        for overlay in self._overlay or ():
+            if screen_index in overlay.screen_indexes and overlay.isVisible():
+                return overlay.compiled.rgba
+        return (0, 0, 0, 0)
+
+    def precompile(self, states):
+        """预先编译渲染状态，之后切换到这些状态时无需再次编译
+
+        结果保存在单独的缓存中，拖动滑动条产生的大量临时状态不会把它们挤出。
         """
         if not self._overlay:
             return
-            
-        # 亮度值反转为透明度：亮度100%对应透明度100%（即alpha=0）
-        # 亮度0%对应透明度0%（即alpha=255）
-        alpha = int(255 * (100 - brightness_value) / 100)
-        
+        for state in states:
+            if state.areas:
+                # 区域遮罩的几何信息在布局时才确定
+                continue
+            for overlay in self._overlay:
+                backend = self._screen_backends.get(overlay.screen_index)
+                overlay_state = backend.split_state(state)[1] if backend is not None else state
+                key = (overlay_state, rect_to_tuple(overlay.geometry()))
+                self._precompiled[key] = self._compile(*key)
+                self._precompiled.move_to_end(key)
+                if len(self._precompiled) > PRECOMPILED_CACHE_SIZE:
+                    self._precompiled.popitem(last=False)
+
+    def _compile(self, state, geometry):
+        """带缓存的遮罩编译，先查预编译的状态，再查按最近使用淘汰的缓存"""
+        key = (state, geometry)
+        compiled = self._precompiled.get(key)
+        if compiled is not None:
+            return compiled
+        compiled = self._compile_cache.get(key)
+        if compiled is not None:
+            self._compile_cache.move_to_end(key)
+            return compiled
+        compiled = compile_overlay(state, geometry)
+        self._compile_cache[key] = compiled
+        if len(self._compile_cache) > COMPILE_CACHE_SIZE:
+            self._compile_cache.popitem(last=False)
+        return compiled
+
+    def add_hardware_backend(self, backend):
+        """添加硬件亮度后端，其负责的屏幕由硬件调节亮度，遮罩只补足剩余部分"""
+        self.hardware_backends.append(backend)
+        self._map_screen_backends()
+        if self.spanning and self._screen_backends:
+            # 各屏幕的遮罩状态不再一致，退回每屏一个遮罩（会重新提交状态）
+            self.initialize_screens()
+            return
+        self.state = None
+        self._commit()
+
+    def _map_screen_backends(self):
+        """为每个屏幕选择第一个负责它的硬件后端（后备后端排在最后），并通知各后端分配到的屏幕"""
+        self._screen_backends = {}
+        backends = sorted(self.hardware_backends, key=lambda backend: backend.fallback)
+        for screen in self.screens:
+            for backend in backends:
+                if backend.covers_screen(screen["index"], screen["name"]):
+                    self._screen_backends[screen["index"]] = backend
+                    break
+        for backend in self.hardware_backends:
+            backend.assign_screens([screen["name"] for screen in self.screens
+                                    if self._screen_backends.get(screen["index"]) is backend])
+
+    def _commit(self):
+        """将待提交的状态编译并应用到所有遮罩，每个遮罩最多重绘一次"""
+        state = self._constrain(self._pending_state)
+        source, self._pending_source = self._pending_source, SOURCE_USER
+        if not self._overlay or state == self.state:
+            return
+
+        # 每个硬件后端只应用一次，得到对应屏幕上遮罩仍需实现的状态
+        overlay_states = {}
+        for backend in self._screen_backends.values():
+            if backend not in overlay_states:
+                overlay_states[backend] = backend.apply_state(state)
+
         for overlay in self._overlay:
-            # 如果在区域模式下，只有选中的区域才应用亮度设置
-            if self.is_area_selected and self.selected_area:
-                overlay.set_selected_area(self.selected_area)
+            if state.areas:
+                # 区域模式由区域大小的遮罩实现，全屏遮罩隐藏
+                compiled = HIDDEN_OVERLAY
             else:
-                overlay.clear_selected_area()
-                
-            overlay.set_opacity(alpha)
-            if not overlay.isVisible():
-                overlay.show()
+                backend = self._screen_backends.get(overlay.screen_index)
+                overlay_state = overlay_states[backend] if backend is not None else state
+                compiled = self._compile(overlay_state, rect_to_tuple(overlay.geometry()))
+            overlay.apply_compiled(compiled)
+            self._update_visibility(overlay)
+
+        self._layout_area_overlays(state, overlay_states)
+        self.state = state
+
+        for listener in self.state_listeners:
+            listener(state, source)
+
+    def _layout_area_overlays(self, state, overlay_states):
+        """为每个区域（按屏幕切分后）分配一个同样大小的遮罩，多余的遮罩隐藏留待复用"""
+        screens = [(screen["index"], rect_to_tuple(screen["geometry"])) for screen in self.screens]
+        pieces = area_pieces(state.areas, screens)
+
+        while len(self._area_overlays) < len(pieces):
+            screen_index, rect = pieces[len(self._area_overlays)]
+            overlay = BrightnessOverlay(screen_index, QRect(*rect), self.opacity_overlays, follow_screen=False,
+                                        clock=self.clock)
+            self._apply_exclusions_to(overlay)
+            self._area_overlays.append(overlay)
+
+        for overlay, (screen_index, rect) in zip(self._area_overlays, pieces):
+            overlay.screen_index = screen_index
+            if rect_to_tuple(overlay.geometry()) != rect:
+                overlay.setGeometry(QRect(*rect))
+                self._apply_exclusions_to(overlay)
+            backend = self._screen_backends.get(screen_index)
+            overlay_state = overlay_states[backend] if backend is not None else state
+            overlay.apply_compiled(self._compile(overlay_state._replace(areas=()), rect))
+            self._update_visibility(overlay)
+
+        for overlay in self._area_overlays[len(pieces):]:
+            overlay.apply_compiled(HIDDEN_OVERLAY)
+            self._update_visibility(overlay)
+
+    def _update_visibility(self, overlay):
+        """完全透明或全部被排除的遮罩直接隐藏，避免合成器逐像素混合"""
+        compiled = overlay.compiled
+        visible = compiled.rgba[3] > 0 and compiled.rects != () and not overlay.fully_excluded
+        if visible and not overlay.isVisible():
+            overlay.show()
+        elif not visible and overlay.isVisible():
+            overlay.hide()
+    
+    def set_brightness(self, brightness_value):
+        """设置屏幕亮度
+        
+        Args:
+            brightness_value: 0-100之间的亮度值，100表示原始亮度
+        """
+        self.update_state(level=brightness_value)
     
     def toggle_high_contrast(self, enabled):
-        """切换高对比度模式"""
-        self.is_high_contrast = enabled
-        if self._overlay:
-            for overlay in self._overlay:
-                overlay.set_high_contrast(enabled)
-                # 如果启用高对比度，关闭防蓝光
-                if enabled:
-                    self.is_blue_light_filter = False
-                    overlay.set_blue_light_filter(False)
+        """切换高对比度模式（与防蓝光模式互斥）"""
+        if enabled:
+            self.update_state(mode=MODE_HIGH_CONTRAST)
+        elif self.is_high_contrast:
+            self.update_state(mode=MODE_NORMAL)
     
     def toggle_blue_light_filter(self, enabled):
-        """切换防蓝光模式"""
-        self.is_blue_light_filter = enabled
-        if self._overlay:
-            for overlay in self._overlay:
-                overlay.set_blue_light_filter(enabled)
-                # 如果启用防蓝光，关闭高对比度
-                if enabled:
-                    self.is_high_contrast = False
-                    overlay.set_high_contrast(False)
+        """切换防蓝光模式（与高对比度模式互斥）"""
+        if enabled:
+            self.update_state(mode=MODE_BLUE_LIGHT)
+        elif self.is_blue_light_filter:
+            self.update_state(mode=MODE_NORMAL)
     
     def start_area_selection(self):
         """开始选择屏幕区域"""
@@ -96,37 +662,39 @@ class BrightnessControl:
         self.area_selector.start_selection()
     
     def select_area(self, selected_rect):
-        """设置选定的屏幕区域"""
-        self.selected_area = selected_rect
-        self.is_area_selected = True
+        """设置选定的屏幕区域
         
-        # 重新应用当前亮度设置到选定区域
-        if self._overlay:
-            for overlay in self._overlay:
-                overlay.set_selected_area(selected_rect)
+        Args:
+            selected_rect: 全局坐标下的QRect
+        """
+        self.is_area_selected = True
+        self.update_state(areas=(rect_to_tuple(selected_rect),))
     
     def clear_selected_area(self):
         """清除选定的屏幕区域"""
-        self.selected_area = None
         self.is_area_selected = False
-        
-        # 更新所有遮罩
-        if self._overlay:
-            for overlay in self._overlay:
-                overlay.clear_selected_area()
+        self.update_state(areas=())
     
     def cleanup(self):
         """清理所有遮罩"""
         if self._overlay:
             for overlay in self._overlay:
-                overlay.close()
-                overlay.deleteLater()
+                self._destroy_overlay(overlay)
             self._overlay = []
+        
+        for overlay in self._area_overlays:
+            self._destroy_overlay(overlay)
+        self._area_overlays = []
             
         if self.area_selector:
             self.area_selector.close()
             self.area_selector = None
 
+        for backend in self.hardware_backends:
+            backend.close()
+        self.hardware_backends = []
+        self._screen_backends = {}
+
 
 class AreaSelector(QWidget):
     """屏幕区域选择器"""
@@ -170,8 +738,8 @@ class AreaSelector(QWidget):
             
             # 确保选择区域有效
             if selected_rect.width() > 10 and selected_rect.height() > 10:
-                # 通知亮度控制器应用选定区域
-                self.brightness_control.select_area(selected_rect)
+                # 通知亮度控制器应用选定区域（转换为全局坐标）
+                self.brightness_control.select_area(selected_rect.translated(self.geometry().topLeft()))
             
             self.selection_active = False
             self.rubberband.hide()
@@ -193,15 +761,34 @@ class AreaSelector(QWidget):
 
 
 class BrightnessOverlay(QWidget):
-    def __init__(self, screen_index, geometry):
+    def __init__(self, screen_index, geometry, opacity_mode=False, follow_screen=True, screen_rects=None,
+                 check_interval=CHECK_INTERVAL_MS, clock=SYSTEM_CLOCK):
+        """
+        Args:
+            screen_rects: 跨屏遮罩中各屏幕的本地坐标QRect，遮罩形状限制在这些区域内
+            follow_screen: 全屏遮罩跟随屏幕几何变化；区域遮罩的位置由BrightnessControl管理
+            opacity_mode: 不透明的纯色窗口配合setWindowOpacity，不需要逐像素的透明通道，
+                只改变透明度时无需重绘
+        """
         super(BrightnessOverlay, self).__init__()
         
         self.screen_index = screen_index
-        self.opacity = 0  # 默认完全透明
-        self.is_high_contrast = False
-        self.is_blue_light_filter = False
-        self.special_window_rects = []  # 存储特殊窗口的矩形区域
-        self.selected_area = None  # 选定的屏幕区域
+        self.screen_indexes = (screen_index,)  # 遮罩覆盖的屏幕
+        self.opacity_mode = opacity_mode
+        self.screen_region = None
+        if screen_rects:
+            self.screen_region = QRegion()
+            for rect in screen_rects:
+                self.screen_region = self.screen_region.united(rect)
+        self.compiled = CompiledOverlay((0, 0, 0, 0), None)  # 默认完全透明
+        self.special_window_rects = []  # 特殊窗口的矩形区域（本地坐标元组）
+        self.mask_region = QRegion()  # 当前窗口形状
+        self.mask_updates = 0
+        
+        # 绘制统计，用于测量从输入到绘制完成的延迟
+        self.paint_count = 0
+        self.last_update_time = None  # 最近一次请求重绘的时间（perf_counter）
+        self.last_paint_time = None  # 最近一次绘制完成的时间
         
         # 设置窗口属性
         self.setWindowFlags(
@@ -212,14 +799,20 @@ class BrightnessOverlay(QWidget):
             Qt.WindowDoesNotAcceptFocus  # 窗口不接受焦点
         )
         
-        # 设置窗口透明背景
-        self.setAttribute(Qt.WA_TranslucentBackground)
+        if opacity_mode:
+            # 不透明窗口，每次绘制都会覆盖全部内容
+            self.setAttribute(Qt.WA_OpaquePaintEvent)
+            self.setWindowOpacity(0.0)
+        else:
+            # 设置窗口透明背景
+            self.setAttribute(Qt.WA_TranslucentBackground)
         
         # 允许鼠标事件穿透窗口
         self.setAttribute(Qt.WA_TransparentForMouseEvents)
         
         # 设置窗口位置和大小
         self.setGeometry(geometry)
+        self._rebuild_mask()
         
         # 根据操作系统设置特定属性
         if platform.system() == "Windows":
@@ -230,58 +823,136 @@ class BrightnessOverlay(QWidget):
             pass
         
         # 使用定时器定期更新窗口，确保遮罩总是在最上层
-        self.update_timer = QTimer(self)
+        self.follow_screen = follow_screen
+        self.check_interval = check_interval
+        self.update_timer = clock.create_timer(self)
         self.update_timer.timeout.connect(self.ensure_on_top)
-        self.update_timer.start(1000)  # 每秒执行一次
-        
-        # 使用定时器查找并记录特殊窗口
-        self.special_window_timer = QTimer(self)
-        self.special_window_timer.timeout.connect(self.find_special_windows)
-        self.special_window_timer.start(500)  # 每0.5秒执行一次
+        self.wakeups = 0
+        if follow_screen:
+            self.update_timer.start(check_interval)  # 默认每秒执行一次
         
         # 设置Z-Order（稍微降低一些，允许特殊窗口在上层）
         self.lower()
     
-    def set_selected_area(self, rect):
-        """设置选定的屏幕区域"""
-        self.selected_area = rect
-        self.update()  # 触发重绘
-    
-    def clear_selected_area(self):
-        """清除选定的屏幕区域"""
-        self.selected_area = None
+    def apply_compiled(self, compiled):
+        """应用编译后的绘制参数，只有发生变化时才重绘
+        
+        Returns:
+            是否触发了重绘
+        """
+        if compiled == self.compiled:
+            return False
+        rects_changed = compiled.rects != self.compiled.rects
+        color_changed = compiled.rgba[:3] != self.compiled.rgba[:3]
+        self.compiled = compiled
+        if rects_changed:
+            self._rebuild_mask()
+        if self.opacity_mode:
+            # 透明度由窗口系统合成，只有颜色或形状变化时才需要重绘
+            self.setWindowOpacity(compiled.rgba[3] / 255.0)
+            if not (color_changed or rects_changed):
+                return False
+        self.last_update_time = time.perf_counter()
         self.update()  # 触发重绘
+        return True
     
-    def find_special_windows(self):
-        """查找需要特殊处理的窗口（如火绒流量窗口、右键菜单等）"""
-        # 在实际应用中，可能需要使用平台特定API来获取窗口信息
-        # 这里仅作为示例，简化处理
-        self.special_window_rects = []
+    def set_special_window_rects(self, rects):
+        """设置特殊窗口区域（本地坐标 (x, y, w, h)），只更新窗口形状中变化的部分
         
-        # 获取所有顶层窗口（Windows平台可使用Win32 API）
-        # 此处是简化示例，实际实现需要与具体平台API交互
-        # self.special_window_rects.append(QRect(x, y, width, height))
+        特殊窗口（如右键菜单、提示等）由平台相关的检测模块以事件驱动方式提供。
+        """
+        if rects == self.special_window_rects:
+            return
+        old, new = set(self.special_window_rects), set(rects)
+        self.special_window_rects = rects
         
-        # 标记需要更新
-        self.update()
+        region = self.mask_region
+        removed = [QRect(*rect) for rect in old - new]
+        if removed:
+            # 恢复不再被排除的部分，但仍被其他特殊窗口覆盖的部分需要重新扣除
+            base = self._base_region()
+            for rect in removed:
+                region = region.united(base.intersected(rect))
+            for rect in new:
+                rect = QRect(*rect)
+                if any(rect.intersects(r) for r in removed):
+                    region = region.subtracted(QRegion(rect))
+        for rect in new - old:
+            region = region.subtracted(QRegion(QRect(*rect)))
+        self._set_mask_region(region)
     
-    def set_opacity(self, opacity):
-        """设置遮罩的不透明度"""
-        self.opacity = max(0, min(255, opacity))  # 限制在0-255范围内
-        self.update()  # 触发重绘
+    @property
+    def fully_excluded(self):
+        """窗口形状为空（绘制区域全部被排除），此时应隐藏遮罩"""
+        return self.mask_region.isEmpty()
     
-    def set_high_contrast(self, enabled):
-        """设置是否启用高对比度模式"""
-        self.is_high_contrast = enabled
-        self.update()  # 触发重绘
+    def _base_region(self):
+        """排除特殊窗口之前的绘制区域：全屏或选定区域"""
+        if self.compiled.rects is None:
+            if self.screen_region is not None:
+                return QRegion(self.screen_region)
+            return QRegion(self.rect())
+        region = QRegion()
+        for rect in self.compiled.rects:
+            region = region.united(QRect(*rect))
+        return region
     
-    def set_blue_light_filter(self, enabled):
-        """设置是否启用防蓝光模式"""
-        self.is_blue_light_filter = enabled
-        self.update()  # 触发重绘
+    def _rebuild_mask(self):
+        """重新计算完整的窗口形状"""
+        region = self._base_region()
+        for rect in self.special_window_rects:
+            region = region.subtracted(QRegion(QRect(*rect)))
+        self._set_mask_region(region)
+    
+    def _set_mask_region(self, region):
+        """设置窗口形状，被排除的像素不再由合成器混合"""
+        if region == self.mask_region:
+            return
+        self.mask_region = region
+        self.mask_updates += 1
+        if region.isEmpty():
+            # 空区域会清除窗口形状，由调用方隐藏遮罩
+            return
+        if region == QRegion(self.rect()):
+            self.clearMask()
+        else:
+            self.setMask(region)
+    
+    def resizeEvent(self, event):
+        super(BrightnessOverlay, self).resizeEvent(event)
+        self._rebuild_mask()
+    
+    def surface_bytes(self):
+        """窗口像素缓冲区的大小（字节），窗口尚未显示过或无法取得缓冲区时按格式估算"""
+        # 部分PyQt5版本没有提供QWidget.backingStore()
+        store = self.backingStore() if hasattr(self, "backingStore") else None
+        device = store.paintDevice() if store is not None else None
+        if device is not None and device.width() > 0:
+            return device.width() * device.height() * device.depth() // 8
+        return self.translucent_surface_bytes()
+    
+    def translucent_surface_bytes(self):
+        """逐像素透明的遮罩需要的ARGB32缓冲区大小（按设备像素计算）"""
+        ratio = self.devicePixelRatioF()
+        return int(self.width() * ratio) * int(self.height() * ratio) * 4
+    
+    def set_timers_active(self, active):
+        """暂停或恢复遮罩的定时检查，恢复时立即检查一次"""
+        if active and self.follow_screen:
+            self.ensure_on_top()
+            self.update_timer.start(self.check_interval)
+        else:
+            self.update_timer.stop()
+    
+    def set_check_interval(self, interval):
+        """修改屏幕几何检查的间隔，暂停中的定时器保持暂停"""
+        self.check_interval = interval
+        if self.update_timer.isActive():
+            self.update_timer.start(interval)
     
     def ensure_on_top(self):
         """确保遮罩总是在最上层"""
+        self.wakeups += 1
         # 如果窗口不可见，直接返回
         if not self.isVisible():
             return
@@ -295,42 +966,18 @@ class BrightnessOverlay(QWidget):
             self.setGeometry(current_geometry)
     
     def paintEvent(self, event):
-        """绘制遮罩"""
-        painter = QPainter(self)
-        
-        # 允许绘制区域合成
-        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        """绘制遮罩
         
-        if self.selected_area:
-            # 在选定区域模式下，只对选定区域应用滤镜效果
-            if self.is_high_contrast:
-                # 高对比度模式使用蓝色滤镜
-                painter.fillRect(self.selected_area, QColor(0, 0, 255, self.opacity))
-            elif self.is_blue_light_filter:
-                # 防蓝光模式使用淡橙色滤镜（过滤蓝光）
-                painter.fillRect(self.selected_area, QColor(255, 155, 30, 40 + self.opacity // 10))
-            else:
-                # 普通模式使用黑色遮罩
-                painter.fillRect(self.selected_area, QColor(0, 0, 0, self.opacity))
-        else:
-            # 全屏模式下应用滤镜效果
-            if self.is_high_contrast:
-                # 高对比度模式使用蓝色滤镜
-                painter.fillRect(self.rect(), QColor(0, 0, 255, self.opacity))
-            elif self.is_blue_light_filter:
-                # 防蓝光模式使用淡橙色滤镜（过滤蓝光）
-                painter.fillRect(self.rect(), QColor(255, 155, 30, 40 + self.opacity // 10))
-            else:
-                # 普通模式使用黑色遮罩
-                painter.fillRect(self.rect(), QColor(0, 0, 0, self.opacity))
+        区域模式和特殊窗口的排除都由窗口形状实现，这里只需填充本次需要重绘的部分。
+        """
+        painter = QPainter(self)
         
-        # 为特殊窗口区域创建透明区域（如火绒流量窗口、右键菜单等）
-        if self.special_window_rects:
-            # 设置擦除模式
-            painter.setCompositionMode(QPainter.CompositionMode_Clear)
-            
-            for rect in self.special_window_rects:
-                # 擦除特殊窗口区域
-                painter.fillRect(rect, Qt.transparent)
+        # 形状内的像素直接写入颜色，无需与旧内容混合
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.setClipRegion(event.region().intersected(self.mask_region))
+        rgba = self.compiled.rgba
+        painter.fillRect(event.rect(), QColor(*rgba[:3]) if self.opacity_mode else QColor(*rgba))
         
-        painter.end() 
\ No newline at end of file
+        painter.end()
+        self.paint_count += 1
+        self.last_paint_time = time.perf_counter()
\ No newline at end of file
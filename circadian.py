@@ -0,0 +1,151 @@
+import json
+from array import array
+from datetime import timedelta
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+from brightness_control import NEUTRAL_TEMPERATURE, MIN_TEMPERATURE
+from clock import SYSTEM_CLOCK
+
+MINUTES_PER_DAY = 24 * 60
+
+# 色温按该步长取整，使相邻分钟的表项尽量相同，平缓的时段不需要唤醒
+TEMPERATURE_STEP = 100
+
+# 默认曲线：白天原始亮度，傍晚逐渐降低亮度和色温，深夜保持最暗最暖
+DEFAULT_KEYFRAMES = [
+    {"time": "06:30", "level": 100, "temperature": 6500},
+    {"time": "18:30", "level": 100, "temperature": 6500},
+    {"time": "21:00", "level": 80, "temperature": 4000},
+    {"time": "23:00", "level": 60, "temperature": 2700},
+    {"time": "05:30", "level": 60, "temperature": 2700},
+]
+
+
+def parse_time(text):
+    """"HH:MM" 转换为一天中的分钟数"""
+    hours, minutes = text.split(":")
+    minute = int(hours) * 60 + int(minutes)
+    if not 0 <= minute < MINUTES_PER_DAY:
+        raise ValueError(f"无效的时间: {text}")
+    return minute
+
+
+def parse_keyframes(entries):
+    """解析关键帧列表，返回按时间排序的 [(分钟, 亮度, 色温), ...]"""
+    keyframes = {}
+    for entry in entries:
+        minute = parse_time(entry["time"])
+        level = max(0, min(100, int(entry["level"])))
+        temperature = max(MIN_TEMPERATURE, min(NEUTRAL_TEMPERATURE,
+                                               int(entry.get("temperature", NEUTRAL_TEMPERATURE))))
+        keyframes[minute] = (minute, level, temperature)
+    if not keyframes:
+        raise ValueError("曲线至少需要一个关键帧")
+    return sorted(keyframes.values())
+
+
+class CircadianTable:
+    """编译后的24小时亮度/色温曲线
+
+    关键帧之间线性插值（跨越午夜时首尾相接），编译为每分钟一项的表。
+    另外预先计算每一分钟之后第一个取值不同的分钟，定时器只在表项真正变化时唤醒。
+    """
+
+    def __init__(self, keyframes):
+        self.keyframes = keyframes
+        self.levels = array("B", bytes(MINUTES_PER_DAY))
+        self.temperatures = array("H", [NEUTRAL_TEMPERATURE]) * MINUTES_PER_DAY
+        self._next_change = array("H", [0]) * MINUTES_PER_DAY
+        self._compile()
+
+    def _compile(self):
+        count = len(self.keyframes)
+        for i, (start, level, temperature) in enumerate(self.keyframes):
+            end, next_level, next_temperature = self.keyframes[(i + 1) % count]
+            span = (end - start) % MINUTES_PER_DAY or MINUTES_PER_DAY
+            for offset in range(span):
+                ratio = offset / span
+                minute = (start + offset) % MINUTES_PER_DAY
+                self.levels[minute] = int(round(level + (next_level - level) * ratio))
+                value = temperature + (next_temperature - temperature) * ratio
+                self.temperatures[minute] = int(round(value / TEMPERATURE_STEP)) * TEMPERATURE_STEP
+
+        # 从后往前（绕两圈以处理跨午夜）计算距离下一次变化的分钟数，0表示全天不变
+        distance = 0
+        for step in range(2 * MINUTES_PER_DAY - 1, -1, -1):
+            minute = step % MINUTES_PER_DAY
+            following = (minute + 1) % MINUTES_PER_DAY
+            if self.entry(minute) != self.entry(following):
+                distance = 1
+            elif distance:
+                distance += 1
+            if step < MINUTES_PER_DAY:
+                self._next_change[minute] = distance if distance <= MINUTES_PER_DAY else 0
+
+    def entry(self, minute):
+        """一天中第minute分钟的 (亮度, 色温)"""
+        return self.levels[minute], self.temperatures[minute]
+
+    def minutes_until_change(self, minute):
+        """距离表项下一次变化的分钟数，曲线全天不变时返回None"""
+        return self._next_change[minute] or None
+
+    def wakeups_per_day(self):
+        """一天中表项变化（需要唤醒）的次数"""
+        return sum(1 for minute in range(MINUTES_PER_DAY)
+                   if self.entry(minute) != self.entry((minute + 1) % MINUTES_PER_DAY))
+
+
+def load_keyframes(settings):
+    """从QSettings的"circadian_curve"键读取关键帧，无效时使用默认曲线"""
+    try:
+        return parse_keyframes(json.loads(settings.value("circadian_curve", "", type=str) or "null")
+                               or DEFAULT_KEYFRAMES)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return parse_keyframes(DEFAULT_KEYFRAMES)
+
+
+class CircadianScheduler(QObject):
+    """按曲线自动调节亮度和色温
+
+    每次只为下一个表项变化的分钟启动单次定时器，平缓时段没有任何唤醒。
+    """
+
+    # (亮度, 色温)
+    entry_changed = pyqtSignal(int, int)
+
+    def __init__(self, table, clock=SYSTEM_CLOCK, parent=None):
+        super(CircadianScheduler, self).__init__(parent)
+        self.table = table
+        self.clock = clock
+        self.wakeups = 0
+        self.current_entry = None
+
+        self.timer = clock.create_timer(self)
+        self.timer.setSingleShot(True)
+        # 默认的粗略定时器对长间隔允许5%的误差，可能提前数十分钟触发
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.evaluate)
+
+    def start(self):
+        self.current_entry = None
+        self.evaluate()
+
+    def stop(self):
+        self.timer.stop()
+
+    def evaluate(self):
+        """查表应用当前分钟的取值，并为下一次变化启动定时器"""
+        self.wakeups += 1
+        now = self.clock.now()
+        minute = now.hour * 60 + now.minute
+        entry = self.table.entry(minute)
+        if entry != self.current_entry:
+            self.current_entry = entry
+            self.entry_changed.emit(*entry)
+
+        minutes = self.table.minutes_until_change(minute)
+        if minutes is None:
+            return
+        target = now.replace(second=0, microsecond=0) + timedelta(minutes=minutes)
+        # 按实际经过的时间计算，跨越夏令时切换时不会早或晚一小时
+        self.timer.start(self.clock.ms_until(target))
@@ -0,0 +1,163 @@
+import time
+from datetime import datetime, timedelta, timezone
+from PyQt5.QtCore import QTimer
+
+
+class SystemClock:
+    """真实时钟：本地时间和QTimer"""
+
+    def now(self):
+        """当前本地时间（不带时区的datetime）"""
+        return datetime.now()
+
+    def ms_until(self, local_time):
+        """距离指定本地时间的实际毫秒数（跨越夏令时切换时与本地时间之差不同）"""
+        return max(0, int((local_time.timestamp() - time.time()) * 1000))
+
+    def create_timer(self, parent=None):
+        return QTimer(parent)
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class _Signal:
+    """VirtualTimer.timeout的最小实现，接口与Qt信号的connect/disconnect一致"""
+
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot):
+        self._slots.append(slot)
+
+    def disconnect(self, slot=None):
+        if slot is None:
+            self._slots = []
+        else:
+            self._slots.remove(slot)
+
+    def emit(self):
+        for slot in list(self._slots):
+            slot()
+
+
+class VirtualTimer:
+    """由VirtualClock驱动的定时器，实现程序用到的QTimer接口"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.timeout = _Signal()
+        self._interval = 0
+        self._single_shot = False
+        self._deadline = None  # 到期的单调时间（毫秒），None表示未运行
+        self.fired = 0
+        clock._timers.append(self)
+
+    def setInterval(self, interval):
+        self._interval = int(interval)
+        if self._deadline is not None:
+            self.start()
+
+    def interval(self):
+        return self._interval
+
+    def setSingleShot(self, single_shot):
+        self._single_shot = single_shot
+
+    def isSingleShot(self):
+        return self._single_shot
+
+    def setTimerType(self, timer_type):
+        pass
+
+    def start(self, interval=None):
+        if interval is not None:
+            self._interval = int(interval)
+        self._deadline = self.clock.monotonic_ms + max(0, self._interval)
+        self.clock._sequence += 1
+        self._order = self.clock._sequence
+
+    def stop(self):
+        self._deadline = None
+
+    def isActive(self):
+        return self._deadline is not None
+
+    def remainingTime(self):
+        if self._deadline is None:
+            return -1
+        return max(0, self._deadline - self.clock.monotonic_ms)
+
+    def _fire(self):
+        if self._single_shot:
+            self._deadline = None
+        else:
+            # 与QTimer一样，间隔为0的重复定时器每次事件循环触发，这里至少前进1毫秒
+            self._deadline += max(1, self._interval)
+        self.fired += 1
+        self.timeout.emit()
+
+
+class VirtualClock:
+    """模拟时钟：几毫秒内模拟数天的定时器行为
+
+    与真实系统一样区分两种时间：定时器按单调时间计时，本地时间（墙上时间）由单调时间推进，
+    但在系统休眠（suspend）或手动调整时间（set_wall_time）时单独跳变。指定tz（zoneinfo时区）时，
+    本地时间按该时区换算，推进过程中自动经历夏令时切换。
+    """
+
+    def __init__(self, start, tz=None):
+        """
+        Args:
+            start: 开始时的本地时间（不带时区的datetime）
+            tz: 时区（如ZoneInfo("Europe/Berlin")），None表示没有夏令时的固定时区
+        """
+        self.tz = tz
+        self.monotonic_ms = 0
+        self._wall = start.replace(tzinfo=tz).astimezone(timezone.utc) if tz is not None else start
+        self._timers = []
+        self._sequence = 0
+
+    def now(self):
+        if self.tz is None:
+            return self._wall
+        return self._wall.astimezone(self.tz).replace(tzinfo=None)
+
+    def ms_until(self, local_time):
+        if self.tz is None:
+            delta = local_time - self._wall
+        else:
+            delta = local_time.replace(tzinfo=self.tz).astimezone(timezone.utc) - self._wall
+        return max(0, int(delta.total_seconds() * 1000))
+
+    def create_timer(self, parent=None):
+        return VirtualTimer(self)
+
+    def advance(self, ms):
+        """推进ms毫秒，按到期顺序触发期间的所有定时器"""
+        target = self.monotonic_ms + int(ms)
+        while True:
+            due = [timer for timer in self._timers
+                   if timer._deadline is not None and timer._deadline <= target]
+            if not due:
+                break
+            timer = min(due, key=lambda t: (t._deadline, t._order))
+            self._step_to(timer._deadline)
+            timer._fire()
+        self._step_to(target)
+
+    def advance_to(self, local_time):
+        """推进到指定的本地时间（只能向后）"""
+        self.advance(self.ms_until(local_time))
+
+    def suspend(self, ms):
+        """模拟系统休眠ms毫秒：本地时间前进，单调时间不变，定时器恢复后才继续计时"""
+        self._wall += timedelta(milliseconds=ms)
+
+    def set_wall_time(self, local_time):
+        """模拟手动调整或网络校时造成的本地时间跳变"""
+        self._wall = local_time.replace(tzinfo=self.tz).astimezone(timezone.utc) if self.tz is not None else local_time
+
+    def _step_to(self, monotonic_ms):
+        self._wall += timedelta(milliseconds=monotonic_ms - self.monotonic_ms)
+        self.monotonic_ms = monotonic_ms
@@ -0,0 +1,233 @@
+import time
+
+# 进程开始执行的时间，用于统计启动耗时（必须在其他导入之前）
+STARTUP_BEGIN = time.perf_counter()
+
+import os
+import sys
+import json
+import signal
+import socket
+import argparse
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QCoreApplication, QSocketNotifier, QTimer
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+from brightness_control import SOURCE_USER, SOURCE_PRESET, temperature_tint
+from overlay_engine import OverlayEngine, resident_memory_kb
+from presets import PresetManager, VALID_MODES
+from policy import PolicyManager
+from metrics import create_metrics_exporter, brightness_control_metrics, counter
+
+# 本地套接字名称（Linux/macOS下位于临时目录，Windows下为命名管道）
+SERVER_NAME = "ScreenBrightnessTool-daemon"
+
+# 与main.py相同：设置该环境变量时，就绪后输出启动耗时和内存占用并退出
+STARTUP_PROBE_ENV = "BRIGHTNESS_STARTUP_PROBE"
+
+# 客户端等待回复的超时（毫秒）
+CLIENT_TIMEOUT_MS = 2000
+
+USAGE = "命令: level <0-100> | mode <normal|high_contrast|blue_light> | temperature <K> | preset <名称> | state | stats | quit"
+
+
+class OverlayDaemon:
+    """无界面的遮罩守护进程
+
+    只运行遮罩引擎，不创建主窗口、悬浮窗和托盘图标，也不加载它们的样式和图标。
+    通过本地套接字接收文本命令，每行一条命令，每条命令回复一行（ok ... 或 error ...）。
+    """
+
+    def __init__(self, app, server_name=SERVER_NAME):
+        self.app = app
+        self.startup_ms = None
+        self.policy = PolicyManager.instance()
+        settings = self.policy.settings()
+        self.engine = OverlayEngine(settings)
+        self.brightness_control = self.engine.brightness_control
+        self.presets = PresetManager(settings, settings.value("eye_protect_intensity", 70, type=int))
+
+        # 管理员策略的亮度限制
+        self.apply_policy_limits()
+        self.policy.policy_changed.connect(self.apply_policy_limits)
+
+        # 恢复保存的亮度和模式（合并为一次状态应用）
+        with self.brightness_control.transaction():
+            self.brightness_control.set_brightness(settings.value("brightness", 100, type=int))
+            self.brightness_control.toggle_high_contrast(settings.value("high_contrast", False, type=bool))
+            self.brightness_control.toggle_blue_light_filter(settings.value("blue_light_filter", False, type=bool))
+
+        # 向监控系统导出运行指标（与完整程序相同的设置项，默认关闭）
+        self.metrics_exporter = create_metrics_exporter(settings, started=STARTUP_BEGIN)
+        if self.metrics_exporter:
+            self.metrics_exporter.add_collector(self.collect_metrics)
+
+        self.server = QLocalServer()
+        self.server.newConnection.connect(self._on_new_connection)
+        # 上次异常退出可能留下套接字文件
+        QLocalServer.removeServer(server_name)
+        if not self.server.listen(server_name):
+            raise RuntimeError(f"无法监听本地套接字 {server_name}: {self.server.errorString()}")
+
+    def apply_policy_limits(self, *args):
+        policy = self.policy.policy
+        self.brightness_control.set_limits(policy.min_brightness, policy.allowed_modes)
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            connection.readyRead.connect(lambda connection=connection: self._on_ready_read(connection))
+            connection.disconnected.connect(connection.deleteLater)
+
+    def _on_ready_read(self, connection):
+        while connection.canReadLine():
+            line = bytes(connection.readLine()).decode("utf-8", "replace").strip()
+            if line:
+                connection.write((self.execute(line) + "\n").encode("utf-8"))
+        connection.flush()
+
+    def execute(self, line):
+        """执行一条命令，返回回复文本"""
+        command, _, argument = line.partition(" ")
+        argument = argument.strip()
+        state = self.brightness_control.current_state
+        try:
+            if command == "level":
+                self.brightness_control.apply_state(state._replace(level=max(0, min(100, int(argument)))),
+                                                    SOURCE_USER)
+            elif command == "mode":
+                if argument not in VALID_MODES:
+                    return f"error 未知的模式: {argument}"
+                self.brightness_control.apply_state(state._replace(mode=argument), SOURCE_USER)
+            elif command == "temperature":
+                self.brightness_control.apply_state(
+                    state._replace(tint=temperature_tint(int(argument))), SOURCE_USER)
+            elif command == "preset":
+                resolved = self.presets.resolve(argument, state)
+                if resolved is None:
+                    return f"error 未知的预设: {argument}"
+                self.brightness_control.apply_state(resolved, SOURCE_PRESET)
+            elif command == "state":
+                state = self.brightness_control.state or state
+                return "ok " + json.dumps({
+                    "level": state.level, "mode": state.mode,
+                    "tint": state.tint, "areas": state.areas,
+                })
+            elif command == "stats":
+                return "ok " + json.dumps(self.stats())
+            elif command == "quit":
+                QTimer.singleShot(0, self.app.quit)
+            else:
+                return f"error {USAGE}"
+        except ValueError as exc:
+            return f"error {exc}"
+        return "ok"
+
+    def collect_metrics(self):
+        metrics = brightness_control_metrics(self.brightness_control)
+        metrics.append(counter("settings_flushes_total", "设置写入磁盘的次数", self.policy.flushes))
+        metrics.append(counter("policy_reloads_total", "管理员策略文件重新加载的次数", self.policy.reloads))
+        return metrics
+
+    def stats(self):
+        """启动耗时、常驻内存和遮罩统计"""
+        report = dict(self.brightness_control.overlay_stats())
+        report["startup_ms"] = round(self.startup_ms, 1) if self.startup_ms is not None else None
+        report["rss_kb"] = resident_memory_kb()
+        return report
+
+    def report_startup_time(self):
+        """进入事件循环后记录启动耗时，探测模式下输出并退出（供benchmarks/startup.py使用）"""
+        self.startup_ms = (time.perf_counter() - STARTUP_BEGIN) * 1000.0
+        if os.environ.get(STARTUP_PROBE_ENV):
+            print(f"rss_kb={resident_memory_kb() or 0}")
+            print(f"time_to_ready_ms={self.startup_ms:.1f}", flush=True)
+            self.app.quit()
+
+    def close(self):
+        self.server.close()
+        if self.metrics_exporter:
+            self.metrics_exporter.close()
+        self.engine.close()
+
+
+def install_signal_handlers(app):
+    """收到SIGTERM/SIGINT时退出事件循环
+
+    Qt事件循环运行期间Python信号处理函数不会执行，借助set_wakeup_fd把信号转换为套接字可读事件。
+    """
+    reader, writer = socket.socketpair()
+    reader.setblocking(False)
+    writer.setblocking(False)
+    signal.set_wakeup_fd(writer.fileno())
+    notifier = QSocketNotifier(reader.fileno(), QSocketNotifier.Read, app)
+
+    def on_wakeup():
+        try:
+            reader.recv(64)
+        except OSError:
+            pass
+
+    notifier.activated.connect(on_wakeup)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: app.quit())
+    # 保持引用，避免套接字被回收
+    app._signal_sockets = (reader, writer, notifier)
+
+
+def send_command(command, server_name=SERVER_NAME, timeout=CLIENT_TIMEOUT_MS):
+    """向运行中的守护进程发送一条命令并返回回复，守护进程未运行时返回None"""
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    connection = QLocalSocket()
+    connection.connectToServer(server_name)
+    if not connection.waitForConnected(timeout):
+        return None
+    connection.write((command + "\n").encode("utf-8"))
+    connection.flush()
+    reply = b""
+    while not reply.endswith(b"\n") and connection.waitForReadyRead(timeout):
+        reply += bytes(connection.readAll())
+    connection.disconnectFromServer()
+    return reply.decode("utf-8", "replace").strip()
+
+
+def serve(server_name=SERVER_NAME):
+    app = QApplication(sys.argv[:1])
+    app.setApplicationName("屏幕亮度调节工具")
+    app.setOrganizationName("BrightnessControl")
+    if send_command("state", server_name, timeout=200) is not None:
+        print("遮罩守护进程已经在运行", file=sys.stderr)
+        return 1
+
+    # 没有任何可关闭的窗口，遮罩隐藏时也不能退出
+    app.setQuitOnLastWindowClosed(False)
+    install_signal_handlers(app)
+
+    daemon = OverlayDaemon(app, server_name)
+    QTimer.singleShot(0, daemon.report_startup_time)
+    try:
+        return app.exec_()
+    finally:
+        daemon.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="屏幕亮度调节工具遮罩守护进程：不带参数时启动守护进程，否则向其发送命令",
+        epilog=USAGE)
+    parser.add_argument("--server-name", default=SERVER_NAME, help="本地套接字名称")
+    parser.add_argument("command", nargs="*", help="要发送的命令，例如 level 70")
+    args = parser.parse_args()
+
+    if not args.command:
+        return serve(args.server_name)
+
+    reply = send_command(" ".join(args.command), args.server_name)
+    if reply is None:
+        print("遮罩守护进程未运行", file=sys.stderr)
+        return 2
+    print(reply)
+    return 0 if reply.startswith("ok") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
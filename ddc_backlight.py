@@ -0,0 +1,319 @@
+import os
+import re
+import glob
+import time
+import platform
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QGuiApplication
+from hardware_backend import HardwareBackend, LatestValueWorker
+
+# DDC/CI协议常量
+DDC_CI_ADDRESS = 0x37
+I2C_SLAVE = 0x0703
+VCP_BRIGHTNESS = 0x10
+HOST_ADDRESS = 0x51
+DISPLAY_ADDRESS = 0x6E
+REPLY_CHECKSUM_SEED = 0x50
+VCP_GET_REQUEST = 0x01
+VCP_GET_REPLY = 0x02
+VCP_SET_REQUEST = 0x03
+
+# 显示器处理命令需要的时间（秒），DDC/CI规范要求命令之间至少间隔40-50ms
+DDC_REPLY_DELAY = 0.04
+DDC_COMMAND_INTERVAL = 0.05
+
+DRM_ROOT = "/sys/class/drm"
+
+
+class DDCError(IOError):
+    """DDC/CI通信错误"""
+
+
+def checksum(seed, data):
+    value = seed
+    for byte in data:
+        value ^= byte
+    return value
+
+
+class I2CDevice:
+    """/dev/i2c-* 设备上的DDC/CI连接"""
+
+    def __init__(self, path):
+        import fcntl
+
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR)
+        try:
+            fcntl.ioctl(self.fd, I2C_SLAVE, DDC_CI_ADDRESS)
+        except (OSError, IOError):
+            os.close(self.fd)
+            raise
+
+    def write(self, data):
+        os.write(self.fd, bytes(data))
+
+    def read(self, length):
+        return bytearray(os.read(self.fd, length))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FakeI2CDevice:
+    """用于测试的DDC/CI显示器，模拟VCP命令和传输延迟"""
+
+    def __init__(self, path="fake-i2c", brightness=80, maximum=100, latency=0.0):
+        self.path = path
+        self.vcp = {VCP_BRIGHTNESS: [brightness, maximum]}
+        self.latency = latency
+        self.writes = []
+        self._reply = b""
+
+    def write(self, data):
+        time.sleep(self.latency)
+        data = bytearray(data)
+        self.writes.append(bytes(data))
+        if checksum(DISPLAY_ADDRESS, data[:-1]) != data[-1]:
+            raise DDCError("校验和错误")
+
+        opcode, code = data[2], data[3]
+        current, maximum = self.vcp.get(code, [0, 0])
+        if opcode == VCP_SET_REQUEST:
+            self.vcp[code] = [min(maximum, (data[4] << 8) | data[5]), maximum]
+        elif opcode == VCP_GET_REQUEST:
+            body = bytearray([DISPLAY_ADDRESS, 0x88, VCP_GET_REPLY, 0x00, code, 0x00,
+                              maximum >> 8, maximum & 0xFF, current >> 8, current & 0xFF])
+            self._reply = bytes(body) + bytes([checksum(REPLY_CHECKSUM_SEED, body)])
+
+    def read(self, length):
+        time.sleep(self.latency)
+        reply, self._reply = self._reply, b""
+        return bytearray(reply[:length])
+
+    def close(self):
+        pass
+
+
+class DDCConnection:
+    """在I2C设备上读写VCP功能码（阻塞，只能在工作线程中调用）"""
+
+    def __init__(self, device):
+        self.device = device
+        self._last_command = 0.0
+
+    def _wait_interval(self):
+        elapsed = time.monotonic() - self._last_command
+        if elapsed < DDC_COMMAND_INTERVAL:
+            time.sleep(DDC_COMMAND_INTERVAL - elapsed)
+
+    def _send(self, payload):
+        self._wait_interval()
+        message = bytearray([HOST_ADDRESS, 0x80 | len(payload)]) + bytearray(payload)
+        message.append(checksum(DISPLAY_ADDRESS, message))
+        self.device.write(message)
+        self._last_command = time.monotonic()
+
+    def set_vcp(self, code, value):
+        self._send([VCP_SET_REQUEST, code, (value >> 8) & 0xFF, value & 0xFF])
+
+    def get_vcp(self, code):
+        """读取VCP功能码，返回 (当前值, 最大值)"""
+        self._send([VCP_GET_REQUEST, code])
+        time.sleep(DDC_REPLY_DELAY)
+        reply = self.device.read(11)
+        self._last_command = time.monotonic()
+
+        if len(reply) < 11 or reply[2] != VCP_GET_REPLY or reply[4] != code:
+            raise DDCError("无效的VCP回复")
+        if checksum(REPLY_CHECKSUM_SEED, reply[:10]) != reply[10]:
+            raise DDCError("VCP回复校验和错误")
+        if reply[3] != 0:
+            raise DDCError(f"显示器不支持VCP功能码 0x{code:02X}")
+        return (reply[8] << 8) | reply[9], (reply[6] << 8) | reply[7]
+
+    def close(self):
+        self.device.close()
+
+
+# 接口类型的别名：DRM连接器名和各X驱动对同一种接口的命名不同
+OUTPUT_TYPE_ALIASES = {
+    "DISPLAYPORT": "DP",
+    "HDMIA": "HDMI",
+    "HDMIB": "HDMI",
+    "DVID": "DVI",
+    "DVII": "DVI",
+    "DVIA": "DVI",
+}
+
+
+def output_name_key(name):
+    """把DRM连接器名或X输出名拆成 (接口类型, 编号)
+
+    例如 "card0-HDMI-A-1"、"HDMI-1" 和 "HDMI1" 都变为 ("HDMI", 1)。
+    没有编号时为None（amdgpu驱动把内置面板命名为 "eDP"）。
+    """
+    name = re.sub(r"^card\d+-", "", name).upper()
+    match = re.match(r"^(.*?)-?(\d+)$", name)
+    kind, number = (match.group(1), int(match.group(2))) if match else (name, None)
+    kind = re.sub(r"[^A-Z0-9]", "", kind)
+    return OUTPUT_TYPE_ALIASES.get(kind, kind), number
+
+
+def zero_based_output_names(names):
+    """X驱动是否从0开始给输出编号
+
+    DRM连接器从1开始编号；amdgpu/radeon（"DisplayPort-0"、"HDMI-A-0"）和
+    NVIDIA（"DP-0"）的X驱动从0开始。同一驱动的编号方式相同，所以根据全部屏幕名判断，
+    单个 "HDMI-A-1" 无法区分是DRM的第一个还是amdgpu的第二个HDMI接口。
+    """
+    for name in names:
+        kind, number = output_name_key(name)
+        if number == 0 or "DISPLAYPORT" in name.upper() or (kind == "EDP" and number is None):
+            return True
+    return False
+
+
+def screen_output_key(name, screen_names):
+    """屏幕名（X输出名）对应的DRM连接器 (接口类型, 编号)"""
+    kind, number = output_name_key(name)
+    if number is not None and zero_based_output_names(screen_names):
+        number += 1
+    return kind, number
+
+
+def discover_ddc_buses(drm_root=DRM_ROOT):
+    """根据DRM连接器找到外接显示器对应的I2C总线
+
+    Returns:
+        [(设备路径, 输出名), ...]
+    """
+    buses = []
+    for connector in sorted(glob.glob(os.path.join(drm_root, "card*-*"))):
+        output = os.path.basename(connector)
+        if output_name_key(output)[0] in ("EDP", "LVDS", "DSI"):
+            # 内置面板由sysfs背光后端负责
+            continue
+        try:
+            with open(os.path.join(connector, "status")) as f:
+                if f.read().strip() != "connected":
+                    continue
+        except (OSError, IOError):
+            continue
+
+        bus = None
+        ddc_link = os.path.join(connector, "ddc")
+        if os.path.exists(ddc_link):
+            bus = os.path.basename(os.path.realpath(ddc_link))
+        else:
+            # 部分驱动把I2C适配器作为连接器的子目录
+            for entry in glob.glob(os.path.join(connector, "i2c-*")):
+                bus = os.path.basename(entry)
+                break
+        if bus:
+            buses.append((os.path.join("/dev", bus), re.sub(r"^card\d+-", "", output)))
+    return buses
+
+
+class DDCBacklightBackend(HardwareBackend):
+    """通过DDC/CI（VCP 0x10）调节外接显示器亮度
+
+    每台显示器有自己的工作线程。一次I2C事务需要数十毫秒，拖动滑动条时
+    工作线程只写入最新值，写入后读回亮度并通过level_confirmed报告。
+    """
+
+    name = "ddc"
+
+    def __init__(self, connection, output_name, maximum, parent=None):
+        super(DDCBacklightBackend, self).__init__(0, parent)
+        self.connection = connection
+        self.output_name = output_name
+        self.maximum = max(1, maximum)
+        self.original_value = None
+        self.worker = LatestValueWorker(
+            self._write_value,
+            name=f"ddc-{output_name}",
+            on_applied=self._on_written,
+            on_error=self._on_error,
+        )
+
+    def covers_screen(self, index, name):
+        screen_names = [screen.name() for screen in QGuiApplication.screens()]
+        return screen_output_key(name, screen_names) == output_name_key(self.output_name)
+
+    def write_level(self, level):
+        self.worker.submit(int(round(self.maximum * level / 100.0)))
+
+    def _write_value(self, value):
+        """在工作线程中写入并读回确认"""
+        self.connection.set_vcp(VCP_BRIGHTNESS, value)
+        current, _ = self.connection.get_vcp(VCP_BRIGHTNESS)
+        return current
+
+    def _on_written(self, value, confirmed):
+        self.level_confirmed.emit(int(round(confirmed * 100.0 / self.maximum)))
+
+    def _on_error(self, value, exc):
+        self.write_failed.emit(str(exc))
+
+    def close(self, restore=True):
+        """停止工作线程，restore为True时恢复启动前的亮度
+
+        恢复值同样交给工作线程，排在正在进行的写入之后，GUI线程不做I2C事务。
+        超时仍未写完时不关闭设备，由工作线程完成最后一次写入。
+        """
+        if restore and self.original_value is not None:
+            self.worker.submit(self.original_value)
+        if self.worker.close():
+            self.connection.close()
+
+
+class DDCDiscovery(QObject):
+    """在后台线程中探测支持DDC/CI的显示器，GUI线程不会阻塞在I2C上"""
+
+    # 探测线程发现显示器时发出，跨线程时自动排队到GUI线程
+    monitor_found = pyqtSignal(object, str, int, int)
+    # 在GUI线程中创建好后端后发出
+    backend_found = pyqtSignal(object)
+
+    def __init__(self, buses=None, device_factory=I2CDevice, parent=None):
+        """
+        Args:
+            buses: [(设备路径, 输出名), ...]，None表示从DRM自动发现
+            device_factory: 打开I2C设备的函数，测试时可传入FakeI2CDevice
+        """
+        super(DDCDiscovery, self).__init__(parent)
+        self.buses = buses
+        self.device_factory = device_factory
+        self._thread = None
+        self.monitor_found.connect(self._create_backend)
+
+    def start(self):
+        if platform.system() != "Linux" and self.buses is None:
+            return
+        self._thread = threading.Thread(target=self._run, name="ddc-discovery", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        buses = self.buses if self.buses is not None else discover_ddc_buses()
+        for path, output_name in buses:
+            try:
+                connection = DDCConnection(self.device_factory(path))
+            except (OSError, IOError):
+                continue
+            try:
+                current, maximum = connection.get_vcp(VCP_BRIGHTNESS)
+            except (OSError, IOError):
+                connection.close()
+                continue
+            self.monitor_found.emit(connection, output_name, current, maximum)
+
+    def _create_backend(self, connection, output_name, current, maximum):
+        backend = DDCBacklightBackend(connection, output_name, maximum)
+        backend.original_value = current
+        self.backend_found.emit(backend)
+
+    def wait(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
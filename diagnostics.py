@@ -0,0 +1,89 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QListWidget,
+                             QPlainTextEdit, QPushButton, QApplication)
+from PyQt5.QtGui import QFont
+
+
+class DiagnosticsDialog(QDialog):
+    """诊断信息：事件循环卡顿记录及卡顿时GUI线程的调用栈
+
+    从托盘菜单打开，只在打开时导入。卡顿结束后列表自动刷新。
+    """
+
+    def __init__(self, watchdog, parent=None):
+        super(DiagnosticsDialog, self).__init__(parent)
+        self.watchdog = watchdog
+        self.setWindowTitle("诊断信息")
+        self.resize(640, 480)
+
+        self.status_label = QLabel()
+        self.incident_list = QListWidget()
+        self.incident_list.currentRowChanged.connect(self.show_incident)
+        self.stack_view = QPlainTextEdit()
+        self.stack_view.setReadOnly(True)
+        self.stack_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.stack_view.setFont(QFont("monospace"))
+
+        self.refresh_btn = QPushButton("刷新")
+        self.refresh_btn.clicked.connect(self.refresh)
+        self.copy_btn = QPushButton("复制全部")
+        self.copy_btn.clicked.connect(self.copy_all)
+        self.clear_btn = QPushButton("清空")
+        self.clear_btn.clicked.connect(self.clear)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.refresh_btn)
+        buttons.addWidget(self.copy_btn)
+        buttons.addWidget(self.clear_btn)
+        buttons.addStretch()
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.incident_list, 1)
+        layout.addWidget(self.stack_view, 2)
+        layout.addLayout(buttons)
+
+        if self.watchdog is not None:
+            self.watchdog.incident_finished.connect(self.refresh)
+        self.refresh()
+
+    def incidents(self):
+        # 环形缓冲区可能被看门狗线程追加，先复制；最新的记录排在最前
+        return list(reversed(list(self.watchdog.incidents))) if self.watchdog is not None else []
+
+    def refresh(self, *args):
+        if self.watchdog is None:
+            self.status_label.setText("卡顿监视未启用（设置项 stall_watchdog）")
+            self.copy_btn.setEnabled(False)
+            self.clear_btn.setEnabled(False)
+            return
+        watchdog = self.watchdog
+        self.status_label.setText(
+            f"卡顿阈值 {watchdog.threshold_ms}ms，心跳间隔 {watchdog.interval_ms}ms，"
+            f"已发送心跳 {watchdog.heartbeats} 次，卡顿 {watchdog.stalls} 次（保留最近 {watchdog.incidents.maxlen} 次）")
+        row = max(0, self.incident_list.currentRow())
+        self.incident_list.clear()
+        for incident in self.incidents():
+            self.incident_list.addItem(incident.summary())
+        if self.incident_list.count():
+            self.incident_list.setCurrentRow(min(row, self.incident_list.count() - 1))
+        else:
+            self.stack_view.setPlainText("没有记录到卡顿")
+
+    def show_incident(self, row):
+        incidents = self.incidents()
+        if 0 <= row < len(incidents):
+            self.stack_view.setPlainText(incidents[row].format())
+
+    def copy_all(self):
+        """复制所有记录，便于附在问题报告中"""
+        text = "\n\n".join(incident.format() for incident in self.incidents())
+        QApplication.clipboard().setText(f"{self.status_label.text()}\n\n{text}")
+
+    def clear(self):
+        self.watchdog.incidents.clear()
+        self.refresh()
+
+    def done(self, result):
+        if self.watchdog is not None:
+            self.watchdog.incident_finished.disconnect(self.refresh)
+        super(DiagnosticsDialog, self).done(result)
@@ -2,11 +2,17 @@ from PyQt5.QtWidgets import QWidget, QPushButton, QVBoxLayout, QMenu, QAction, Q
 from PyQt5.QtCore import Qt, QPoint, QRect, QSize, QTimer, QTime
 from PyQt5.QtGui import QIcon, QPainter, QColor, QPen, QScreen, QFont
 import os
+from presets import PRESET_EYE_PROTECT
+from clock import SYSTEM_CLOCK
+
+# 时钟更新间隔（毫秒），使用电池时只显示到分钟，每分钟唤醒一次
+CLOCK_INTERVAL_MS = 1000
 
 class FloatingButton(QWidget):
-    def __init__(self, parent=None, brightness_control=None):
+    def __init__(self, parent=None, brightness_control=None, clock=SYSTEM_CLOCK):
         super(FloatingButton, self).__init__(parent)
         self.brightness_control = brightness_control
+        self.clock = clock
         self.parent_window = parent
         
         # 设置无边框窗口，保持在最前面，并允许在整个屏幕范围内移动
@@ -61,9 +67,11 @@ class FloatingButton(QWidget):
         self.update_screen_geometry()
         
         # 设置时间更新定时器
-        self.time_timer = QTimer(self)
-        self.time_timer.timeout.connect(self.update_time)
-        self.time_timer.start(1000)  # 每秒更新一次
+        self.power_saving = False
+        self.time_timer = self.clock.create_timer(self)
+        self.time_timer.timeout.connect(self._on_time_timer)
+        self.wakeups = 0
+        self.time_timer.start(CLOCK_INTERVAL_MS)  # 每秒更新一次
         
         # 初始显示时间
         self.update_time()
@@ -90,10 +98,44 @@ class FloatingButton(QWidget):
             }}
         """)
     
+    def set_suspended(self, suspended):
+        """屏幕休眠或会话锁定时停止时钟，恢复时立即刷新"""
+        if suspended:
+            self.time_timer.stop()
+        else:
+            self.update_time()
+            self.time_timer.start(self._clock_interval())
+    
+    def set_power_saving(self, enabled):
+        """使用电池时时钟只显示到分钟，并在整分钟时唤醒"""
+        if enabled == self.power_saving:
+            return
+        self.power_saving = enabled
+        if self.time_timer.isActive():
+            self.update_time()
+            self.time_timer.start(self._clock_interval())
+    
+    def _clock_interval(self):
+        """距离下一次需要更新显示的毫秒数"""
+        if not self.power_saving:
+            return CLOCK_INTERVAL_MS
+        now = self.clock.now()
+        return 60000 - now.second * 1000 - now.microsecond // 1000
+    
+    def _on_time_timer(self):
+        self.wakeups += 1
+        self.update_time()
+    
     def update_time(self):
         """更新显示的时间"""
-        current_time = QTime.currentTime()
-        time_text = current_time.toString("HH:mm:ss")
+        current_time = self.clock.now()
+        if self.power_saving:
+            time_text = current_time.strftime("%H:%M")
+            if self.time_timer.isActive():
+                # 每次重新对齐到下一个整分钟
+                self.time_timer.start(self._clock_interval())
+        else:
+            time_text = current_time.strftime("%H:%M:%S")
         
         # 显示时间和亮度
         display_text = f"{time_text}\n{self.current_brightness}%"
@@ -208,19 +250,15 @@ class FloatingButton(QWidget):
         # 添加预设模式
         menu.addSeparator()
         
-        normal_action = menu.addAction("正常模式")
-        normal_action.triggered.connect(lambda: self.set_brightness(100))
-        
-        # 获取护眼模式强度
-        eye_protect_intensity = 70  # 默认值
-        if self.parent_window and hasattr(self.parent_window, 'eye_protect_intensity'):
-            eye_protect_intensity = self.parent_window.eye_protect_intensity
-        
-        dim_action = menu.addAction(f"护眼模式 ({eye_protect_intensity}%)")
-        dim_action.triggered.connect(lambda: self.set_brightness(eye_protect_intensity))
-        
-        night_action = menu.addAction("夜间模式")
-        night_action.triggered.connect(lambda: self.set_brightness(40))
+        # 预设列表（由主窗口管理，切换预设只需一次状态替换）
+        if self.parent_window and hasattr(self.parent_window, 'presets'):
+            for preset in self.parent_window.presets.presets:
+                label = preset.name
+                if preset.name == PRESET_EYE_PROTECT and preset.level is not None:
+                    label = f"{preset.name} ({preset.level}%)"
+                preset_action = menu.addAction(label)
+                preset_action.triggered.connect(
+                    lambda checked=False, name=preset.name: self.parent_window.apply_preset(name))
         
         blue_light_action = menu.addAction("防蓝光")
         blue_light_action.setCheckable(True)
@@ -236,8 +274,9 @@ class FloatingButton(QWidget):
         exit_action = menu.addAction("退出")
         exit_action.triggered.connect(self.parent_window.close_application)
         
-        # 显示菜单
+        # 显示菜单（每次打开都重新创建，关闭后释放，避免隐藏的旧菜单越积越多）
         menu.exec_(self.mapToGlobal(self.main_button.pos()))
+        menu.deleteLater()
     
     def set_brightness(self, value):
         """设置亮度"""
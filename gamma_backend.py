@@ -0,0 +1,177 @@
+from collections import OrderedDict
+from brightness_control import MODE_NORMAL
+from hardware_backend import HardwareBackend
+from x11_connection import X11Connection
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 缓存的伽马表数量上限
+RAMP_CACHE_SIZE = 128
+
+# 伽马调节的最低亮度（百分比），更低的部分由遮罩补足
+DEFAULT_GAMMA_MIN_LEVEL = 10
+
+
+def channel_multipliers(level, tint):
+    """根据亮度和色调计算红绿蓝三个通道的增益"""
+    scale = level / 100.0
+    if not tint:
+        return (scale, scale, scale)
+    strength = tint[3] / 255.0
+    return tuple(scale * (1.0 - strength * (1.0 - c / 255.0)) for c in tint[:3])
+
+
+def build_ramps(base_ramps, multipliers):
+    """按通道增益缩放启动前的伽马表（保留校准/ICC伽马表的曲线形状，有NumPy时向量化计算）"""
+    if np is not None:
+        return [np.clip(np.asarray(ramp, dtype=np.float64) * m, 0, 65535).astype(np.uint16).tolist()
+                for ramp, m in zip(base_ramps, multipliers)]
+
+    return [[min(65535, int(value * m)) for value in ramp] for ramp, m in zip(base_ramps, multipliers)]
+
+
+class GammaRampCache:
+    """按 (CRTC, 亮度, 色调) 缓存伽马表"""
+
+    def __init__(self, max_size=RAMP_CACHE_SIZE):
+        self.max_size = max_size
+        self._ramps = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, crtc, base_ramps, level, tint):
+        key = (crtc, level, tint)
+        ramps = self._ramps.get(key)
+        if ramps is not None:
+            self._ramps.move_to_end(key)
+            self.hits += 1
+            return ramps
+
+        self.misses += 1
+        ramps = build_ramps(base_ramps, channel_multipliers(level, tint))
+        self._ramps[key] = ramps
+        if len(self._ramps) > self.max_size:
+            self._ramps.popitem(last=False)
+        return ramps
+
+
+class XRandRGammaBackend(HardwareBackend):
+    """通过XRandR的CRTC伽马表调节亮度和色温
+
+    伽马表由显卡在扫描输出时应用，不需要合成器逐帧混合遮罩，
+    特殊窗口和菜单也不受遮罩影响。只处理普通模式下的全屏亮度和色调，
+    区域模式、高对比度和防蓝光模式仍由遮罩实现。
+    作为后备后端，只接管没有背光或DDC控制的屏幕，也只写入分配给它的输出的CRTC。
+    """
+
+    name = "gamma"
+    fallback = True
+
+    def __init__(self, connection, min_level=DEFAULT_GAMMA_MIN_LEVEL, parent=None):
+        super(XRandRGammaBackend, self).__init__(min_level, parent)
+        self.connection = connection
+        self.display = connection.display
+        self.cache = GammaRampCache()
+        self.crtcs = {}  # 输出名 -> CRTC
+        self.gamma_sizes = {}  # CRTC -> 伽马表大小
+        self.original_ramps = {}  # CRTC -> 启动前的伽马表
+        self.assigned_crtcs = set()  # 分配给本后端的输出对应的CRTC
+        self.refresh_crtcs()
+
+    def refresh_crtcs(self):
+        """读取所有已连接输出对应的CRTC及其伽马表"""
+        resources = self.connection.root.xrandr_get_screen_resources()
+        timestamp = resources.config_timestamp
+        self.crtcs = {}
+        for output in resources.outputs:
+            info = self.display.xrandr_get_output_info(output, timestamp)
+            if not info.crtc:
+                continue
+            self.crtcs[info.name] = info.crtc
+            if info.crtc not in self.gamma_sizes:
+                self.gamma_sizes[info.crtc] = self.display.xrandr_get_crtc_gamma_size(info.crtc).size
+                gamma = self.display.xrandr_get_crtc_gamma(info.crtc)
+                self.original_ramps[info.crtc] = (list(gamma.red), list(gamma.green), list(gamma.blue))
+
+    def covers_screen(self, index, name):
+        crtc = self.crtcs.get(name)
+        return crtc is not None and self.gamma_sizes.get(crtc, 0) > 1
+
+    def assign_screens(self, names):
+        """只调节分配给本后端的输出，不再负责的CRTC恢复启动前的伽马表"""
+        crtcs = {self.crtcs[name] for name in names if name in self.crtcs}
+        if crtcs == self.assigned_crtcs:
+            return
+        self._restore(self.assigned_crtcs - crtcs)
+        self.assigned_crtcs = crtcs
+        # 新分配的CRTC需要重新写入当前的伽马表
+        self.requested_level = None
+
+    def split_state(self, state):
+        """伽马表承担亮度和色调，遮罩只补足低于最低亮度的部分
+
+        Returns:
+            ((伽马亮度, 色调), 遮罩状态)
+        """
+        if state.areas or state.mode != MODE_NORMAL:
+            return (100, None), state
+
+        gamma_level = max(state.level, self.min_level, 1)
+        overlay_state = state._replace(level=int(round(state.level * 100.0 / gamma_level)), tint=None)
+        return (gamma_level, state.tint), overlay_state
+
+    def set_level(self, request):
+        """应用 (亮度, 色调) 到分配的CRTC，重复的请求会被忽略"""
+        if request == self.requested_level:
+            return
+        self.requested_level = request
+        self.write_level(request)
+
+    def write_level(self, request):
+        level, tint = request
+        for crtc in self.assigned_crtcs:
+            size = self.gamma_sizes.get(crtc, 0)
+            if size <= 1:
+                continue
+            red, green, blue = self.cache.get(crtc, self.original_ramps[crtc], level, tint)
+            self.display.xrandr_set_crtc_gamma(crtc, size, red, green, blue)
+        self.connection.flush()
+        # 伽马表在X服务器上同步生效，请求发出即视为确认
+        self.level_confirmed.emit(level)
+
+    def current_ramps(self, output_name):
+        """读取输出当前的伽马表 (red, green, blue)，用于验证"""
+        gamma = self.display.xrandr_get_crtc_gamma(self.crtcs[output_name])
+        return list(gamma.red), list(gamma.green), list(gamma.blue)
+
+    def _restore(self, crtcs):
+        """恢复CRTC启动前的伽马表"""
+        if not crtcs:
+            return
+        for crtc in crtcs:
+            red, green, blue = self.original_ramps[crtc]
+            self.display.xrandr_set_crtc_gamma(crtc, len(red), red, green, blue)
+        self.connection.flush()
+
+    def close(self, restore=True):
+        if restore:
+            self._restore(self.assigned_crtcs)
+
+
+def create_gamma_backend(connection=None, min_level=DEFAULT_GAMMA_MIN_LEVEL):
+    """创建XRandR伽马后端，X服务器不支持RandR伽马时返回None
+
+    Args:
+        connection: X11Connection，测试时可传入连接到Xvfb的连接
+    """
+    connection = connection or X11Connection.instance()
+    if connection is None or not connection.display.has_extension("RANDR"):
+        return None
+    try:
+        backend = XRandRGammaBackend(connection, min_level)
+    except Exception:
+        return None
+    return backend if backend.gamma_sizes else None
@@ -0,0 +1,277 @@
+import json
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from x11_connection import X11Connection
+
+# 热键动作
+ACTION_STEP_UP = "step_up"
+ACTION_STEP_DOWN = "step_down"
+PRESET_ACTION_PREFIX = "preset:"
+
+# 默认全局热键
+DEFAULT_STEP_UP_HOTKEY = "Ctrl+Alt+Up"
+DEFAULT_STEP_DOWN_HOTKEY = "Ctrl+Alt+Down"
+
+# 每帧最多应用一次状态（约60Hz）
+FRAME_INTERVAL_MS = 16
+
+
+def preset_action(name):
+    """预设热键的动作名"""
+    return PRESET_ACTION_PREFIX + name
+
+
+def load_preset_hotkeys(settings):
+    """从设置项"hotkey_presets"读取 {预设名称: 热键}，格式错误时忽略整个设置或无效条目"""
+    try:
+        entries = json.loads(settings.value("hotkey_presets", "{}", type=str) or "{}")
+    except ValueError:
+        return {}
+    if not isinstance(entries, dict):
+        return {}
+    return {str(name): hotkey for name, hotkey in entries.items() if isinstance(hotkey, str)}
+
+
+class HotkeyBackend(QObject):
+    """全局热键后端基类
+
+    后端负责在系统范围内注册热键，按下时发出activated信号（包括自动重复）。
+    """
+
+    activated = pyqtSignal(str)
+
+    def register(self, action, hotkey):
+        """注册热键，成功返回True，由子类覆盖（基类不注册任何热键）"""
+        return False
+
+    def unregister_all(self):
+        """注销所有热键，由子类覆盖"""
+        pass
+
+    def close(self):
+        self.unregister_all()
+
+
+class FakeHotkeyBackend(HotkeyBackend):
+    """用于测试的热键后端，通过trigger()模拟按键"""
+
+    def __init__(self, parent=None):
+        super(FakeHotkeyBackend, self).__init__(parent)
+        self.bindings = {}
+
+    def register(self, action, hotkey):
+        self.bindings[action] = hotkey
+        return True
+
+    def unregister_all(self):
+        self.bindings = {}
+
+    def trigger(self, action, count=1):
+        """模拟按下热键，count>1时模拟自动重复"""
+        for _ in range(count):
+            self.activated.emit(action)
+
+
+# Qt风格的键名到X keysym名称的映射（其余键名直接使用或转为小写）
+X11_KEY_NAMES = {
+    "PgUp": "Prior",
+    "PgDown": "Next",
+    "Esc": "Escape",
+    "Ins": "Insert",
+    "Del": "Delete",
+    "=": "equal",
+    "+": "plus",
+    "-": "minus",
+    "[": "bracketleft",
+    "]": "bracketright",
+    ",": "comma",
+    ".": "period",
+}
+
+
+class X11HotkeyBackend(HotkeyBackend):
+    """基于XGrabKey的Linux全局热键后端"""
+
+    def __init__(self, connection, parent=None):
+        super(X11HotkeyBackend, self).__init__(parent)
+        from Xlib import X
+
+        self.connection = connection
+        self._grabs = {}  # (keycode, modifiers) -> action
+        self._modifier_masks = {
+            "Ctrl": X.ControlMask,
+            "Alt": X.Mod1Mask,
+            "Shift": X.ShiftMask,
+            "Meta": X.Mod4Mask,
+        }
+        # NumLock(Mod2)和CapsLock(Lock)状态不应影响热键
+        self._ignored_masks = (0, X.LockMask, X.Mod2Mask, X.LockMask | X.Mod2Mask)
+        self._relevant_mask = X.ControlMask | X.Mod1Mask | X.ShiftMask | X.Mod4Mask
+
+        connection.add_handler(X.KeyPress, self._on_key_press)
+
+    def parse_hotkey(self, hotkey):
+        """解析 "Ctrl+Alt+Up" 形式的热键，返回 (keycode, modifiers)，无效时返回None"""
+        from Xlib import XK
+
+        parts = hotkey.replace("++", "+plus").split("+")
+        modifiers = 0
+        for part in parts[:-1]:
+            mask = self._modifier_masks.get(part.strip())
+            if mask is None:
+                return None
+            modifiers |= mask
+
+        key = parts[-1].strip()
+        key = X11_KEY_NAMES.get(key, key)
+        keysym = XK.string_to_keysym(key)
+        if not keysym:
+            keysym = XK.string_to_keysym(key.lower())
+        if not keysym:
+            return None
+
+        keycode = self.connection.display.keysym_to_keycode(keysym)
+        if not keycode:
+            return None
+        return keycode, modifiers
+
+    def register(self, action, hotkey):
+        """注册热键，热键无效或已被其他程序占用（BadAccess）时返回False
+
+        XGrabKey的错误是异步返回的，注册后同步一次X连接以便得到结果。
+        """
+        from Xlib import X, error
+
+        parsed = self.parse_hotkey(hotkey)
+        if parsed is None:
+            return False
+        keycode, modifiers = parsed
+
+        root = self.connection.root
+        catcher = error.CatchError(error.BadAccess)
+        for ignored in self._ignored_masks:
+            root.grab_key(keycode, modifiers | ignored, True, X.GrabModeAsync, X.GrabModeAsync, onerror=catcher)
+        self.connection.display.sync()
+        # sync时可能已读入事件，交给事件循环处理
+        self.connection.flush()
+        if catcher.get_error():
+            for ignored in self._ignored_masks:
+                root.ungrab_key(keycode, modifiers | ignored)
+            self.connection.flush()
+            return False
+        self._grabs[(keycode, modifiers)] = action
+        return True
+
+    def unregister_all(self):
+        root = self.connection.root
+        for keycode, modifiers in self._grabs:
+            for ignored in self._ignored_masks:
+                root.ungrab_key(keycode, modifiers | ignored)
+        self._grabs = {}
+        self.connection.flush()
+
+    def close(self):
+        from Xlib import X
+
+        self.unregister_all()
+        self.connection.remove_handler(X.KeyPress, self._on_key_press)
+
+    def _on_key_press(self, event):
+        action = self._grabs.get((event.detail, event.state & self._relevant_mask))
+        if action:
+            self.activated.emit(action)
+
+
+def create_hotkey_backend(parent=None):
+    """创建当前平台可用的全局热键后端，不支持时返回None"""
+    connection = X11Connection.instance()
+    if connection is not None:
+        try:
+            return X11HotkeyBackend(connection, parent)
+        except Exception:
+            return None
+    return None
+
+
+class HotkeyManager(QObject):
+    """全局热键管理
+
+    自动重复产生的按键会在一帧内合并：一帧内的多次调节累加为一次亮度变化，
+    按住热键时亮度平滑变化而不会堆积大量遮罩更新。
+    """
+
+    brightness_step = pyqtSignal(int)  # 合并后的亮度变化量
+    preset_requested = pyqtSignal(str)  # 预设名称
+
+    def __init__(self, backend, step=5, frame_interval=FRAME_INTERVAL_MS, parent=None):
+        super(HotkeyManager, self).__init__(parent)
+        self.backend = backend
+        self.step = step
+        self._pending_delta = 0
+        self._pending_preset = None
+
+        # 统计信息：收到的按键事件数和实际应用次数
+        self.events_received = 0
+        self.applications = 0
+
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.setInterval(frame_interval)
+        self._frame_timer.timeout.connect(self._flush)
+
+        self.backend.activated.connect(self._on_activated)
+
+    def bind(self, step_up=DEFAULT_STEP_UP_HOTKEY, step_down=DEFAULT_STEP_DOWN_HOTKEY, presets=None):
+        """注册热键
+
+        Args:
+            step_up: 提高亮度热键
+            step_down: 降低亮度热键
+            presets: {预设名称: 热键}
+
+        Returns:
+            注册失败的热键列表
+        """
+        self.backend.unregister_all()
+        bindings = [(ACTION_STEP_UP, step_up), (ACTION_STEP_DOWN, step_down)]
+        for name, hotkey in (presets or {}).items():
+            bindings.append((preset_action(name), hotkey))
+
+        failed = []
+        for action, hotkey in bindings:
+            if hotkey and not self.backend.register(action, hotkey):
+                failed.append(hotkey)
+        return failed
+
+    def _on_activated(self, action):
+        self.events_received += 1
+        if action == ACTION_STEP_UP:
+            self._pending_delta += self.step
+        elif action == ACTION_STEP_DOWN:
+            self._pending_delta -= self.step
+        elif action.startswith(PRESET_ACTION_PREFIX):
+            # 预设会覆盖之前累积的调节
+            self._pending_preset = action[len(PRESET_ACTION_PREFIX):]
+            self._pending_delta = 0
+        else:
+            return
+
+        if not self._frame_timer.isActive():
+            self._frame_timer.start()
+
+    def _flush(self):
+        """每帧应用一次合并后的热键请求"""
+        preset, delta = self._pending_preset, self._pending_delta
+        self._pending_preset = None
+        self._pending_delta = 0
+
+        if preset is None and delta == 0:
+            return
+        self.applications += 1
+        if preset is not None:
+            self.preset_requested.emit(preset)
+        if delta:
+            self.brightness_step.emit(delta)
+
+    def close(self):
+        self._frame_timer.stop()
+        self.backend.close()
@@ -0,0 +1,154 @@
+import logging
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+from brightness_control import MODE_NORMAL
+
+logger = logging.getLogger(__name__)
+
+_NO_VALUE = object()
+
+
+class LatestValueWorker:
+    """只处理最新值的后台写入线程
+
+    submit()不会阻塞调用线程；工作线程忙碌期间提交的多个值只保留最后一个，
+    中间值直接丢弃（例如拖动滑动条时产生的大量中间亮度）。
+    """
+
+    def __init__(self, apply_func, name="LatestValueWorker", on_applied=None, on_error=None):
+        """
+        Args:
+            apply_func: 在工作线程中执行的写入函数 apply_func(value)
+            on_applied: 写入成功后在工作线程中调用 on_applied(value, result)
+            on_error: 写入失败后在工作线程中调用 on_error(value, exception)
+        """
+        self._apply_func = apply_func
+        self._on_applied = on_applied
+        self._on_error = on_error
+        self._condition = threading.Condition()
+        self._pending = _NO_VALUE
+        self._closed = False
+
+        # 统计信息
+        self.submitted = 0
+        self.applied = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, value):
+        """提交新值，覆盖尚未处理的旧值"""
+        with self._condition:
+            if self._closed:
+                return
+            if self._pending is not _NO_VALUE:
+                self.dropped += 1
+            self._pending = value
+            self.submitted += 1
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is _NO_VALUE and not self._closed:
+                    self._condition.wait()
+                if self._pending is _NO_VALUE:
+                    return
+                value, self._pending = self._pending, _NO_VALUE
+
+            try:
+                self._process(value)
+            except Exception:
+                # 回调中的意外错误也不能结束线程，否则之后提交的值都不会再写入
+                logger.exception("%s: 处理 %r 的回调出错", self._thread.name, value)
+
+    def _process(self, value):
+        try:
+            result = self._apply_func(value)
+        except Exception as exc:
+            self.errors += 1
+            if not isinstance(exc, (OSError, IOError, ValueError)):
+                logger.exception("%s: 写入 %r 时出现意外错误", self._thread.name, value)
+            if self._on_error:
+                self._on_error(value, exc)
+            return
+
+        self.applied += 1
+        if self._on_applied:
+            self._on_applied(value, result)
+
+    def close(self, timeout=1.0):
+        """处理完最后一个待写入值后停止线程，线程在超时前结束时返回True"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+
+class HardwareBackend(QObject):
+    """硬件亮度后端基类
+
+    后端接管渲染状态中硬件能够实现的部分，其余部分仍由遮罩绘制。
+    所有硬件写入都在后台线程中进行，GUI线程从不阻塞。
+    """
+
+    # 硬件确认后的亮度（0-100），从工作线程发出，跨线程时自动排队到GUI线程；用于诊断和测试
+    level_confirmed = pyqtSignal(int)
+    write_failed = pyqtSignal(str)
+
+    name = "hardware"
+    # 后备后端只接管其他后端都不负责的屏幕
+    fallback = False
+
+    def __init__(self, min_level=0, parent=None):
+        super(HardwareBackend, self).__init__(parent)
+        self.min_level = min_level  # 硬件可达到的最低亮度（百分比）
+        self.requested_level = None
+
+    def covers_screen(self, index, name):
+        """是否负责指定的屏幕"""
+        return True
+
+    def assign_screens(self, names):
+        """记录分配给本后端的屏幕（输出名列表），屏幕布局或后端变化时调用"""
+        pass
+
+    def split_state(self, state):
+        """计算硬件亮度和遮罩仍需实现的状态，不产生副作用
+
+        只有普通模式下的全屏亮度交给硬件；区域模式下硬件无法只调节局部，
+        高对比度和防蓝光滤镜的强度也依赖遮罩的亮度，都保持硬件为满亮度，由遮罩处理。
+        低于硬件最低亮度的部分由遮罩补足，使 硬件亮度 × 遮罩亮度 = 目标亮度。
+
+        Returns:
+            (硬件亮度, 遮罩状态)
+        """
+        if state.areas or state.mode != MODE_NORMAL:
+            return 100, state
+
+        hardware_level = max(state.level, self.min_level, 1)
+        return hardware_level, state._replace(level=int(round(state.level * 100.0 / hardware_level)))
+
+    def apply_state(self, state):
+        """把状态中硬件能实现的部分交给硬件，返回遮罩仍需实现的状态"""
+        hardware_level, overlay_state = self.split_state(state)
+        self.set_level(hardware_level)
+        return overlay_state
+
+    def set_level(self, level):
+        """请求硬件亮度（非阻塞），重复的请求会被忽略"""
+        if level == self.requested_level:
+            return
+        self.requested_level = level
+        self.write_level(level)
+
+    def write_level(self, level):
+        """把亮度交给后台线程写入，由子类覆盖（基类不写入任何硬件）"""
+        pass
+
+    def close(self, restore=True):
+        """停止后台线程，restore为True时恢复启动前的硬件亮度"""
+        pass
@@ -1,12 +1,34 @@
+import time
+
+# 进程开始执行的时间，用于统计启动到托盘图标出现的耗时（必须在其他导入之前）
+STARTUP_BEGIN = time.perf_counter()
+
 import sys
 import os
+import logging
 import platform
 from PyQt5.QtWidgets import QApplication, QMessageBox
-from PyQt5.QtCore import QSettings, QTime, QLockFile, QDir
+from functools import partial
+from PyQt5.QtCore import Qt, QTime, QTimer, QLockFile, QDir, QStandardPaths
 from PyQt5.QtGui import QIcon, QColor
 from main_window import MainWindow
-from brightness_control import BrightnessControl
+from policy import PolicyManager
+from brightness_control import SOURCE_RULE, SOURCE_SCHEDULE, temperature_tint
+from overlay_engine import OverlayEngine, resident_memory_kb
+from scheduler import set_schedule_suspended
 from floating_button import FloatingButton
+from adaptive_dimming import AdaptiveDimmer
+from usage_journal import UsageJournal
+from global_hotkeys import (HotkeyManager, create_hotkey_backend, load_preset_hotkeys,
+                            DEFAULT_STEP_UP_HOTKEY, DEFAULT_STEP_DOWN_HOTKEY)
+
+# 启动到托盘图标出现的时间预算（毫秒），每次登录自启动都要经历
+DEFAULT_STARTUP_BUDGET_MS = 800
+
+# 设置该环境变量时，托盘出现后输出启动耗时并退出（供benchmarks/startup.py使用）
+STARTUP_PROBE_ENV = "BRIGHTNESS_STARTUP_PROBE"
+
+logger = logging.getLogger(__name__)
 
 class BrightnessApp:
     def __init__(self):
@@ -33,8 +55,16 @@ class BrightnessApp:
         # 设置应用程序图标
         self.set_app_icon()
         
-        # 初始化亮度控制器
-        self.brightness_control = BrightnessControl()
+        # 叠加了管理员策略（锁定值和默认值）的设置，与主窗口读取的相同
+        self.settings = PolicyManager.instance().settings()
+        
+        # 初始化遮罩引擎：亮度控制器、硬件亮度后端和特殊窗口检测
+        self.engine = OverlayEngine(self.settings)
+        self.brightness_control = self.engine.brightness_control
+        
+        # 本地使用记录，用于分析亮度、模式和定时任务的使用情况
+        self.usage_journal = None
+        self.setup_usage_journal()
         
         # 初始化主窗口
         self.main_window = MainWindow()
@@ -43,7 +73,7 @@ class BrightnessApp:
         self.main_window.set_brightness_control(self.brightness_control)
         
         # 获取悬浮球颜色设置
-        settings = QSettings("BrightnessControl", "BrightnessAdjuster")
+        settings = self.settings
         bg_color = settings.value("float_bg_color", QColor(30, 30, 30, 180))
         if isinstance(bg_color, str):
             bg_color = QColor(bg_color)
@@ -64,11 +94,45 @@ class BrightnessApp:
         # 连接信号与槽
         self.connect_signals()
         
+        # 全局热键
+        self.hotkey_manager = None
+        self.setup_global_hotkeys()
+        
+        # 按前台应用自动切换亮度
+        self.app_rule_engine = None
+        self.setup_app_rules()
+        
+        # 根据屏幕内容自适应调光
+        self.adaptive_dimmer = AdaptiveDimmer(self.brightness_control)
+        self.adaptive_dimmer.level_suggested.connect(self.set_slider_brightness)
+        self.main_window.adaptive_checkbox.setEnabled(self.adaptive_dimmer.available)
+        self.main_window.adaptive_checkbox.toggled.connect(self.adaptive_dimmer.set_enabled)
+        
         # 检查是否需要设置自启动
         self.check_autostart()
         
         # 应用已保存的设置
         self.apply_saved_settings()
+        
+        # 昼夜亮度曲线（启用后代替定时功能）
+        self.circadian_scheduler = None
+        self.setup_circadian()
+        
+        # 会话锁定、系统休眠或屏幕保护时暂停所有遮罩相关的定时工作
+        self.session_monitor = None
+        self.setup_session_monitor()
+        
+        # 事件循环卡顿监视（事件循环开始运行后启动）
+        self.stall_watchdog = None
+        self.setup_stall_watchdog()
+        
+        # 向监控系统导出运行指标（设置项metrics_socket/metrics_port/metrics_file，默认关闭）
+        self.metrics_exporter = None
+        self.setup_metrics()
+        
+        # 使用电池时降低唤醒频率，接通电源后恢复
+        self.power_monitor = None
+        self.setup_power_monitor()
     
     def set_app_icon(self):
         """设置应用程序图标"""
@@ -126,6 +190,209 @@ class BrightnessApp:
         # 应用设置时保存当前状态
         self.main_window.apply_btn.clicked.connect(self.save_settings)
     
+    def setup_usage_journal(self):
+        """记录每次状态变化到应用数据目录下的usage.journal（可通过设置项usage_journal关闭）"""
+        settings = self.settings
+        if not settings.value("usage_journal", True, type=bool):
+            return
+        
+        directory = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+        self.usage_journal = UsageJournal(os.path.join(directory, "usage.journal"))
+        self.brightness_control.state_listeners.append(self.usage_journal.record_state)
+    
+    def setup_global_hotkeys(self):
+        """注册全局亮度调节和预设热键（当前平台不支持时跳过）"""
+        backend = create_hotkey_backend()
+        if backend is None:
+            return
+        
+        settings = self.settings
+        step_up = settings.value("hotkey_step_up", DEFAULT_STEP_UP_HOTKEY, type=str)
+        step_down = settings.value("hotkey_step_down", DEFAULT_STEP_DOWN_HOTKEY, type=str)
+        
+        self.hotkey_manager = HotkeyManager(backend, step=settings.value("hotkey_step", 5, type=int))
+        failed = self.hotkey_manager.bind(step_up, step_down, load_preset_hotkeys(settings))
+        if failed:
+            logger.warning("无法注册全局热键（无效或已被其他程序占用）: %s", ", ".join(failed))
+        self.hotkey_manager.brightness_step.connect(self.step_brightness)
+        self.hotkey_manager.preset_requested.connect(self.main_window.apply_preset)
+    
+    def setup_app_rules(self):
+        """加载按应用的亮度规则，没有规则或当前平台不支持时跳过"""
+        settings = self.settings
+        if not settings.contains("app_rules"):
+            return
+        
+        from app_rules import AppRuleEngine, RuleMatcher, create_active_window_provider, load_rules
+        
+        rules = load_rules(settings)
+        if not rules:
+            return
+        
+        provider = create_active_window_provider()
+        if provider is None:
+            return
+        
+        self.app_rule_engine = AppRuleEngine(
+            provider,
+            RuleMatcher(rules),
+            self.brightness_control,
+            partial(self.main_window.apply_render_state, source=SOURCE_RULE),
+            presets=self.main_window.presets,
+        )
+    
+    def setup_circadian(self):
+        """按设置项circadian_curve的关键帧编译每分钟的亮度/色温表并启动调度"""
+        settings = self.settings
+        if not settings.value("circadian_enabled", False, type=bool):
+            return
+        
+        from circadian import CircadianTable, CircadianScheduler, load_keyframes
+        
+        self.circadian_scheduler = CircadianScheduler(CircadianTable(load_keyframes(settings)))
+        self.circadian_scheduler.entry_changed.connect(self.apply_circadian_entry)
+        self.main_window.scheduler_timer.stop()
+        self.circadian_scheduler.start()
+    
+    def setup_session_monitor(self):
+        """监听会话锁定和屏幕休眠（可通过设置项suspend_when_locked关闭）"""
+        settings = self.settings
+        if not settings.value("suspend_when_locked", True, type=bool):
+            return
+        
+        from session_monitor import create_session_monitor
+        
+        self.session_monitor = create_session_monitor()
+        if self.session_monitor:
+            self.session_monitor.suspended_changed.connect(self.set_suspended)
+    
+    def set_suspended(self, suspended):
+        """暂停或恢复遮罩、悬浮窗时钟、自适应调光、使用记录和定时任务"""
+        self.brightness_control.set_suspended(suspended)
+        self.floating_button.set_suspended(suspended)
+        self.adaptive_dimmer.set_suspended(suspended)
+        if self.usage_journal:
+            self.usage_journal.set_suspended(suspended)
+        if self.metrics_exporter:
+            self.metrics_exporter.set_suspended(suspended)
+        if self.stall_watchdog:
+            self.stall_watchdog.set_suspended(suspended)
+        if self.power_monitor and not suspended:
+            # 休眠期间可能插拔了电源
+            self.power_monitor.refresh()
+        
+        set_schedule_suspended(suspended, self.circadian_scheduler, self.main_window.scheduler_timer,
+                               self.main_window.check_scheduled_tasks)
+    
+    def setup_power_monitor(self):
+        """读取/sys/class/power_supply判断是否使用电池（可通过设置项battery_throttling关闭）"""
+        settings = self.settings
+        if not settings.value("battery_throttling", True, type=bool):
+            return
+        
+        from power_supply import create_power_monitor
+        
+        self.power_monitor = create_power_monitor()
+        if self.power_monitor is None:
+            return
+        self.ui_effects_enabled = QApplication.isEffectEnabled(Qt.UI_General)
+        self.power_monitor.on_battery_changed.connect(self.set_power_saving)
+        if self.power_monitor.on_battery:
+            self.set_power_saving(True)
+    
+    def setup_stall_watchdog(self):
+        """监视GUI线程的事件循环，卡顿超过阈值时记录调用栈（可通过设置项stall_watchdog关闭）"""
+        settings = self.settings
+        if not settings.value("stall_watchdog", True, type=bool):
+            return
+        
+        from stall_watchdog import StallWatchdog, DEFAULT_THRESHOLD_MS
+        
+        self.stall_watchdog = StallWatchdog(settings.value("stall_threshold_ms", DEFAULT_THRESHOLD_MS, type=int))
+        self.main_window.stall_watchdog = self.stall_watchdog
+    
+    def setup_metrics(self):
+        """按设置创建指标导出，指标在抓取时才收集"""
+        from metrics import create_metrics_exporter
+        
+        self.metrics_exporter = create_metrics_exporter(self.settings, started=STARTUP_BEGIN)
+        if self.metrics_exporter:
+            self.metrics_exporter.add_collector(self.collect_metrics)
+    
+    def collect_metrics(self):
+        """遮罩引擎以及各模块的定时器唤醒次数、唤醒频率和设置写入次数"""
+        from metrics import brightness_control_metrics, counter, gauge
+        
+        metrics = brightness_control_metrics(self.brightness_control)
+        wakeups = {
+            "clock": self.floating_button.wakeups,
+            "adaptive": self.adaptive_dimmer.samples,
+            "schedule": self.main_window.schedule_checks,
+            "circadian": self.circadian_scheduler.wakeups if self.circadian_scheduler else 0,
+            "power": self.power_monitor.refreshes if self.power_monitor else 0,
+        }
+        for timer, count in wakeups.items():
+            metrics.append(counter("timer_wakeups_total", "各模块定时器累计唤醒次数", count, timer=timer))
+        if self.stall_watchdog:
+            metrics.append(counter("timer_wakeups_total", "各模块定时器累计唤醒次数",
+                                   self.stall_watchdog.heartbeats, timer="watchdog"))
+            metrics.append(counter("event_loop_stalls_total", "事件循环卡顿次数", self.stall_watchdog.stalls))
+        report = self.wakeup_report()
+        report.pop("total")
+        for timer, rate in report.items():
+            metrics.append(gauge("timer_wakeups_per_second", "各模块周期定时器按当前间隔估算的每秒唤醒次数",
+                                 round(rate, 3), timer=timer))
+        metrics.append(counter("settings_flushes_total", "设置写入磁盘的次数", self.main_window.policy.flushes))
+        metrics.append(counter("policy_reloads_total", "管理员策略文件重新加载的次数", self.main_window.policy.reloads))
+        return metrics
+    
+    def set_power_saving(self, enabled):
+        """使用电池时延长遮罩检查、悬浮窗时钟和自适应采样的间隔，关闭界面动画"""
+        self.brightness_control.set_power_saving(enabled)
+        self.floating_button.set_power_saving(enabled)
+        self.adaptive_dimmer.set_power_saving(enabled)
+        if self.stall_watchdog:
+            self.stall_watchdog.set_power_saving(enabled)
+        QApplication.setEffectEnabled(Qt.UI_General, self.ui_effects_enabled and not enabled)
+        
+        if logger.isEnabledFor(logging.INFO):
+            report = self.wakeup_report()
+            logger.info("power_mode=%s wakeups_per_sec=%.3f %s", "battery" if enabled else "ac", report.pop("total"),
+                        " ".join(f"{name}={rate:.3f}" for name, rate in report.items()))
+    
+    def wakeup_report(self):
+        """各模块周期定时器每秒的唤醒次数"""
+        from power_supply import timer_wakeups_per_second
+        
+        groups = {
+            "overlays": self.brightness_control.timers(),
+            "clock": [self.floating_button.time_timer],
+            "adaptive": [self.adaptive_dimmer.timer],
+            "schedule": [self.main_window.scheduler_timer],
+            "circadian": [self.circadian_scheduler.timer] if self.circadian_scheduler else [],
+            "power": [self.power_monitor.poll_timer] if self.power_monitor else [],
+            "metrics": self.metrics_exporter.timers() if self.metrics_exporter else [],
+        }
+        report = {name: timer_wakeups_per_second(timers) for name, timers in groups.items()}
+        report["watchdog"] = self.stall_watchdog.wakeups_per_second() if self.stall_watchdog else 0.0
+        report["total"] = sum(report.values())
+        return report
+    
+    def apply_circadian_entry(self, level, temperature):
+        """应用曲线上的亮度和色温，保留当前的模式和区域"""
+        state = self.brightness_control.current_state._replace(
+            level=level, tint=temperature_tint(temperature))
+        self.main_window.apply_render_state(state, SOURCE_SCHEDULE)
+    
+    def step_brightness(self, delta):
+        """按合并后的变化量调节亮度，经由滑动条信号同步到遮罩和悬浮窗"""
+        self.set_slider_brightness(self.main_window.brightness_slider.value() + delta)
+    
+    def set_slider_brightness(self, value):
+        """设置亮度滑动条（限制在滑动条范围内），经由滑动条信号同步到遮罩和悬浮窗"""
+        slider = self.main_window.brightness_slider
+        slider.setValue(max(slider.minimum(), min(slider.maximum(), value)))
+    
     def update_floating_button_brightness(self, value):
         """更新悬浮按钮显示的亮度值"""
         if self.floating_button:
@@ -141,8 +408,8 @@ class BrightnessApp:
             self.floating_button.hide()
     
     def apply_saved_settings(self):
-        """应用上次保存的设置"""
-        settings = QSettings("BrightnessControl", "BrightnessAdjuster")
+        """应用上次保存的设置（叠加了管理员策略）"""
+        settings = self.main_window.settings
         
         # 获取保存的亮度值，默认为100
         brightness = settings.value("brightness", 100, type=int)
@@ -156,10 +423,11 @@ class BrightnessApp:
         # 获取保存的悬浮按钮设置，默认为True
         show_floating_button = settings.value("show_floating_button", True, type=bool)
         
-        # 直接应用亮度设置到亮度控制器
-        self.brightness_control.set_brightness(brightness)
-        self.brightness_control.toggle_high_contrast(high_contrast)
-        self.brightness_control.toggle_blue_light_filter(blue_light)
+        # 直接应用亮度设置到亮度控制器（合并为一次状态应用，每个遮罩只重绘一次）
+        with self.brightness_control.transaction():
+            self.brightness_control.set_brightness(brightness)
+            self.brightness_control.toggle_high_contrast(high_contrast)
+            self.brightness_control.toggle_blue_light_filter(blue_light)
         
         # 然后设置UI状态，避免触发重复的更改事件
         self.main_window.brightness_slider.blockSignals(True)
@@ -181,6 +449,9 @@ class BrightnessApp:
         self.floating_button.current_brightness = brightness
         self.floating_button.update_button_text()
         
+        # 恢复自适应调光
+        self.adaptive_dimmer.set_enabled(self.main_window.adaptive_checkbox.isChecked())
+        
         # 恢复区域选择模式
         area_mode = settings.value("area_mode", False, type=bool)
         if area_mode and hasattr(self.main_window, 'area_mode_checkbox'):
@@ -189,7 +460,7 @@ class BrightnessApp:
     
     def save_settings(self):
         """保存当前设置"""
-        settings = QSettings("BrightnessControl", "BrightnessAdjuster")
+        settings = self.main_window.settings
         
         # 保存当前亮度值
         settings.setValue("brightness", self.main_window.brightness_value)
@@ -214,7 +485,7 @@ class BrightnessApp:
     
     def check_autostart(self):
         """检查是否需要设置自启动"""
-        settings = QSettings("BrightnessControl", "BrightnessAdjuster")
+        settings = self.settings
         auto_start = settings.value("auto_start", False, type=bool)
         
         if auto_start:
@@ -289,11 +560,54 @@ class BrightnessApp:
         # 显示主窗口（这会自动隐藏悬浮按钮）
         self.main_window.show()
         
+        # 托盘图标在主窗口创建时显示，事件循环开始运行即视为启动完成
+        QTimer.singleShot(0, self.report_startup_time)
+        if self.stall_watchdog:
+            QTimer.singleShot(0, self.stall_watchdog.start)
+        
         return self.app.exec_()
     
+    def report_startup_time(self):
+        """统计启动到托盘图标出现的耗时，超出预算时输出警告"""
+        self.startup_ms = (time.perf_counter() - STARTUP_BEGIN) * 1000.0
+        settings = self.settings
+        budget = settings.value("startup_budget_ms", DEFAULT_STARTUP_BUDGET_MS, type=int)
+        
+        if self.startup_ms > budget:
+            print(f"启动耗时 {self.startup_ms:.0f}ms，超出预算 {budget}ms", file=sys.stderr)
+        
+        if os.environ.get(STARTUP_PROBE_ENV):
+            for entry in self.brightness_control.memory_report():
+                print("overlay_memory screen={screen} mode={mode} surface_bytes={surface_bytes} "
+                      "saved_bytes={saved_bytes}".format(**entry))
+            print(f"rss_kb={resident_memory_kb() or 0}")
+            print(f"time_to_tray_ms={self.startup_ms:.1f} budget_ms={budget}", flush=True)
+            self.app.quit()
+    
     def cleanup(self):
         """清理资源"""
-        self.brightness_control.cleanup()
+        if self.hotkey_manager:
+            self.hotkey_manager.close()
+        
+        if self.app_rule_engine:
+            self.app_rule_engine.close()
+        
+        if self.session_monitor:
+            self.session_monitor.close()
+        
+        if self.power_monitor:
+            self.power_monitor.close()
+        
+        if self.metrics_exporter:
+            self.metrics_exporter.close()
+        
+        if self.stall_watchdog:
+            self.stall_watchdog.close()
+        
+        self.engine.close()
+        
+        if self.usage_journal:
+            self.usage_journal.close()
 
         # 关闭悬浮按钮
         if self.floating_button:
@@ -1,13 +1,51 @@
 import sys
 import os
+import time
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                             QSlider, QLabel, QPushButton, QCheckBox, QGroupBox, 
                             QApplication, QSystemTrayIcon, QMenu, QAction,
                             QTimeEdit, QGridLayout, QSpinBox, QComboBox, QShortcut,
-                            QColorDialog, QFrame)
+                            QFrame, QInputDialog, QMessageBox)
 from PyQt5.QtCore import Qt, QSettings, QTime, QTimer, QUrl
-from PyQt5.QtGui import QIcon, QFont, QKeySequence, QColor, QPalette
-import webbrowser  # 使用Python标准库的webbrowser模块打开URL
+from PyQt5.QtGui import QIcon, QFont, QKeySequence, QColor
+from brightness_control import (SOURCE_USER, SOURCE_PRESET, SOURCE_SCHEDULE,
+                                MODE_NORMAL, MODE_HIGH_CONTRAST, MODE_BLUE_LIGHT, tint_temperature)
+from presets import (PresetManager, Preset, PRESET_NORMAL, PRESET_EYE_PROTECT,
+                     PRESET_NIGHT, PRESET_BLUE_LIGHT)
+from policy import PolicyManager, LIMIT_MIN_BRIGHTNESS, LIMIT_ALLOWED_MODES
+from clock import SYSTEM_CLOCK
+from scheduler import TimeRangeSchedule, CHECK_INTERVAL_MS
+from themes import ThemeManager, THEME_LIGHT, THEME_DARK
+
+# 旧版本按索引保存的定时模式
+LEGACY_TIMER_MODES = [PRESET_EYE_PROTECT, PRESET_NIGHT, PRESET_BLUE_LIGHT]
+
+# 滑动条的最小值（策略可以进一步提高）
+BRIGHTNESS_SLIDER_MIN = 10
+EYE_PROTECT_SLIDER_MIN = 30
+EYE_PROTECT_SLIDER_MAX = 90
+
+# 可由策略设置或锁定的设置项 -> (控件属性名, 设置方法, 值类型, 程序默认值)
+POLICY_WIDGETS = {
+    "timer_enabled": ("timer_checkbox", "setChecked", bool, False),
+    "timer_time": ("timer_start_time_edit", "setTime", QTime, QTime(22, 0)),
+    "timer_end_time": ("timer_end_time_edit", "setTime", QTime, QTime(6, 0)),
+    "timer_preset": ("timer_mode_combo", "setCurrentText", str, PRESET_EYE_PROTECT),
+    "high_contrast": ("high_contrast_checkbox", "setChecked", bool, False),
+    "blue_light_filter": ("blue_light_checkbox", "setChecked", bool, False),
+    "adaptive_dimming": ("adaptive_checkbox", "setChecked", bool, False),
+    "eye_protect_intensity": ("eye_protect_intensity_slider", "setValue", int, 70),
+    "show_floating_button": ("floating_btn_checkbox", "setChecked", bool, True),
+    "dark_mode": ("dark_mode_checkbox", "setChecked", bool, False),
+    "area_mode": ("area_mode_checkbox", "setChecked", bool, False),
+    "auto_start": ("autostart_checkbox", "setChecked", bool, False),
+}
+
+# 只在启用定时时可编辑的设置项
+TIMER_DETAIL_KEYS = ("timer_time", "timer_end_time", "timer_preset")
+
+# 模式复选框对应的模式，策略不允许该模式时禁用
+MODE_WIDGET_KEYS = {"high_contrast": MODE_HIGH_CONTRAST, "blue_light_filter": MODE_BLUE_LIGHT}
 
 class ColorPickerButton(QPushButton):
     """颜色选择按钮"""
@@ -20,6 +58,9 @@ class ColorPickerButton(QPushButton):
     
     def pick_color(self):
         """打开颜色选择对话框"""
+        # 颜色对话框很少使用，打开时才导入
+        from PyQt5.QtWidgets import QColorDialog
+        
         color = QColorDialog.getColor(self.color, self, "选择颜色", QColorDialog.ShowAlphaChannel)
         if color.isValid():
             self.color = color
@@ -48,11 +89,16 @@ class ColorPickerButton(QPushButton):
         return self.color
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, clock=SYSTEM_CLOCK):
         super(MainWindow, self).__init__()
         
-        # 初始化设置
-        self.settings = QSettings("BrightnessControl", "BrightnessAdjuster")
+        # 时钟和定时器来源，模拟时传入VirtualClock
+        self.clock = clock
+        self.schedule = TimeRangeSchedule(clock)
+        
+        # 初始化设置（叠加管理员策略：锁定值 > 用户设置 > 策略默认值）
+        self.policy = PolicyManager.instance()
+        self.settings = self.policy.settings()
         self.brightness_value = self.settings.value("brightness", 100, type=int)
         self.auto_start = self.settings.value("auto_start", False, type=bool)
         self.blue_light_filter = self.settings.value("blue_light_filter", False, type=bool)
@@ -60,7 +106,14 @@ class MainWindow(QMainWindow):
         self.timer_time = self.settings.value("timer_time", QTime(22, 0), type=QTime)
         self.timer_end_time = self.settings.value("timer_end_time", QTime(6, 0), type=QTime)
         self.timer_mode = self.settings.value("timer_mode", 0, type=int)
+        self.timer_preset = self.settings.value("timer_preset", "", type=str)
+        if not self.timer_preset and 0 <= self.timer_mode < len(LEGACY_TIMER_MODES):
+            self.timer_preset = LEGACY_TIMER_MODES[self.timer_mode]
         self.eye_protect_intensity = self.settings.value("eye_protect_intensity", 70, type=int)
+        
+        # 预设管理（加载时编译）
+        self.presets = PresetManager(self.settings, self.eye_protect_intensity)
+        self.brightness_control = None
         self.dark_mode = self.settings.value("dark_mode", False, type=bool)  # 新增暗黑模式设置
         
         # 设置应用图标
@@ -82,9 +135,11 @@ class MainWindow(QMainWindow):
         
         # 设置窗口属性
         self.setWindowTitle("屏幕亮度调节工具")
-        self.setFixedSize(500, 650)  # 增加窗口高度以适应定时切换内容
+        self.setFixedSize(500, 690)  # 增加窗口高度以适应定时切换和预设内容
         
         # 设置应用主题
+        self.theme_manager = ThemeManager(self)
+        self.theme_manager.add_window(self)
         self.apply_theme()
         
         # 创建中央部件
@@ -100,7 +155,7 @@ class MainWindow(QMainWindow):
         self.brightness_layout.setContentsMargins(10, 0, 10, 10)  # 设置边距：左、上、右、下
         
         self.brightness_slider = QSlider(Qt.Horizontal)
-        self.brightness_slider.setMinimum(10)
+        self.brightness_slider.setMinimum(BRIGHTNESS_SLIDER_MIN)
         self.brightness_slider.setMaximum(100)
         self.brightness_slider.setValue(self.brightness_value)
         self.brightness_slider.setFixedWidth(300)
@@ -116,8 +171,8 @@ class MainWindow(QMainWindow):
         # 护眼模式强度设置
         self.eye_protect_intensity_label = QLabel("护眼模式强度:")
         self.eye_protect_intensity_slider = QSlider(Qt.Horizontal)
-        self.eye_protect_intensity_slider.setMinimum(30)  # 最低亮度为30%
-        self.eye_protect_intensity_slider.setMaximum(90)  # 最高亮度为90%
+        self.eye_protect_intensity_slider.setMinimum(EYE_PROTECT_SLIDER_MIN)  # 最低亮度为30%
+        self.eye_protect_intensity_slider.setMaximum(EYE_PROTECT_SLIDER_MAX)  # 最高亮度为90%
         self.eye_protect_intensity_slider.setValue(self.eye_protect_intensity)
         self.eye_protect_intensity_slider.setFixedWidth(300)
         self.eye_protect_intensity_value_label = QLabel(f"{self.eye_protect_intensity}%")
@@ -135,8 +190,13 @@ class MainWindow(QMainWindow):
         self.blue_light_checkbox = QCheckBox("防蓝光模式")
         self.blue_light_checkbox.setChecked(self.blue_light_filter)
         
+        self.adaptive_checkbox = QCheckBox("自适应调光")
+        self.adaptive_checkbox.setToolTip("根据屏幕内容自动调节亮度：明亮页面调暗，深色界面调亮")
+        self.adaptive_checkbox.setChecked(self.settings.value("adaptive_dimming", False, type=bool))
+        
         self.checkbox_layout.addWidget(self.high_contrast_checkbox)
         self.checkbox_layout.addWidget(self.blue_light_checkbox)
+        self.checkbox_layout.addWidget(self.adaptive_checkbox)
         self.checkbox_layout.addStretch()
         
         # 第三行：特殊模式复选框
@@ -212,7 +272,22 @@ class MainWindow(QMainWindow):
         self.modes_layout.addWidget(self.dim_mode_btn)
         self.modes_layout.addWidget(self.night_mode_btn)
         
-        self.modes_group.setLayout(self.modes_layout)
+        # 自定义预设：选择、保存当前状态、删除
+        self.preset_layout = QHBoxLayout()
+        self.preset_combo = QComboBox()
+        self.apply_preset_btn = QPushButton("应用")
+        self.save_preset_btn = QPushButton("保存当前")
+        self.delete_preset_btn = QPushButton("删除")
+        self.preset_layout.addWidget(self.preset_combo, 1)
+        self.preset_layout.addWidget(self.apply_preset_btn)
+        self.preset_layout.addWidget(self.save_preset_btn)
+        self.preset_layout.addWidget(self.delete_preset_btn)
+        
+        self.modes_outer_layout = QVBoxLayout()
+        self.modes_outer_layout.addLayout(self.modes_layout)
+        self.modes_outer_layout.addLayout(self.preset_layout)
+        
+        self.modes_group.setLayout(self.modes_outer_layout)
         
         # 悬浮球设置组
         self.float_group = QGroupBox("悬浮窗设置")
@@ -298,8 +373,9 @@ class MainWindow(QMainWindow):
         self.timer_mode_label = QLabel("定时模式:")
         self.timer_mode_label.setMinimumWidth(80)  # 设置最小宽度
         self.timer_mode_combo = QComboBox()
-        self.timer_mode_combo.addItems(["护眼模式", "夜间模式", "防蓝光模式"])
-        self.timer_mode_combo.setCurrentIndex(self.timer_mode)
+        
+        # 填充预设列表
+        self.refresh_preset_lists()
         
         # 第一行：启用定时
         self.timer_layout.addWidget(self.timer_checkbox, 0, 0, 1, 2)
@@ -410,9 +486,12 @@ class MainWindow(QMainWindow):
         # 连接信号和槽
         self.brightness_slider.valueChanged.connect(self.update_brightness)
         self.eye_protect_intensity_slider.valueChanged.connect(self.update_eye_protect_intensity)
-        self.normal_mode_btn.clicked.connect(lambda: self.set_brightness_mode(100))
-        self.dim_mode_btn.clicked.connect(self.set_eye_protect_mode)
-        self.night_mode_btn.clicked.connect(lambda: self.set_brightness_mode(40))
+        self.normal_mode_btn.clicked.connect(lambda: self.apply_preset(PRESET_NORMAL))
+        self.dim_mode_btn.clicked.connect(lambda: self.apply_preset(PRESET_EYE_PROTECT))
+        self.night_mode_btn.clicked.connect(lambda: self.apply_preset(PRESET_NIGHT))
+        self.apply_preset_btn.clicked.connect(lambda: self.apply_preset(self.preset_combo.currentText()))
+        self.save_preset_btn.clicked.connect(self.save_current_as_preset)
+        self.delete_preset_btn.clicked.connect(self.delete_selected_preset)
         self.reset_btn.clicked.connect(self.reset_settings)
         self.apply_btn.clicked.connect(self.apply_settings)
         self.autostart_checkbox.toggled.connect(self.toggle_autostart)
@@ -421,7 +500,6 @@ class MainWindow(QMainWindow):
         self.timer_checkbox.toggled.connect(self.toggle_timer)
         self.exit_hotkey_combo.currentIndexChanged.connect(self.update_exit_hotkey)
         self.github_btn.clicked.connect(self.open_github)
-        self.dark_mode_checkbox.toggled.connect(self.toggle_dark_mode)
         self.area_mode_checkbox.toggled.connect(self.toggle_area_mode)
         
         # 系统托盘图标
@@ -435,6 +513,146 @@ class MainWindow(QMainWindow):
 
         # 悬浮按钮引用
         self.floating_button = None
+        
+        # 事件循环卡顿监视（由BrightnessApp设置），在诊断信息中查看
+        self.stall_watchdog = None
+        
+        # 管理员策略：应用限制和锁定，策略文件变化时只重新应用变化的项
+        self.apply_policy_limits()
+        self.update_policy_controls()
+        self.policy.policy_changed.connect(self.on_policy_changed)
+    
+    def apply_policy_limits(self):
+        """应用策略的最低亮度和允许的模式"""
+        policy = self.policy.policy
+        self.brightness_slider.setMinimum(max(BRIGHTNESS_SLIDER_MIN, policy.min_brightness))
+        self.eye_protect_intensity_slider.setMinimum(
+            min(EYE_PROTECT_SLIDER_MAX, max(EYE_PROTECT_SLIDER_MIN, policy.min_brightness)))
+        if self.brightness_control:
+            self.brightness_control.set_limits(policy.min_brightness, policy.allowed_modes)
+    
+    def update_policy_controls(self):
+        """锁定的设置项和策略不允许的模式对应的控件不可编辑"""
+        policy = self.policy.policy
+        for key, (name, _, _, _) in POLICY_WIDGETS.items():
+            enabled = not self.policy.is_locked(key)
+            if key in TIMER_DETAIL_KEYS:
+                enabled = enabled and self.timer_enabled
+            mode = MODE_WIDGET_KEYS.get(key)
+            if mode is not None and policy.allowed_modes is not None:
+                enabled = enabled and mode in policy.allowed_modes
+            getattr(self, name).setEnabled(enabled)
+    
+    def on_policy_changed(self, policy, changed):
+        """策略文件变化：只重新应用变化的项，值没有变化的控件不会发出信号
+
+        解除锁定或删除策略默认值后，用户没有自己的值时控件恢复程序默认值。
+        """
+        if changed & {LIMIT_MIN_BRIGHTNESS, LIMIT_ALLOWED_MODES}:
+            self.apply_policy_limits()
+        for key in changed & POLICY_WIDGETS.keys():
+            name, setter, value_type, default = POLICY_WIDGETS[key]
+            getattr(getattr(self, name), setter)(self.settings.value(key, default, type=value_type))
+        self.update_policy_controls()
+    
+    def refresh_preset_lists(self):
+        """刷新预设下拉框和定时模式下拉框"""
+        current = self.preset_combo.currentText()
+        self.preset_combo.blockSignals(True)
+        self.preset_combo.clear()
+        self.preset_combo.addItems(self.presets.names())
+        if current:
+            self.preset_combo.setCurrentText(current)
+        self.preset_combo.blockSignals(False)
+        
+        # 定时模式可选除正常模式外的所有预设，时间段外恢复正常模式
+        timer_preset = self.timer_mode_combo.currentText() or self.timer_preset
+        self.timer_mode_combo.blockSignals(True)
+        self.timer_mode_combo.clear()
+        self.timer_mode_combo.addItems([name for name in self.presets.names() if name != PRESET_NORMAL])
+        index = self.timer_mode_combo.findText(timer_preset)
+        self.timer_mode_combo.setCurrentIndex(index if index >= 0 else 0)
+        self.timer_mode_combo.blockSignals(False)
+    
+    def apply_preset(self, name, source=SOURCE_PRESET, default_mode=None):
+        """切换到指定预设：一次状态替换，然后同步界面控件
+        
+        Args:
+            source: 状态变化的来源，定时任务传入SOURCE_SCHEDULE
+            default_mode: 预设没有指定模式时使用的模式，None表示保持当前模式
+        
+        Returns:
+            是否成功应用
+        """
+        if not self.brightness_control:
+            return False
+        
+        start = time.perf_counter()
+        state = self.presets.resolve(name, self.brightness_control.current_state)
+        if state is None:
+            return False
+        if default_mode is not None and self.presets.get(name).mode is None:
+            state = state._replace(mode=default_mode)
+        
+        self.apply_render_state(state, source)
+        self.presets.record_switch((time.perf_counter() - start) * 1000.0)
+        return True
+    
+    def apply_render_state(self, state, source=SOURCE_USER):
+        """一次性应用完整的渲染状态并同步界面控件"""
+        if not self.brightness_control:
+            return
+        self.brightness_control.apply_state(state, source)
+        self.sync_controls_to_state(state)
+    
+    def sync_controls_to_state(self, state):
+        """让界面控件反映渲染状态，不触发信号以避免重复应用"""
+        widgets = (self.brightness_slider, self.high_contrast_checkbox, self.blue_light_checkbox)
+        for widget in widgets:
+            widget.blockSignals(True)
+        
+        self.brightness_slider.setValue(state.level)
+        self.high_contrast_checkbox.setChecked(self.brightness_control.is_high_contrast)
+        self.blue_light_checkbox.setChecked(self.brightness_control.is_blue_light_filter)
+        
+        for widget in widgets:
+            widget.blockSignals(False)
+        
+        self.update_brightness(self.brightness_slider.value())
+        self.blue_light_filter = self.brightness_control.is_blue_light_filter
+        
+        if self.floating_button:
+            self.floating_button.current_brightness = self.brightness_value
+            self.floating_button.update_button_text()
+    
+    def save_current_as_preset(self):
+        """将当前亮度状态保存为用户预设"""
+        if not self.brightness_control:
+            return
+        name, ok = QInputDialog.getText(self, "保存预设", "预设名称:")
+        name = name.strip()
+        if not ok or not name:
+            return
+        
+        existing = self.presets.get(name)
+        if existing is not None and existing.builtin:
+            QMessageBox.warning(self, "保存预设", "不能覆盖内置预设。")
+            return
+        
+        state = self.brightness_control.current_state
+        preset = Preset(name, state.level, state.mode, tint_temperature(state.tint), state.areas, False)
+        self.presets.add(preset)
+        self.brightness_control.precompile([self.presets.resolve(name, state)])
+        self.refresh_preset_lists()
+        self.preset_combo.setCurrentText(name)
+    
+    def delete_selected_preset(self):
+        """删除选中的用户预设"""
+        name = self.preset_combo.currentText()
+        if not self.presets.remove(name):
+            QMessageBox.information(self, "删除预设", "内置预设不能删除。")
+            return
+        self.refresh_preset_lists()
     
     def load_icon(self):
         """加载应用图标"""
@@ -473,14 +691,11 @@ class MainWindow(QMainWindow):
         self.eye_protect_intensity = value
         self.eye_protect_intensity_value_label.setText(f"{value}%")
         self.settings.setValue("eye_protect_intensity", value)
+        self.presets.set_eye_protect_intensity(value)
     
     def set_brightness_mode(self, value):
         self.brightness_slider.setValue(value)
     
-    def set_eye_protect_mode(self):
-        """使用自定义护眼模式强度"""
-        self.brightness_slider.setValue(self.eye_protect_intensity)
-    
     def toggle_autostart(self, state):
         self.auto_start = state
         # 实现开机自启动的逻辑
@@ -501,9 +716,7 @@ class MainWindow(QMainWindow):
     
     def toggle_timer(self, state):
         self.timer_enabled = state
-        self.timer_start_time_edit.setEnabled(state)
-        self.timer_end_time_edit.setEnabled(state)
-        self.timer_mode_combo.setEnabled(state)
+        self.update_policy_controls()
     
     def update_exit_hotkey(self, index):
         # 根据选择的索引更新退出热键
@@ -531,56 +744,24 @@ class MainWindow(QMainWindow):
     
     def setup_timer(self):
         # 创建定时器
-        self.scheduler_timer = QTimer(self)
+        self.scheduler_timer = self.clock.create_timer(self)
         self.scheduler_timer.timeout.connect(self.check_scheduled_tasks)
-        self.scheduler_timer.start(60000)  # 每分钟检查一次
+        self.scheduler_timer.start(CHECK_INTERVAL_MS)  # 每分钟检查一次
+        self.schedule_checks = 0
     
     def check_scheduled_tasks(self):
-        # 检查是否开启了定时功能
-        if not self.timer_enabled:
-            return
-        
-        current_time = QTime.currentTime()
-        scheduled_start_time = self.timer_start_time_edit.time()
-        scheduled_end_time = self.timer_end_time_edit.time()
-        
-        # 跨天情况处理
-        is_in_time_range = False
-        if scheduled_start_time < scheduled_end_time:
-            # 正常情况：开始时间早于结束时间
-            is_in_time_range = scheduled_start_time <= current_time < scheduled_end_time
-        else:
-            # 跨天情况：开始时间晚于结束时间（例如晚上10点到早上6点）
-            is_in_time_range = current_time >= scheduled_start_time or current_time < scheduled_end_time
-        
-        # 根据是否在时间范围内执行相应操作
-        mode_index = self.timer_mode_combo.currentIndex()
-        
-        # 如果在时间范围内且之前未应用设置
-        if is_in_time_range and not getattr(self, 'timer_applied', False):
-            self.apply_timer_mode(mode_index)
-            self.timer_applied = True
-        # 如果不在时间范围内且之前已应用设置
-        elif not is_in_time_range and getattr(self, 'timer_applied', False):
-            # 恢复正常模式
-            self.set_brightness_mode(100)
-            self.blue_light_checkbox.setChecked(False)
-            self.high_contrast_checkbox.setChecked(False)
-            self.timer_applied = False
-    
-    def apply_timer_mode(self, mode_index):
-        """应用定时模式设置"""
-        if mode_index == 0:  # 护眼模式
-            self.set_brightness_mode(self.eye_protect_intensity)
-            self.blue_light_checkbox.setChecked(False)
-            self.high_contrast_checkbox.setChecked(False)
-        elif mode_index == 1:  # 夜间模式
-            self.set_brightness_mode(40)
-            self.blue_light_checkbox.setChecked(False)
-            self.high_contrast_checkbox.setChecked(False)
-        elif mode_index == 2:  # 防蓝光模式
-            self.blue_light_checkbox.setChecked(True)
-            self.high_contrast_checkbox.setChecked(False)
+        # 按界面上的定时设置检查是否需要切换（时间段判断见scheduler.TimeRangeSchedule）
+        self.schedule_checks += 1
+        self.schedule.configure(
+            self.timer_enabled,
+            self.timer_start_time_edit.time().toPyTime(),
+            self.timer_end_time_edit.time().toPyTime(),
+            self.timer_mode_combo.currentText(),
+        )
+        preset = self.schedule.check()
+        if preset:
+            # 与原来的定时切换一致：没有指定模式的预设（以及时间段结束时的正常模式）关闭高对比度和防蓝光
+            self.apply_preset(preset, SOURCE_SCHEDULE, default_mode=MODE_NORMAL)
     
     def reset_settings(self):
         self.brightness_slider.setValue(100)
@@ -591,11 +772,12 @@ class MainWindow(QMainWindow):
         self.timer_checkbox.setChecked(False)
         self.timer_start_time_edit.setTime(QTime(22, 0))
         self.timer_end_time_edit.setTime(QTime(6, 0))
-        self.timer_mode_combo.setCurrentIndex(0)
+        self.timer_mode_combo.setCurrentText(PRESET_EYE_PROTECT)
         self.exit_hotkey_combo.setCurrentIndex(0)
         self.floating_btn_checkbox.setChecked(True)
         self.dark_mode_checkbox.setChecked(False)  # 重置暗黑模式设置
         self.area_mode_checkbox.setChecked(False)  # 重置区域模式设置
+        self.adaptive_checkbox.setChecked(False)
         
         # 重置悬浮球颜色设置
         self.float_bg_color = QColor(30, 30, 30, 180)
@@ -618,11 +800,12 @@ class MainWindow(QMainWindow):
         self.settings.setValue("timer_enabled", self.timer_enabled)
         self.settings.setValue("timer_time", self.timer_start_time_edit.time())
         self.settings.setValue("timer_end_time", self.timer_end_time_edit.time())
-        self.settings.setValue("timer_mode", self.timer_mode_combo.currentIndex())
+        self.settings.setValue("timer_preset", self.timer_mode_combo.currentText())
         self.settings.setValue("exit_shortcut", self.exit_shortcut)
         self.settings.setValue("show_floating_button", self.floating_btn_checkbox.isChecked())
         self.settings.setValue("dark_mode", self.dark_mode)  # 保存暗黑模式设置
         self.settings.setValue("area_mode", self.area_mode_checkbox.isChecked())  # 保存区域模式设置
+        self.settings.setValue("adaptive_dimming", self.adaptive_checkbox.isChecked())
         
         # 保存悬浮球颜色设置
         self.settings.setValue("float_bg_color", self.float_bg_color)
@@ -651,16 +834,41 @@ class MainWindow(QMainWindow):
         show_action = QAction("显示", self)
         show_action.triggered.connect(self.show)
         
+        # 预设子菜单，每次打开时按当前预设列表重建
+        self.tray_preset_menu = QMenu("预设", tray_menu)
+        self.tray_preset_menu.aboutToShow.connect(self.populate_tray_preset_menu)
+        
+        diagnostics_action = QAction("诊断信息", self)
+        diagnostics_action.triggered.connect(self.show_diagnostics)
+        
         quit_action = QAction("退出", self)
         quit_action.triggered.connect(self.close_application)
         
         tray_menu.addAction(show_action)
+        tray_menu.addMenu(self.tray_preset_menu)
+        tray_menu.addAction(diagnostics_action)
         tray_menu.addSeparator()
         tray_menu.addAction(quit_action)
         
         self.tray_icon.setContextMenu(tray_menu)
         self.tray_icon.show()
     
+    def show_diagnostics(self):
+        """显示事件循环卡顿记录"""
+        # 很少使用，打开时才导入
+        from diagnostics import DiagnosticsDialog
+        
+        dialog = DiagnosticsDialog(self.stall_watchdog, self)
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        dialog.show()
+    
+    def populate_tray_preset_menu(self):
+        """重建托盘的预设子菜单"""
+        self.tray_preset_menu.clear()
+        for name in self.presets.names():
+            action = self.tray_preset_menu.addAction(name)
+            action.triggered.connect(lambda checked=False, n=name: self.apply_preset(n))
+    
     def closeEvent(self, event):
         # 点击关闭按钮时最小化到系统托盘而不是退出
         event.ignore()
@@ -698,108 +906,14 @@ class MainWindow(QMainWindow):
 
     def open_github(self):
         """打开GitHub官方网站"""
+        # webbrowser会导入大量标准库模块，只在点击时导入
+        import webbrowser
+        
         webbrowser.open("https://github.com/sikuai2333/ScreenBrightnessTool")
 
-    # 添加暗黑模式相关方法
     def apply_theme(self):
-        """应用当前主题设置"""
-        if self.dark_mode:
-            self.set_dark_theme()
-        else:
-            self.set_light_theme()
-            
-    def set_dark_theme(self):
-        """设置暗黑主题"""
-        app = QApplication.instance()
-        palette = QPalette()
-        
-        # 设置暗色调色板
-        palette.setColor(QPalette.Window, QColor(53, 53, 53))
-        palette.setColor(QPalette.WindowText, Qt.white)
-        palette.setColor(QPalette.Base, QColor(35, 35, 35))
-        palette.setColor(QPalette.AlternateBase, QColor(53, 53, 53))
-        palette.setColor(QPalette.ToolTipBase, QColor(25, 25, 25))
-        palette.setColor(QPalette.ToolTipText, Qt.white)
-        palette.setColor(QPalette.Text, Qt.white)
-        palette.setColor(QPalette.Button, QColor(53, 53, 53))
-        palette.setColor(QPalette.ButtonText, Qt.white)
-        palette.setColor(QPalette.BrightText, Qt.red)
-        palette.setColor(QPalette.Link, QColor(42, 130, 218))
-        palette.setColor(QPalette.Highlight, QColor(42, 130, 218))
-        palette.setColor(QPalette.HighlightedText, Qt.black)
-        
-        app.setPalette(palette)
-        
-        # 设置样式表
-        app.setStyleSheet("""
-            QGroupBox {
-                border: 1px solid #555;
-                border-radius: 5px;
-                margin-top: 10px;
-                padding-top: 15px;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                subcontrol-position: top left;
-                padding: 0 8px;
-                color: #ddd;
-            }
-            QPushButton {
-                background-color: #444;
-                border: 1px solid #555;
-                border-radius: 3px;
-                color: #ddd;
-                padding: 5px;
-            }
-            QPushButton:hover {
-                background-color: #555;
-            }
-            QPushButton:pressed {
-                background-color: #666;
-            }
-            QSlider::groove:horizontal {
-                height: 8px;
-                background: #444;
-                border-radius: 4px;
-            }
-            QSlider::handle:horizontal {
-                background: #ddd;
-                border: 1px solid #777;
-                width: 18px;
-                border-radius: 9px;
-                margin: -5px 0;
-            }
-            QCheckBox {
-                color: #ddd;
-            }
-            QLabel {
-                color: #ddd;
-            }
-            QComboBox {
-                background-color: #444;
-                color: #ddd;
-                border: 1px solid #555;
-                border-radius: 3px;
-                padding: 2px 5px;
-            }
-            QTimeEdit {
-                background-color: #444;
-                color: #ddd;
-                border: 1px solid #555;
-                border-radius: 3px;
-                padding: 2px 5px;
-            }
-        """)
-    
-    def set_light_theme(self):
-        """设置亮色主题"""
-        app = QApplication.instance()
-        app.setPalette(app.style().standardPalette())
-        app.setStyleSheet("""
-            QGroupBox::title {
-                padding: 0 8px;
-            }
-        """)
+        """应用当前主题设置（两种主题在ThemeManager中预先准备好）"""
+        self.theme_manager.set_theme(THEME_DARK if self.dark_mode else THEME_LIGHT)
         
     def toggle_dark_mode(self, enabled):
         """切换暗黑模式"""
@@ -837,9 +951,10 @@ class MainWindow(QMainWindow):
             self.brightness_control.clear_selected_area()
     
     def set_brightness_control(self, brightness_control):
-        """设置亮度控制器的引用"""
+        """设置亮度控制器的引用，并预编译所有预设的渲染状态"""
         self.brightness_control = brightness_control
-
-
-# 添加QShortcut类
-from PyQt5.QtWidgets import QShortcut 
\ No newline at end of file
+        if self.brightness_control:
+            policy = self.policy.policy
+            self.brightness_control.set_limits(policy.min_brightness, policy.allowed_modes)
+            self.brightness_control.precompile(
+                self.presets.resolve_all(self.brightness_control.current_state))
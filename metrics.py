@@ -0,0 +1,326 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from collections import namedtuple
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket, QTcpServer, QTcpSocket, QHostAddress
+
+logger = logging.getLogger(__name__)
+
+# 所有指标名称的前缀
+METRIC_PREFIX = "screen_brightness_"
+
+# 写入指标文件的默认间隔（秒）
+DEFAULT_FILE_INTERVAL_S = 15
+
+# 抓取工具等待回复的超时（毫秒）
+SCRAPE_TIMEOUT_MS = 2000
+
+# 一个指标：名称（不含前缀）、类型（gauge/counter）、说明和样本 [(标签字典, 值), ...]
+Metric = namedtuple("Metric", ["name", "kind", "help", "samples"])
+
+
+def gauge(name, help, value, **labels):
+    return Metric(name, "gauge", help, [(labels, value)])
+
+
+def counter(name, help, value, **labels):
+    return Metric(name, "counter", help, [(labels, value)])
+
+
+def format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_metrics(metrics):
+    """按Prometheus文本格式输出，同名指标的样本合并在一组HELP/TYPE下"""
+    grouped = {}
+    for metric in metrics:
+        if metric.name in grouped:
+            grouped[metric.name].samples.extend(metric.samples)
+        else:
+            grouped[metric.name] = Metric(metric.name, metric.kind, metric.help, list(metric.samples))
+
+    lines = []
+    for metric in grouped.values():
+        name = METRIC_PREFIX + metric.name
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for labels, value in metric.samples:
+            if value is None:
+                continue
+            if labels:
+                label_text = ",".join(f'{key}="{escape_label(item)}"' for key, item in sorted(labels.items()))
+                lines.append(f"{name}{{{label_text}}} {format_value(value)}")
+            else:
+                lines.append(f"{name} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def parse_metrics(text):
+    """解析文本格式的指标，返回 {带标签的名称: 值}，格式错误时抛出ValueError"""
+    values = {}
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line or line.startswith("#"):
+            continue
+        name, _, value = line.rpartition(" ")
+        if not name:
+            raise ValueError(f"第{number}行格式错误: {line}")
+        try:
+            values[name] = float(value)
+        except ValueError:
+            raise ValueError(f"第{number}行的值不是数字: {line}")
+    return values
+
+
+def brightness_control_metrics(brightness_control):
+    """遮罩引擎的指标：亮度、模式、遮罩数量、累计重绘和遮罩定时器唤醒"""
+    state = brightness_control.state or brightness_control.current_state
+    stats = brightness_control.overlay_stats()
+    counters = brightness_control.overlay_counters()
+    return [
+        gauge("level_percent", "当前应用的亮度百分比", state.level),
+        gauge("mode", "当前模式（值为1的样本）", 1, mode=state.mode),
+        gauge("area_mode", "是否只调暗选定区域", bool(state.areas)),
+        gauge("suspended", "遮罩是否因锁屏或屏幕休眠而暂停", brightness_control.suspended),
+        gauge("power_saving", "是否处于电池省电模式", brightness_control.power_saving),
+        gauge("min_level_percent", "管理员策略限制的最低亮度", brightness_control.min_level),
+        gauge("overlay_windows", "遮罩窗口数量", stats["windows"]),
+        gauge("overlay_visible_windows", "可见的遮罩窗口数量", stats["visible_windows"]),
+        counter("overlay_paints_total", "遮罩累计重绘次数", counters["paints"]),
+        counter("timer_wakeups_total", "各模块定时器累计唤醒次数", counters["wakeups"], timer="overlays"),
+    ]
+
+
+class MetricsExporter(QObject):
+    """以Prometheus文本格式导出运行指标
+
+    指标在抓取时才由各收集函数计算，各模块平时只维护整数计数器（一次加法），没有抓取时没有任何开销。
+    可以同时使用以下导出方式：
+
+    - 本地套接字（Linux/macOS下为Unix域套接字，Windows下为命名管道）
+    - 只监听127.0.0.1的TCP端口
+    - 定期原子替换的文件（可供node_exporter的textfile收集器读取）
+
+    两种套接字都接受HTTP GET请求（Prometheus可以直接抓取），也接受任意一行文本，回复指标后关闭连接。
+    """
+
+    def __init__(self, started=None, parent=None):
+        """
+        Args:
+            started: 进程开始时的time.perf_counter()，用于计算运行时间，默认为创建时
+        """
+        super(MetricsExporter, self).__init__(parent)
+        self.collectors = []
+        self.started = time.perf_counter() if started is None else started
+        self.scrapes = 0
+        self.local_server = None
+        self.tcp_server = None
+        self.file_path = None
+        self.file_timer = None
+
+    def add_collector(self, collector):
+        """collector() 返回Metric列表，每次抓取时调用"""
+        self.collectors.append(collector)
+
+    def collect(self):
+        from overlay_engine import resident_memory_kb
+
+        metrics = []
+        for collector in self.collectors:
+            metrics.extend(collector())
+        rss_kb = resident_memory_kb()
+        metrics.append(gauge("uptime_seconds", "进程运行时间（秒）", round(time.perf_counter() - self.started, 3)))
+        metrics.append(gauge("resident_memory_bytes", "常驻内存（字节）",
+                             rss_kb * 1024 if rss_kb is not None else None))
+        metrics.append(counter("metrics_scrapes_total", "指标被抓取或写入的次数", self.scrapes))
+        return metrics
+
+    def render(self):
+        self.scrapes += 1
+        return render_metrics(self.collect())
+
+    def listen_local(self, name):
+        """在本地套接字（路径或名称）上提供指标，失败时返回False"""
+        self.local_server = QLocalServer(self)
+        # 上次异常退出可能留下套接字文件
+        QLocalServer.removeServer(name)
+        self.local_server.newConnection.connect(lambda: self._accept(self.local_server))
+        if not self.local_server.listen(name):
+            logger.warning("无法监听指标套接字 %s: %s", name, self.local_server.errorString())
+            self.local_server = None
+            return False
+        return True
+
+    def listen_tcp(self, port):
+        """在127.0.0.1的指定端口上提供指标（不接受其他主机的连接），失败时返回False"""
+        self.tcp_server = QTcpServer(self)
+        self.tcp_server.newConnection.connect(lambda: self._accept(self.tcp_server))
+        if not self.tcp_server.listen(QHostAddress(QHostAddress.LocalHost), port):
+            logger.warning("无法监听指标端口 %s: %s", port, self.tcp_server.errorString())
+            self.tcp_server = None
+            return False
+        return True
+
+    def write_periodically(self, path, interval_s=DEFAULT_FILE_INTERVAL_S):
+        """每interval_s秒把指标写入path（先写临时文件再改名，读取方不会看到写了一半的文件）"""
+        self.file_path = path
+        self.file_timer = QTimer(self)
+        self.file_timer.timeout.connect(self.write_file)
+        self.file_timer.start(max(1, interval_s) * 1000)
+        self.write_file()
+
+    def write_file(self):
+        temporary = f"{self.file_path}.tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(temporary, self.file_path)
+        except OSError as exc:
+            logger.warning("无法写入指标文件 %s: %s", self.file_path, exc)
+
+    def set_suspended(self, suspended):
+        """锁屏或屏幕休眠时停止写入文件，恢复时立即写入一次"""
+        if self.file_timer is None:
+            return
+        if suspended:
+            self.file_timer.stop()
+        else:
+            self.write_file()
+            self.file_timer.start()
+
+    def timers(self):
+        return [self.file_timer] if self.file_timer is not None else []
+
+    def _accept(self, server):
+        while server.hasPendingConnections():
+            connection = server.nextPendingConnection()
+            connection.readyRead.connect(lambda connection=connection: self._on_ready_read(connection))
+            connection.disconnected.connect(connection.deleteLater)
+
+    def _on_ready_read(self, connection):
+        if not connection.canReadLine():
+            return
+        request = bytes(connection.peek(4096))
+        if request.startswith(b"GET ") and b"\r\n\r\n" not in request and b"\n\n" not in request:
+            # 等待完整的HTTP请求头
+            return
+        connection.readAll()
+        body = self.render().encode("utf-8")
+        if request.startswith(b"GET "):
+            header = ("HTTP/1.0 200 OK\r\n"
+                      "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      "Connection: close\r\n\r\n").encode("ascii")
+            body = header + body
+        connection.write(body)
+        connection.flush()
+        if isinstance(connection, QLocalSocket):
+            connection.disconnectFromServer()
+        else:
+            connection.disconnectFromHost()
+
+    def close(self):
+        for server in (self.local_server, self.tcp_server):
+            if server is not None:
+                server.close()
+        if self.file_timer is not None:
+            self.file_timer.stop()
+
+
+def create_metrics_exporter(settings, started=None):
+    """按设置项metrics_socket、metrics_port和metrics_file创建指标导出，都未设置时返回None"""
+    socket_name = settings.value("metrics_socket", "", type=str)
+    port = settings.value("metrics_port", 0, type=int)
+    file_path = settings.value("metrics_file", "", type=str)
+    if not (socket_name or port or file_path):
+        return None
+
+    exporter = MetricsExporter(started)
+    if socket_name:
+        exporter.listen_local(socket_name)
+    if port:
+        exporter.listen_tcp(port)
+    if file_path:
+        exporter.write_periodically(
+            file_path, settings.value("metrics_file_interval", DEFAULT_FILE_INTERVAL_S, type=int))
+    return exporter
+
+
+def scrape(socket_name=None, port=None, timeout=SCRAPE_TIMEOUT_MS):
+    """作为抓取方读取一次指标（与监控系统的抓取方式相同），无法连接时返回None"""
+    from PyQt5.QtCore import QCoreApplication
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    if port:
+        connection = QTcpSocket()
+        connection.connectToHost(QHostAddress(QHostAddress.LocalHost), port)
+        request = b"GET /metrics HTTP/1.0\r\nHost: localhost\r\n\r\n"
+    else:
+        connection = QLocalSocket()
+        connection.connectToServer(socket_name)
+        request = b"\n"
+    if not connection.waitForConnected(timeout):
+        return None
+    connection.write(request)
+    connection.flush()
+    reply = b""
+    # 服务端回复后关闭连接
+    while connection.waitForReadyRead(timeout):
+        reply += bytes(connection.readAll())
+    reply += bytes(connection.readAll())
+    text = reply.decode("utf-8", "replace")
+    if text.startswith("HTTP/"):
+        head, _, text = text.partition("\r\n\r\n")
+        status = head.split("\r\n", 1)[0]
+        if status.split()[1:2] != ["200"]:
+            raise ValueError(status)
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="读取运行中的屏幕亮度调节工具导出的指标（本地抓取测试）")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--socket", help="设置项metrics_socket配置的本地套接字")
+    source.add_argument("--port", type=int, help="设置项metrics_port配置的本地端口")
+    source.add_argument("--file", help="设置项metrics_file配置的文件")
+    parser.add_argument("--quiet", action="store_true", help="只检查格式并输出指标数量")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        started = time.perf_counter()
+        text = scrape(args.socket, args.port)
+        if text is None:
+            print("无法连接到指标导出", file=sys.stderr)
+            return 2
+        elapsed = (time.perf_counter() - started) * 1000.0
+
+    try:
+        values = parse_metrics(text)
+    except ValueError as exc:
+        print(f"指标格式错误: {exc}", file=sys.stderr)
+        return 1
+    if not args.quiet:
+        print(text, end="")
+    summary = f"{len(values)} 个样本"
+    if not args.file:
+        summary += f"，抓取用时 {elapsed:.1f}ms"
+    print(summary, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
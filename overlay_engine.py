@@ -0,0 +1,91 @@
+import sys
+import json
+from brightness_control import BrightnessControl
+from sysfs_backlight import create_backlight_backend, DEFAULT_MIN_PERCENT
+from ddc_backlight import DDCDiscovery
+from special_windows import create_special_window_provider
+
+
+def resident_memory_kb():
+    """当前进程的常驻内存（KB），无法获取时返回None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, IOError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+    # 其他Unix只能取得峰值，macOS的单位是字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class OverlayEngine:
+    """遮罩引擎：BrightnessControl及其硬件后端和特殊窗口检测，不依赖任何控制界面
+
+    完整程序和无界面的遮罩守护进程（daemon.py）共用。
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.brightness_control = BrightnessControl(
+            opacity_overlays=settings.value("opacity_overlays", False, type=bool),
+            span_screens=settings.value("span_screens", False, type=bool),
+            battery_opacity_overlays=settings.value("battery_opacity_overlays", False, type=bool))
+
+        # 硬件亮度后端（可用时优先调节硬件，遮罩只补足剩余部分）
+        self.ddc_discovery = None
+        self.setup_hardware_backends()
+
+        # 特殊窗口（菜单、提示等）检测，结果作为遮罩的排除区域
+        self.special_window_provider = None
+        self.setup_special_window_detection()
+
+    def setup_hardware_backends(self):
+        """检测并启用硬件亮度后端"""
+        settings = self.settings
+
+        # 笔记本面板背光（Linux sysfs）
+        if settings.value("use_hardware_backlight", True, type=bool):
+            min_percent = settings.value("backlight_min_percent", DEFAULT_MIN_PERCENT, type=int)
+            backend = create_backlight_backend(min_percent=min_percent)
+            if backend:
+                self.brightness_control.add_hardware_backend(backend)
+
+        # 外接显示器DDC/CI（在后台线程中探测，找到后再接管对应屏幕）
+        if settings.value("use_ddc", True, type=bool):
+            self.ddc_discovery = DDCDiscovery()
+            self.ddc_discovery.backend_found.connect(self.brightness_control.add_hardware_backend)
+            self.ddc_discovery.start()
+
+        # XRandR伽马表（可选，接管没有硬件背光控制的屏幕）
+        if settings.value("use_gamma_ramps", False, type=bool):
+            # 默认关闭，启用时才导入（伽马表生成可能用到NumPy）
+            from gamma_backend import create_gamma_backend
+
+            backend = create_gamma_backend()
+            if backend:
+                self.brightness_control.add_hardware_backend(backend)
+
+    def setup_special_window_detection(self):
+        """启用事件驱动的特殊窗口检测（当前平台不支持时跳过）"""
+        try:
+            special_classes = json.loads(self.settings.value("special_window_classes", "[]", type=str) or "[]")
+        except ValueError:
+            special_classes = []
+
+        self.special_window_provider = create_special_window_provider(special_classes)
+        if self.special_window_provider:
+            self.special_window_provider.rects_changed.connect(self.brightness_control.set_exclusion_rects)
+            self.brightness_control.set_exclusion_rects(self.special_window_provider.rects)
+
+    def close(self):
+        if self.special_window_provider:
+            self.special_window_provider.close()
+            self.special_window_provider = None
+        self.brightness_control.cleanup()
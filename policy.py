@@ -0,0 +1,247 @@
+import os
+import json
+import platform
+from collections import namedtuple
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QSettings, QTime, pyqtSignal
+from brightness_control import MODE_NORMAL, MODE_HIGH_CONTRAST, MODE_BLUE_LIGHT
+
+# 设置该环境变量时从指定路径读取策略文件
+POLICY_ENV = "BRIGHTNESS_POLICY_FILE"
+
+VALID_MODES = (MODE_NORMAL, MODE_HIGH_CONTRAST, MODE_BLUE_LIGHT)
+
+# 默认定时 -> 对应的设置项
+SCHEDULE_KEYS = {
+    "enabled": "timer_enabled",
+    "start": "timer_time",
+    "end": "timer_end_time",
+    "preset": "timer_preset",
+}
+
+# 亮度限制在diff结果中的名称（其余为设置项名称）
+LIMIT_MIN_BRIGHTNESS = "min_brightness"
+LIMIT_ALLOWED_MODES = "allowed_modes"
+
+
+class Policy(namedtuple("Policy", ["min_brightness", "allowed_modes", "defaults", "locked"])):
+    """管理员策略
+
+    min_brightness: 最低亮度（百分比），0表示不限制
+    allowed_modes: 允许的模式（frozenset），None表示不限制
+    defaults: 设置项默认值，用户设置过的值优先
+    locked: 锁定的设置项，始终使用策略的值，界面上不可修改
+    """
+    __slots__ = ()
+
+
+EMPTY_POLICY = Policy(0, None, {}, {})
+
+
+def policy_path():
+    """策略文件路径：环境变量指定的路径，或系统目录下的policy.toml / policy.json"""
+    path = os.environ.get(POLICY_ENV)
+    if path:
+        return path
+    if platform.system() == "Windows":
+        directory = os.path.join(os.environ.get("PROGRAMDATA", r"C:\ProgramData"), "ScreenBrightnessTool")
+    else:
+        directory = "/etc/screen-brightness-tool"
+    toml_path = os.path.join(directory, "policy.toml")
+    return toml_path if os.path.exists(toml_path) else os.path.join(directory, "policy.json")
+
+
+def parse_document(raw, path):
+    """按扩展名解析JSON或TOML文档"""
+    if path.endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            # Python 3.11之前需要tomli
+            import tomli as tomllib
+        return tomllib.loads(raw.decode("utf-8"))
+    return json.loads(raw.decode("utf-8"))
+
+
+def parse_policy(data):
+    """从解析后的文档创建策略，字段非法时抛出ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError("策略文件的顶层必须是对象")
+
+    min_brightness = max(0, min(100, int(data.get("min_brightness", 0))))
+
+    allowed_modes = data.get("allowed_modes")
+    if allowed_modes is not None:
+        unknown = set(allowed_modes) - set(VALID_MODES)
+        if unknown:
+            raise ValueError(f"未知的模式: {', '.join(sorted(unknown))}")
+        # 正常模式始终允许，否则无法回退
+        allowed_modes = frozenset(allowed_modes) | {MODE_NORMAL}
+
+    defaults = dict(data.get("defaults", {}))
+    for field, value in dict(data.get("default_schedule", {})).items():
+        if field not in SCHEDULE_KEYS:
+            raise ValueError(f"未知的定时字段: {field}")
+        defaults[SCHEDULE_KEYS[field]] = value
+
+    locked = data.get("locked", {})
+    if isinstance(locked, list):
+        # 只列出设置项名称时锁定为策略中的默认值
+        missing = [key for key in locked if key not in defaults]
+        if missing:
+            raise ValueError(f"锁定的设置项没有默认值: {', '.join(missing)}")
+        locked = {key: defaults[key] for key in locked}
+
+    return Policy(min_brightness, allowed_modes, defaults, dict(locked))
+
+
+def diff_policy(old, new):
+    """比较两份策略，返回需要重新应用的项：亮度限制名称和有效值可能变化的设置项名称"""
+    changed = set()
+    if old.min_brightness != new.min_brightness:
+        changed.add(LIMIT_MIN_BRIGHTNESS)
+    if old.allowed_modes != new.allowed_modes:
+        changed.add(LIMIT_ALLOWED_MODES)
+    for layer in ("defaults", "locked"):
+        before, after = getattr(old, layer), getattr(new, layer)
+        changed.update(key for key in before.keys() | after.keys() if before.get(key) != after.get(key))
+    return changed
+
+
+def convert_value(value, value_type):
+    """把策略文件中的值转换为QSettings.value(type=...)期望的类型"""
+    if value_type is None:
+        return value
+    if value_type is bool:
+        return value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes")
+    if value_type is QTime and not isinstance(value, QTime):
+        return QTime.fromString(str(value), "HH:mm")
+    return value_type(value)
+
+
+class LayeredSettings:
+    """叠加在用户QSettings之上的设置：锁定值 > 用户设置 > 策略默认值 > 程序默认值
+
+    写入仍然保存到用户设置，锁定的设置项读取时始终返回策略的值。
+    """
+
+    def __init__(self, settings, manager):
+        self._settings = settings
+        self._manager = manager
+
+    def value(self, key, defaultValue=None, type=None):
+        policy = self._manager.policy
+        if key in policy.locked:
+            return convert_value(policy.locked[key], type)
+        if not self._settings.contains(key) and key in policy.defaults:
+            return convert_value(policy.defaults[key], type)
+        if type is None:
+            return self._settings.value(key, defaultValue)
+        return self._settings.value(key, defaultValue, type=type)
+
+    def contains(self, key):
+        policy = self._manager.policy
+        return key in policy.locked or key in policy.defaults or self._settings.contains(key)
+
+    def sync(self):
+        self._manager.flushes += 1
+        self._settings.sync()
+
+    def __getattr__(self, name):
+        # setValue、remove等直接转发给用户设置
+        return getattr(self._settings, name)
+
+
+class PolicyManager(QObject):
+    """加载并监听策略文件
+
+    通过QFileSystemWatcher（Linux下为inotify）接收变化通知，不轮询。同时监听所在目录，
+    以便捕获编辑器以改名方式替换文件；目录还不存在时监听上级目录，等待目录创建。文件内容不变或解析后的策略不变时不做任何事，
+    否则只对变化的项发出policy_changed。
+    """
+
+    # (新策略, 变化的项)
+    policy_changed = pyqtSignal(object, object)
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        """进程共享的策略管理器"""
+        if cls._instance is None:
+            cls._instance = cls(policy_path())
+        return cls._instance
+
+    def __init__(self, path, parent=None):
+        super(PolicyManager, self).__init__(parent)
+        self.path = path
+        self.policy = EMPTY_POLICY
+        self.reloads = 0
+        self.flushes = 0  # 经由settings()的设置写入次数
+        self.last_error = None
+        self._raw = None
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self._on_changed)
+        self.watcher.directoryChanged.connect(self._on_changed)
+        self.reload()
+
+    def settings(self, settings=None):
+        """叠加了本策略的用户设置"""
+        return LayeredSettings(settings or QSettings("BrightnessControl", "BrightnessAdjuster"), self)
+
+    def is_locked(self, key):
+        return key in self.policy.locked
+
+    def _on_changed(self, path):
+        self.reload()
+
+    def _watch_directory(self):
+        """监听策略文件所在目录
+
+        目录不存在（例如尚未部署策略）时监听最近的已存在的上级目录，目录被创建后切换到该目录。
+        上级目录中其他文件的变化只会触发一次读取失败，不影响当前策略。
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        while not os.path.isdir(directory):
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return
+            directory = parent
+        watched = self.watcher.directories()
+        if watched == [directory]:
+            return
+        if watched:
+            self.watcher.removePaths(watched)
+        self.watcher.addPath(directory)
+
+    def reload(self):
+        """重新读取策略文件，返回变化的项（没有变化时为空集合）"""
+        self._watch_directory()
+        if os.path.exists(self.path) and self.path not in self.watcher.files():
+            # 文件被替换后需要重新监听
+            self.watcher.addPath(self.path)
+
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+        except (OSError, IOError):
+            raw = b""
+        if raw == self._raw:
+            return set()
+        self._raw = raw
+
+        try:
+            policy = parse_policy(parse_document(raw, self.path)) if raw.strip() else EMPTY_POLICY
+        except (ValueError, TypeError, ImportError) as exc:
+            # 文件正在编辑或格式错误时保留当前策略
+            self.last_error = str(exc)
+            return set()
+        self.last_error = None
+
+        changed = diff_policy(self.policy, policy)
+        if not changed:
+            return changed
+        self.policy = policy
+        self.reloads += 1
+        self.policy_changed.emit(policy, changed)
+        return changed
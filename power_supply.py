@@ -0,0 +1,134 @@
+import os
+import platform
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+
+try:
+    # 导入QtDBus后pyqtSlot才能使用QDBusMessage参数类型
+    from PyQt5.QtDBus import QDBusMessage
+except ImportError:
+    QDBusMessage = None
+
+POWER_SUPPLY_ROOT = "/sys/class/power_supply"
+
+# 交流电源类型（USB-C PD充电器也报告为USB）
+AC_TYPES = ("Mains", "USB")
+
+UPOWER_PATH = "/org/freedesktop/UPower"
+PROPERTIES_INTERFACE = "org.freedesktop.DBus.Properties"
+
+# 没有D-Bus（UPower）通知时退回定期读取sysfs的间隔（毫秒）
+POLL_INTERVAL_MS = 60000
+
+
+def read_attribute(device_path, name):
+    """读取power_supply设备的属性，不存在或无法读取时返回None"""
+    try:
+        with open(os.path.join(device_path, name)) as f:
+            return f.read().strip()
+    except (OSError, IOError):
+        return None
+
+
+def list_supplies(root=POWER_SUPPLY_ROOT):
+    """列出电源设备 [(设备目录, 类型), ...]，忽略鼠标、键盘等外设的电池（scope为Device）"""
+    if not os.path.isdir(root):
+        return []
+    supplies = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if read_attribute(path, "scope") == "Device":
+            continue
+        supplies.append((path, read_attribute(path, "type")))
+    return supplies
+
+
+def on_battery(root=POWER_SUPPLY_ROOT):
+    """当前是否由电池供电
+
+    有交流电源在线时为否；没有交流电源设备信息时以电池是否在放电判断。
+    台式机（没有电池）或无法读取时视为交流供电。
+    """
+    supplies = list_supplies(root)
+    batteries = [path for path, supply_type in supplies if supply_type == "Battery"]
+    if not batteries:
+        return False
+
+    adapters = [path for path, supply_type in supplies if supply_type in AC_TYPES]
+    if adapters:
+        return not any(read_attribute(path, "online") == "1" for path in adapters)
+    return any(read_attribute(path, "status") == "Discharging" for path in batteries)
+
+
+def has_battery(root=POWER_SUPPLY_ROOT):
+    return any(supply_type == "Battery" for _, supply_type in list_supplies(root))
+
+
+def timer_wakeups_per_second(timers):
+    """运行中的定时器每秒唤醒次数之和（按各定时器当前间隔估算）"""
+    return sum(1000.0 / max(1, timer.interval()) for timer in timers
+               if timer is not None and timer.isActive())
+
+
+class PowerMonitor(QObject):
+    """监听交流/电池供电的切换
+
+    优先由UPower的D-Bus属性变化通知触发重新读取sysfs，没有D-Bus时每分钟读取一次。
+    测试时root可以指向伪造的power_supply目录，再调用refresh()。
+    """
+
+    on_battery_changed = pyqtSignal(bool)
+
+    def __init__(self, root=POWER_SUPPLY_ROOT, poll_interval=POLL_INTERVAL_MS, parent=None):
+        super(PowerMonitor, self).__init__(parent)
+        self.root = root
+        self.on_battery = on_battery(root)
+        self.refreshes = 0
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(poll_interval)
+        self.poll_timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        """重新读取供电状态，变化时发出信号"""
+        self.refreshes += 1
+        battery = on_battery(self.root)
+        if battery != self.on_battery:
+            self.on_battery = battery
+            self.on_battery_changed.emit(battery)
+
+    def watch_upower(self, system_bus=None):
+        """监听UPower的属性变化通知（交流电源插拔时发出），不可用时返回False"""
+        try:
+            from PyQt5.QtDBus import QDBusConnection
+        except ImportError:
+            return False
+        system_bus = system_bus if system_bus is not None else QDBusConnection.systemBus()
+        if not system_bus.isConnected():
+            return False
+        return system_bus.connect("", UPOWER_PATH, PROPERTIES_INTERFACE, "PropertiesChanged",
+                                  self._on_upower_changed)
+
+    def _on_upower_changed(self, message):
+        self.refresh()
+
+    if QDBusMessage is not None:
+        _on_upower_changed = pyqtSlot(QDBusMessage)(_on_upower_changed)
+
+    def start(self, system_bus=None):
+        """开始监听，没有D-Bus通知时启动定期读取"""
+        if not self.watch_upower(system_bus):
+            self.poll_timer.start()
+
+    def close(self):
+        self.poll_timer.stop()
+
+
+def create_power_monitor(root=POWER_SUPPLY_ROOT):
+    """创建供电监听，非Linux或没有电池（台式机）时返回None"""
+    if root == POWER_SUPPLY_ROOT and platform.system() != "Linux":
+        return None
+    if not has_battery(root):
+        return None
+    monitor = PowerMonitor(root)
+    monitor.start()
+    return monitor
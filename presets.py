@@ -0,0 +1,187 @@
+import json
+from collections import namedtuple, deque
+from brightness_control import (MODE_NORMAL, MODE_HIGH_CONTRAST, MODE_BLUE_LIGHT,
+                                NEUTRAL_TEMPERATURE, temperature_tint)
+
+# 内置预设名称
+PRESET_NORMAL = "正常模式"
+PRESET_EYE_PROTECT = "护眼模式"
+PRESET_NIGHT = "夜间模式"
+PRESET_BLUE_LIGHT = "防蓝光模式"
+
+VALID_MODES = (MODE_NORMAL, MODE_HIGH_CONTRAST, MODE_BLUE_LIGHT)
+
+
+class Preset(namedtuple("Preset", ["name", "level", "mode", "temperature", "areas", "builtin"])):
+    """亮度预设
+
+    level/mode/temperature/areas 为None时表示保持当前值不变。
+    temperature 为中性色温（6500K）时清除色调。
+    areas 为全局坐标下的区域 ((x, y, w, h), ...)，空元组表示全屏。
+    """
+    __slots__ = ()
+
+    def compile_changes(self):
+        """将预设编译为渲染状态的字段修改"""
+        changes = {}
+        if self.level is not None:
+            changes["level"] = self.level
+        if self.mode is not None:
+            changes["mode"] = self.mode
+        if self.temperature is not None:
+            changes["tint"] = temperature_tint(self.temperature)
+        if self.areas is not None:
+            changes["areas"] = self.areas
+        return changes
+
+    def to_dict(self):
+        data = {"name": self.name}
+        for field in ("level", "mode", "temperature"):
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        if self.areas is not None:
+            data["areas"] = [list(area) for area in self.areas]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """从JSON字典创建预设，字段非法时抛出ValueError"""
+        name = str(data.get("name", "")).strip()
+        if not name:
+            raise ValueError("预设缺少名称")
+
+        level = data.get("level")
+        if level is not None:
+            level = max(0, min(100, int(level)))
+
+        mode = data.get("mode")
+        if mode is not None and mode not in VALID_MODES:
+            raise ValueError(f"未知的预设模式: {mode}")
+
+        temperature = data.get("temperature")
+        if temperature is not None:
+            temperature = int(temperature)
+
+        areas = data.get("areas")
+        if areas is not None:
+            areas = tuple(tuple(int(v) for v in area) for area in areas)
+
+        return cls(name, level, mode, temperature, areas, False)
+
+
+def builtin_presets(eye_protect_intensity=70):
+    """内置预设，与原有的预设按钮保持一致：只调节亮度，不改变高对比度和防蓝光开关
+
+    正常模式同时恢复中性色温并清除区域，是清除自定义预设色调的途径。
+    """
+    return [
+        Preset(PRESET_NORMAL, 100, None, NEUTRAL_TEMPERATURE, (), True),
+        Preset(PRESET_EYE_PROTECT, eye_protect_intensity, None, None, None, True),
+        Preset(PRESET_NIGHT, 40, None, None, None, True),
+        Preset(PRESET_BLUE_LIGHT, None, MODE_BLUE_LIGHT, None, None, True),
+    ]
+
+
+class PresetManager:
+    """管理内置和用户自定义预设
+
+    预设在加载时编译为渲染状态的字段修改，切换预设只需一次状态替换。
+    用户预设以JSON形式保存在QSettings的"presets"键中。
+    """
+
+    def __init__(self, settings, eye_protect_intensity=70):
+        self.settings = settings
+        self.eye_protect_intensity = eye_protect_intensity
+        self.presets = []
+        self._compiled = {}
+        # 最近的切换耗时（毫秒），用于衡量端到端切换速度
+        self.switch_times = deque(maxlen=100)
+        self.load()
+
+    def load(self):
+        """加载并编译所有预设"""
+        presets = builtin_presets(self.eye_protect_intensity)
+        names = {preset.name for preset in presets}
+
+        raw = self.settings.value("presets", "[]", type=str)
+        try:
+            entries = json.loads(raw) if raw else []
+        except ValueError:
+            entries = []
+
+        for entry in entries:
+            try:
+                preset = Preset.from_dict(entry)
+            except (ValueError, TypeError, AttributeError):
+                # 忽略损坏的预设条目
+                continue
+            if preset.name in names:
+                # 用户预设覆盖同名内置预设
+                presets = [p for p in presets if p.name != preset.name]
+            names.add(preset.name)
+            presets.append(preset)
+
+        self.presets = presets
+        self._compiled = {preset.name: preset.compile_changes() for preset in presets}
+
+    def save(self):
+        """保存用户自定义预设"""
+        entries = [preset.to_dict() for preset in self.presets if not preset.builtin]
+        self.settings.setValue("presets", json.dumps(entries, ensure_ascii=False))
+
+    def names(self):
+        return [preset.name for preset in self.presets]
+
+    def get(self, name):
+        for preset in self.presets:
+            if preset.name == name:
+                return preset
+        return None
+
+    def add(self, preset):
+        """添加或替换用户预设"""
+        self.presets = [p for p in self.presets if p.name != preset.name]
+        self.presets.append(preset._replace(builtin=False))
+        self._compiled[preset.name] = preset.compile_changes()
+        self.save()
+
+    def remove(self, name):
+        """删除用户预设，内置预设不可删除"""
+        preset = self.get(name)
+        if preset is None or preset.builtin:
+            return False
+        self.presets.remove(preset)
+        self._compiled.pop(name, None)
+        self.save()
+        return True
+
+    def set_eye_protect_intensity(self, value):
+        """护眼模式强度变化时重新编译护眼预设"""
+        self.eye_protect_intensity = value
+        for i, preset in enumerate(self.presets):
+            if preset.builtin and preset.name == PRESET_EYE_PROTECT:
+                self.presets[i] = preset._replace(level=value)
+                self._compiled[preset.name] = self.presets[i].compile_changes()
+
+    def resolve(self, name, current_state):
+        """基于当前渲染状态得到预设对应的完整状态，预设不存在时返回None"""
+        changes = self._compiled.get(name)
+        if changes is None:
+            return None
+        return current_state._replace(**changes) if changes else current_state
+
+    def resolve_all(self, current_state):
+        """所有预设基于当前状态的完整渲染状态，用于预编译"""
+        return [self.resolve(preset.name, current_state) for preset in self.presets]
+
+    def record_switch(self, elapsed_ms):
+        """记录一次预设切换的端到端耗时（毫秒）"""
+        self.switch_times.append(elapsed_ms)
+
+    def switch_stats(self):
+        """返回最近切换耗时的 (次数, 中位数, 最大值)，单位毫秒"""
+        if not self.switch_times:
+            return (0, 0.0, 0.0)
+        ordered = sorted(self.switch_times)
+        return (len(ordered), ordered[len(ordered) // 2], ordered[-1])
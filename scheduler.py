@@ -0,0 +1,77 @@
+from datetime import time as dtime
+from clock import SYSTEM_CLOCK
+from presets import PRESET_NORMAL, PRESET_EYE_PROTECT
+
+# 定时功能检查的间隔（毫秒）
+CHECK_INTERVAL_MS = 60000
+
+
+def in_time_range(current, start, end):
+    """current是否在 [start, end) 时间段内，start晚于end时表示跨天（例如晚上10点到早上6点）"""
+    if start < end:
+        # 正常情况：开始时间早于结束时间
+        return start <= current < end
+    # 跨天情况：开始时间晚于结束时间
+    return current >= start or current < end
+
+
+class TimeRangeSchedule:
+    """定时切换：时间段内应用指定预设，时间段外恢复正常模式
+
+    只保存配置和是否已应用的状态，不依赖界面，由主窗口的定时器或模拟器（simulation.py）驱动。
+    """
+
+    def __init__(self, clock=SYSTEM_CLOCK, enabled=False, start=dtime(22, 0), end=dtime(6, 0),
+                 preset=PRESET_EYE_PROTECT):
+        self.clock = clock
+        self.enabled = enabled
+        self.start = start
+        self.end = end
+        self.preset = preset
+        self.applied = False  # 时间段内的预设是否已经应用
+
+    def configure(self, enabled, start, end, preset):
+        self.enabled = enabled
+        self.start = start
+        self.end = end
+        self.preset = preset
+
+    def check(self):
+        """检查当前时间，返回需要应用的预设名称，不需要切换时返回None"""
+        if not self.enabled:
+            return None
+
+        current = self.clock.now().time()
+        is_in_time_range = in_time_range(current, self.start, self.end)
+
+        # 如果在时间范围内且之前未应用设置
+        if is_in_time_range and not self.applied:
+            self.applied = True
+            return self.preset
+        # 如果不在时间范围内且之前已应用设置，恢复正常模式
+        if not is_in_time_range and self.applied:
+            self.applied = False
+            return PRESET_NORMAL
+        return None
+
+
+def set_schedule_suspended(suspended, circadian_scheduler, schedule_timer, check_schedule):
+    """休眠或锁屏时暂停定时逻辑，恢复时补上错过的变化（BrightnessApp与模拟器共用）
+
+    Args:
+        circadian_scheduler: 昼夜曲线调度（CircadianScheduler），启用时代替定时切换，可为None
+        schedule_timer: 定时切换每分钟检查的定时器，可为None
+        check_schedule: 立即检查一次定时切换的函数
+    """
+    if circadian_scheduler is not None:
+        if suspended:
+            circadian_scheduler.stop()
+        else:
+            # 重新查表，补上暂停期间错过的变化
+            circadian_scheduler.start()
+    elif schedule_timer is not None:
+        if suspended:
+            schedule_timer.stop()
+        else:
+            check_schedule()
+            schedule_timer.start(CHECK_INTERVAL_MS)
@@ -0,0 +1,207 @@
+import os
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+try:
+    # 导入QtDBus后pyqtSlot才能使用QDBusMessage参数类型
+    from PyQt5.QtDBus import QDBusMessage
+except ImportError:
+    QDBusMessage = None
+
+# 暂停原因
+REASON_LOCKED = "locked"  # 会话锁定（logind Lock/Unlock）
+REASON_SLEEP = "sleep"  # 系统即将休眠（logind PrepareForSleep）
+REASON_SCREENSAVER = "screensaver"  # 屏幕保护程序激活（D-Bus ScreenSaver或X11 MIT-SCREEN-SAVER）
+
+LOGIND_SERVICE = "org.freedesktop.login1"
+LOGIND_PATH = "/org/freedesktop/login1"
+LOGIND_MANAGER = "org.freedesktop.login1.Manager"
+LOGIND_SESSION = "org.freedesktop.login1.Session"
+PROPERTIES_INTERFACE = "org.freedesktop.DBus.Properties"
+
+# 各桌面环境的屏幕保护程序接口 (对象路径, 接口)，都有ActiveChanged(bool)信号
+SCREENSAVER_INTERFACES = (
+    ("/org/freedesktop/ScreenSaver", "org.freedesktop.ScreenSaver"),
+    ("/ScreenSaver", "org.freedesktop.ScreenSaver"),
+    ("/org/gnome/ScreenSaver", "org.gnome.ScreenSaver"),
+    ("/org/mate/ScreenSaver", "org.mate.ScreenSaver"),
+    ("/org/cinnamon/ScreenSaver", "org.cinnamon.ScreenSaver"),
+)
+
+
+class SessionMonitor(QObject):
+    """监听会话锁定、系统休眠和屏幕保护，全部由信号驱动，不轮询
+
+    任一原因生效时suspended_changed(True)，全部解除后suspended_changed(False)。
+    """
+
+    suspended_changed = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super(SessionMonitor, self).__init__(parent)
+        self.reasons = set()
+        self.sources = []  # 已启用的信号来源，用于诊断
+        self._x11 = None
+
+    @property
+    def suspended(self):
+        return bool(self.reasons)
+
+    def set_reason(self, reason, active):
+        """设置某个暂停原因，只有整体状态变化时才发出信号"""
+        was_suspended = self.suspended
+        if active:
+            self.reasons.add(reason)
+        else:
+            self.reasons.discard(reason)
+        if self.suspended != was_suspended:
+            self.suspended_changed.emit(self.suspended)
+
+    def watch_dbus(self, system_bus=None, session_bus=None):
+        """监听logind和屏幕保护程序的D-Bus信号
+
+        Args:
+            system_bus / session_bus: QDBusConnection，测试时可传入连接到本地dbus-daemon的连接
+
+        Returns:
+            是否至少连接了一个信号
+        """
+        try:
+            from PyQt5.QtDBus import QDBusConnection
+        except ImportError:
+            return False
+
+        system_bus = system_bus if system_bus is not None else QDBusConnection.systemBus()
+        session_bus = session_bus if session_bus is not None else QDBusConnection.sessionBus()
+        connected = False
+
+        # 发送方留空，按对象路径、接口和信号名匹配（本地替身总线上的发送方不持有服务名）
+        if system_bus.isConnected():
+            if system_bus.connect("", LOGIND_PATH, LOGIND_MANAGER, "PrepareForSleep",
+                                  self._on_prepare_for_sleep):
+                self.sources.append("logind-sleep")
+                connected = True
+            session_path = self._logind_session_path(system_bus)
+            if (system_bus.connect("", session_path, LOGIND_SESSION, "Lock", self._on_lock)
+                    and system_bus.connect("", session_path, LOGIND_SESSION, "Unlock", self._on_unlock)):
+                self.sources.append("logind-lock")
+                connected = True
+            # 在锁屏程序中输入密码解锁时logind不发送Unlock，只有锁屏程序设置的LockedHint会变化
+            if system_bus.connect("", session_path, PROPERTIES_INTERFACE, "PropertiesChanged",
+                                  self._on_session_properties):
+                self.sources.append("logind-locked-hint")
+                connected = True
+
+        if session_bus.isConnected():
+            screensaver = False
+            for path, interface in SCREENSAVER_INTERFACES:
+                if session_bus.connect("", path, interface, "ActiveChanged", self._on_screensaver_active):
+                    screensaver = True
+            if screensaver:
+                self.sources.append("screensaver")
+                connected = True
+        return connected
+
+    @staticmethod
+    def _logind_session_path(system_bus):
+        """当前会话的logind对象路径，无法确定时返回空字符串（匹配所有会话）"""
+        from PyQt5.QtDBus import QDBusInterface, QDBusMessage, QDBusObjectPath
+
+        manager = QDBusInterface(LOGIND_SERVICE, LOGIND_PATH, LOGIND_MANAGER, system_bus)
+        if not manager.isValid():
+            return ""
+        session_id = os.environ.get("XDG_SESSION_ID")
+        if session_id:
+            reply = manager.call("GetSession", session_id)
+        else:
+            reply = manager.call("GetSessionByPID", os.getpid())
+        # 错误回复（例如NoSessionForPID）的参数是错误信息，不能当作对象路径
+        if reply.type() != QDBusMessage.ReplyMessage:
+            return ""
+        arguments = reply.arguments()
+        if not arguments:
+            return ""
+        # PyQt有时把对象路径参数转换为str
+        path = arguments[0].path() if isinstance(arguments[0], QDBusObjectPath) else arguments[0]
+        if not isinstance(path, str) or not path.startswith("/"):
+            return ""
+        return path
+
+    def watch_x11(self, connection):
+        """监听X服务器的屏幕保护（MIT-SCREEN-SAVER）通知事件
+
+        X11的DPMS没有通知事件，服务器进入DPMS之前会先激活屏幕保护，以此代替。
+        """
+        try:
+            from Xlib.ext import screensaver
+        except ImportError:
+            return False
+        if connection is None or not connection.display.has_extension("MIT-SCREEN-SAVER"):
+            return False
+
+        self._x11 = connection
+        self._x11_event = connection.display.extension_event.ScreenSaverNotify
+        connection.add_handler(self._x11_event, self._on_x11_screensaver)
+        connection.root.screensaver_select_input(screensaver.NotifyMask)
+        connection.flush()
+        self.sources.append("x11-screensaver")
+        return True
+
+    @pyqtSlot(bool)
+    def _on_prepare_for_sleep(self, sleeping):
+        self.set_reason(REASON_SLEEP, sleeping)
+
+    @pyqtSlot()
+    def _on_lock(self):
+        self.set_reason(REASON_LOCKED, True)
+
+    @pyqtSlot()
+    def _on_unlock(self):
+        self.set_reason(REASON_LOCKED, False)
+
+    def _on_session_properties(self, message):
+        arguments = message.arguments()
+        if len(arguments) < 2 or arguments[0] != LOGIND_SESSION:
+            return
+        changed = arguments[1]
+        if isinstance(changed, dict) and "LockedHint" in changed:
+            self.set_reason(REASON_LOCKED, bool(changed["LockedHint"]))
+
+    if QDBusMessage is not None:
+        _on_session_properties = pyqtSlot(QDBusMessage)(_on_session_properties)
+
+    def set_screensaver_active(self, active):
+        """屏幕保护程序状态变化
+
+        不设置LockedHint的锁屏程序解锁时既没有Unlock也没有LockedHint通知，
+        屏幕保护程序关闭说明用户已经回来，同时解除锁定，避免一直保持暂停。
+        """
+        self.set_reason(REASON_SCREENSAVER, active)
+        if not active:
+            self.set_reason(REASON_LOCKED, False)
+
+    @pyqtSlot(bool)
+    def _on_screensaver_active(self, active):
+        self.set_screensaver_active(active)
+
+    def _on_x11_screensaver(self, event):
+        from Xlib.ext import screensaver
+
+        self.set_screensaver_active(event.state != screensaver.StateOff)
+
+    def close(self):
+        if self._x11 is not None:
+            self._x11.remove_handler(self._x11_event, self._on_x11_screensaver)
+            self._x11 = None
+
+
+def create_session_monitor(x11_connection=None):
+    """创建会话监听，当前平台没有可用的信号来源时返回None"""
+    from x11_connection import X11Connection
+
+    monitor = SessionMonitor()
+    monitor.watch_dbus()
+    try:
+        monitor.watch_x11(x11_connection or X11Connection.instance())
+    except Exception:
+        pass
+    return monitor if monitor.sources else None
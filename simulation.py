@@ -0,0 +1,174 @@
+"""定时逻辑模拟器
+
+在VirtualClock上驱动与程序相同的定时切换（scheduler.TimeRangeSchedule）和昼夜曲线
+（circadian.CircadianScheduler），几毫秒内模拟数天到数周的时间，包括夏令时切换、系统休眠/唤醒
+，列出所有状态切换并检查不变量：
+
+- 定时切换的状态与当前时间是否在时间段内一致（定时切换每分钟检查一次，允许最多一个检查间隔的延迟）
+- 昼夜曲线应用的值与当前分钟的表项一致（不允许延迟）
+
+发现不一致时返回非零退出码，可在每次发布前运行。
+
+用法:
+    python simulation.py --start 2026-03-27 --days 7 --tz Europe/Berlin --window 22:00-06:00 \\
+        --sleep 2026-03-28T21:30/180
+    python simulation.py --start 2026-10-23 --days 4 --tz Europe/Berlin --circadian --sleep 2026-10-24T20:00/600
+"""
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+from clock import VirtualClock
+from scheduler import TimeRangeSchedule, CHECK_INTERVAL_MS, in_time_range, set_schedule_suspended
+from presets import PRESET_EYE_PROTECT
+from circadian import CircadianTable, CircadianScheduler, parse_keyframes, parse_time, DEFAULT_KEYFRAMES
+
+# 不变量检查相对于每分钟的偏移（毫秒），避开与被检查的定时器同时到期
+PROBE_OFFSET_MS = 30000
+PROBE_INTERVAL_MS = 60000
+
+
+class Simulation:
+    """在模拟时钟上运行定时逻辑，休眠/唤醒使用与BrightnessApp.set_suspended相同的set_schedule_suspended"""
+
+    def __init__(self, start, tz=None, window=None, preset=PRESET_EYE_PROTECT, keyframes=None):
+        """
+        Args:
+            start: 开始的本地时间
+            tz: zoneinfo时区，None表示没有夏令时
+            window: 定时切换的时间段 (开始datetime.time, 结束datetime.time)，None表示不启用
+            keyframes: 昼夜曲线关键帧（circadian.parse_keyframes的结果），None表示不启用
+        """
+        self.clock = VirtualClock(start, tz)
+        self.transitions = []  # (本地时间, 类型, 值)
+        self.violations = []  # (本地时间, 说明)
+        self.probes = 0
+        self.suspended = False
+        # 各不变量开始不成立的单调时间
+        self._mismatch_since = {}
+
+        self.schedule = None
+        self.schedule_timer = None
+        if window is not None:
+            self.schedule = TimeRangeSchedule(self.clock, True, window[0], window[1], preset)
+            # 与MainWindow.setup_timer相同：启动后每分钟检查一次
+            self.schedule_timer = self.clock.create_timer()
+            self.schedule_timer.timeout.connect(self.check_schedule)
+            self.schedule_timer.start(CHECK_INTERVAL_MS)
+
+        self.circadian = None
+        if keyframes is not None:
+            self.circadian = CircadianScheduler(CircadianTable(keyframes), self.clock)
+            self.circadian.entry_changed.connect(self._on_circadian_entry)
+            self.circadian.start()
+
+        self.probe_timer = self.clock.create_timer()
+        self.probe_timer.timeout.connect(self.probe)
+        # 第一次在PROBE_OFFSET_MS后检查，之后每分钟一次
+        self.probe_timer.start(PROBE_OFFSET_MS)
+
+    def check_schedule(self):
+        preset = self.schedule.check()
+        if preset:
+            self.transitions.append((self.clock.now(), "schedule", preset))
+
+    def _on_circadian_entry(self, level, temperature):
+        self.transitions.append((self.clock.now(), "circadian", f"{level}% {temperature}K"))
+
+    def probe(self):
+        """检查不变量"""
+        if self.probe_timer.interval() != PROBE_INTERVAL_MS:
+            self.probe_timer.setInterval(PROBE_INTERVAL_MS)
+        self.probes += 1
+        now = self.clock.now()
+        if self.schedule is not None:
+            expected = in_time_range(now.time(), self.schedule.start, self.schedule.end)
+            self._expect("schedule", self.schedule.applied, expected, CHECK_INTERVAL_MS)
+        if self.circadian is not None:
+            expected = self.circadian.table.entry(now.hour * 60 + now.minute)
+            self._expect("circadian", self.circadian.current_entry, expected, 0)
+
+    def _expect(self, name, actual, expected, tolerance_ms):
+        """actual与expected不一致的持续时间超过tolerance_ms时记录一次违反"""
+        if actual == expected:
+            self._mismatch_since.pop(name, None)
+            return
+        since = self._mismatch_since.setdefault(name, self.clock.monotonic_ms)
+        if self.clock.monotonic_ms - since >= tolerance_ms:
+            self.violations.append((self.clock.now(), f"{name}为{actual}，应为{expected}"))
+            # 同一次不一致只记录一次
+            self._mismatch_since[name] = float("inf")
+
+    def sleep(self, at, minutes):
+        """在本地时间at进入休眠，minutes分钟后唤醒"""
+        self.clock.advance_to(at)
+        self.transitions.append((self.clock.now(), "suspend", f"{minutes}min"))
+        self.set_suspended(True)
+        self.clock.suspend(minutes * 60000)
+        self.transitions.append((self.clock.now(), "resume", ""))
+        self.set_suspended(False)
+
+    def set_suspended(self, suspended):
+        self.suspended = suspended
+        set_schedule_suspended(suspended, self.circadian, self.schedule_timer, self.check_schedule)
+
+    def run_until(self, end):
+        self.clock.advance_to(end)
+
+
+def parse_sleep(text):
+    """"2026-03-28T21:30/180" -> (datetime, 分钟)"""
+    at, minutes = text.split("/")
+    return datetime.fromisoformat(at), int(minutes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="定时切换和昼夜曲线模拟器")
+    parser.add_argument("--start", default=datetime.now().strftime("%Y-%m-%d"), help="开始日期（本地零点）")
+    parser.add_argument("--days", type=float, default=7, help="模拟天数")
+    parser.add_argument("--tz", default=None, help="时区，例如 Europe/Berlin（需要zoneinfo）")
+    parser.add_argument("--window", default="22:00-06:00", help="定时切换时间段，none表示不启用")
+    parser.add_argument("--preset", default=PRESET_EYE_PROTECT, help="时间段内应用的预设")
+    parser.add_argument("--circadian", action="store_true", help="改用默认的昼夜曲线（与程序相同，代替定时切换）")
+    parser.add_argument("--sleep", action="append", default=[], help="休眠：本地时间/分钟数，可重复")
+    parser.add_argument("--quiet", action="store_true", help="只输出汇总")
+    args = parser.parse_args()
+
+    tz = None
+    if args.tz:
+        from zoneinfo import ZoneInfo
+        tz = ZoneInfo(args.tz)
+
+    window = None
+    if args.window != "none" and not args.circadian:
+        start_text, end_text = args.window.split("-")
+        start_minute, end_minute = parse_time(start_text), parse_time(end_text)
+        window = (datetime.min.replace(hour=start_minute // 60, minute=start_minute % 60).time(),
+                  datetime.min.replace(hour=end_minute // 60, minute=end_minute % 60).time())
+    keyframes = parse_keyframes(DEFAULT_KEYFRAMES) if args.circadian else None
+
+    begin = datetime.fromisoformat(args.start)
+    end = begin + timedelta(days=args.days)
+    sleeps = sorted(map(parse_sleep, args.sleep))
+
+    started = time.perf_counter()
+    simulation = Simulation(begin, tz, window, args.preset, keyframes)
+    for at, minutes in sleeps:
+        simulation.sleep(at, minutes)
+    simulation.run_until(end)
+    elapsed = (time.perf_counter() - started) * 1000.0
+
+    if not args.quiet:
+        for when, kind, value in simulation.transitions:
+            print(f"{when:%Y-%m-%d %H:%M:%S}  {kind:<11}{value}")
+    for when, message in simulation.violations:
+        print(f"{when:%Y-%m-%d %H:%M:%S}  违反: {message}", file=sys.stderr)
+
+    wakeups = sum(timer.fired for timer in simulation.clock._timers if timer is not simulation.probe_timer)
+    print(f"\n模拟 {args.days:g} 天，用时 {elapsed:.1f}ms: 切换 {len(simulation.transitions)} 次，"
+          f"定时器唤醒 {wakeups} 次，检查 {simulation.probes} 次，违反 {len(simulation.violations)} 次")
+    return 1 if simulation.violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
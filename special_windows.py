@@ -0,0 +1,252 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from x11_connection import X11Connection
+
+# 不应被遮罩调暗的窗口类型（右键菜单、下拉菜单、提示等）
+SPECIAL_WINDOW_TYPES = (
+    "_NET_WM_WINDOW_TYPE_MENU",
+    "_NET_WM_WINDOW_TYPE_DROPDOWN_MENU",
+    "_NET_WM_WINDOW_TYPE_POPUP_MENU",
+    "_NET_WM_WINDOW_TYPE_TOOLTIP",
+    "_NET_WM_WINDOW_TYPE_NOTIFICATION",
+    "_NET_WM_WINDOW_TYPE_COMBO",
+    "_NET_WM_WINDOW_TYPE_DND",
+)
+
+
+class SpecialWindowProvider(QObject):
+    """特殊窗口区域的提供者基类
+
+    rects_changed在特殊窗口区域实际发生变化时发出，参数为全局坐标下的
+    [(x, y, w, h), ...]，按从下到上的层叠顺序排列。
+    """
+
+    rects_changed = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super(SpecialWindowProvider, self).__init__(parent)
+        self.rects = []
+
+    def _publish(self, rects):
+        if rects != self.rects:
+            self.rects = rects
+            self.rects_changed.emit(list(rects))
+
+    def close(self):
+        pass
+
+
+class X11SpecialWindowProvider(SpecialWindowProvider):
+    """基于X事件的特殊窗口检测
+
+    启动时读取一次 _NET_CLIENT_LIST_STACKING 和窗口类型，之后只响应
+    MapNotify、UnmapNotify、DestroyNotify、ConfigureNotify 和 PropertyNotify 事件，不轮询。
+    """
+
+    def __init__(self, connection, special_classes=(), parent=None):
+        """
+        Args:
+            connection: X11Connection
+            special_classes: 需要排除的窗口类名（WM_CLASS），例如特定的流量悬浮窗
+        """
+        super(X11SpecialWindowProvider, self).__init__(parent)
+        from Xlib import X
+
+        self.connection = connection
+        self.display = connection.display
+        self.special_classes = {name.lower() for name in special_classes}
+        self.special_type_atoms = {connection.atom(name) for name in SPECIAL_WINDOW_TYPES}
+        self.atom_client_list = connection.atom("_NET_CLIENT_LIST_STACKING")
+        self.atom_window_type = connection.atom("_NET_WM_WINDOW_TYPE")
+
+        self._class_cache = {}  # WM_CLASS -> 是否特殊窗口
+        self._special = {}  # 窗口ID -> 是否特殊窗口
+        self._rects = {}  # 特殊窗口ID -> 全局坐标矩形（仅已映射的窗口）
+        self._stacking = []  # 客户端窗口的层叠顺序
+        self._override = []  # 已映射的override-redirect窗口（菜单、提示等）
+
+        self._event_handlers = (
+            (X.MapNotify, self._on_map),
+            (X.UnmapNotify, self._on_unmap),
+            (X.DestroyNotify, self._on_destroy),
+            (X.ConfigureNotify, self._on_configure),
+            (X.PropertyNotify, self._on_property),
+        )
+        for event_type, handler in self._event_handlers:
+            connection.add_handler(event_type, handler)
+        connection.select_root_events(X.SubstructureNotifyMask | X.PropertyChangeMask)
+
+        self._load_initial_windows()
+
+    def _load_initial_windows(self):
+        """启动时读取一次现有窗口"""
+        from Xlib import X
+
+        self._update_client_list()
+        for child in self.connection.root.query_tree().children:
+            try:
+                attributes = child.get_attributes()
+            except Exception:
+                continue
+            if attributes.override_redirect and attributes.map_state == X.IsViewable:
+                self._track_override(child)
+        self._emit()
+
+    def _window(self, window_id):
+        return self.display.create_resource_object("window", window_id)
+
+    def _classify(self, window):
+        """判断窗口是否为特殊窗口：先看窗口类型，再查缓存的类名匹配结果"""
+        try:
+            prop = window.get_full_property(self.atom_window_type, 0)
+            if prop is not None and self.special_type_atoms.intersection(prop.value):
+                return True
+            if not self.special_classes:
+                return False
+            wm_class = window.get_wm_class()
+        except Exception:
+            return False
+        if not wm_class:
+            return False
+
+        key = tuple(wm_class)
+        matched = self._class_cache.get(key)
+        if matched is None:
+            matched = any(name.lower() in self.special_classes for name in wm_class)
+            self._class_cache[key] = matched
+        return matched
+
+    def _geometry(self, window):
+        """读取窗口在根窗口坐标系中的矩形"""
+        try:
+            geometry = window.get_geometry()
+            origin = window.translate_coords(self.connection.root, 0, 0)
+        except Exception:
+            return None
+        return (-origin.x, -origin.y, geometry.width, geometry.height)
+
+    def _update_client_list(self):
+        """重新读取客户端窗口列表，只处理新增和移除的窗口"""
+        from Xlib import X
+
+        prop = self.connection.root.get_full_property(self.atom_client_list, X.AnyPropertyType)
+        stacking = list(prop.value) if prop is not None else []
+        known = set(self._stacking)
+
+        for window_id in stacking:
+            if window_id in known:
+                continue
+            window = self._window(window_id)
+            try:
+                # 监听客户端自身的移动、大小和属性变化
+                window.change_attributes(event_mask=X.StructureNotifyMask | X.PropertyChangeMask)
+            except Exception:
+                continue
+            special = self._classify(window)
+            self._special[window_id] = special
+            if special:
+                rect = self._geometry(window)
+                if rect:
+                    self._rects[window_id] = rect
+
+        current = set(stacking)
+        for window_id in known - current:
+            self._forget(window_id)
+        self._stacking = stacking
+
+    def _track_override(self, window):
+        if window.id in self._override:
+            return
+        # override-redirect窗口每次映射都重新分类，只记录需要跟踪的特殊窗口
+        if self._classify(window):
+            rect = self._geometry(window)
+            if rect:
+                self._special[window.id] = True
+                self._override.append(window.id)
+                self._rects[window.id] = rect
+
+    def _forget(self, window_id):
+        self._special.pop(window_id, None)
+        self._rects.pop(window_id, None)
+        if window_id in self._override:
+            self._override.remove(window_id)
+
+    def _on_map(self, event):
+        window = event.window
+        if event.override:
+            self._track_override(window)
+        elif self._special.get(window.id):
+            rect = self._geometry(window)
+            if rect:
+                self._rects[window.id] = rect
+        else:
+            return
+        self._emit()
+
+    def _on_unmap(self, event):
+        window_id = event.window.id
+        if window_id in self._override:
+            self._forget(window_id)
+        elif window_id in self._rects:
+            self._rects.pop(window_id, None)
+        else:
+            return
+        self._emit()
+
+    def _on_destroy(self, event):
+        """窗口销毁后其ID可能被复用，丢弃该窗口的所有记录"""
+        window_id = event.window.id
+        if window_id not in self._special:
+            return
+        visible = window_id in self._rects
+        self._forget(window_id)
+        if visible:
+            self._emit()
+
+    def _on_configure(self, event):
+        window_id = event.window.id
+        if window_id not in self._rects:
+            return
+        if event.send_event or window_id in self._override:
+            # 合成的ConfigureNotify（ICCCM）和根窗口子窗口的坐标已经是根坐标
+            rect = (event.x, event.y, event.width, event.height)
+        else:
+            rect = self._geometry(event.window)
+        if rect and rect != self._rects[window_id]:
+            self._rects[window_id] = rect
+            self._emit()
+
+    def _on_property(self, event):
+        if event.window.id == self.connection.root.id:
+            if event.atom == self.atom_client_list:
+                self._update_client_list()
+                self._emit()
+        elif event.atom == self.atom_window_type and event.window.id in self._special:
+            special = self._classify(event.window)
+            if special != self._special[event.window.id]:
+                self._special[event.window.id] = special
+                if special:
+                    rect = self._geometry(event.window)
+                    if rect:
+                        self._rects[event.window.id] = rect
+                else:
+                    self._rects.pop(event.window.id, None)
+                self._emit()
+
+    def _emit(self):
+        order = self._stacking + self._override
+        self._publish([self._rects[w] for w in order if w in self._rects])
+
+    def close(self):
+        for event_type, handler in self._event_handlers:
+            self.connection.remove_handler(event_type, handler)
+
+
+def create_special_window_provider(special_classes=(), connection=None):
+    """创建当前平台的特殊窗口检测，不支持时返回None"""
+    connection = connection or X11Connection.instance()
+    if connection is None:
+        return None
+    try:
+        return X11SpecialWindowProvider(connection, special_classes)
+    except Exception:
+        return None
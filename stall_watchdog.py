@@ -0,0 +1,157 @@
+import logging
+import os
+import sys
+import time
+import threading
+import traceback
+from collections import deque
+from datetime import datetime, timedelta
+from PyQt5.QtCore import QObject, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+# 心跳间隔（毫秒），使用电池时延长
+HEARTBEAT_INTERVAL_MS = 1000
+POWER_SAVING_HEARTBEAT_INTERVAL_MS = 5000
+
+# 事件循环超过该时间没有响应心跳即视为卡顿（毫秒）
+DEFAULT_THRESHOLD_MS = 500
+
+# 保留的卡顿记录数量
+DEFAULT_CAPACITY = 20
+
+# 每次卡顿最多采集的调用栈数量（卡顿期间每隔一个阈值采集一次，与上一次相同时不重复记录）
+MAX_STACK_SAMPLES = 5
+
+
+class StallIncident:
+    """一次事件循环卡顿：开始时间、持续时间和卡顿期间GUI线程的调用栈"""
+
+    def __init__(self, started):
+        self.started = started  # 开始时的本地时间
+        self.duration_ms = None  # 仍在卡顿时为None
+        self.stacks = []  # [(距卡顿开始的毫秒数, 调用栈文本), ...]
+        self.location = ""  # 第一次采集时卡住的位置（文件:行号 函数名）
+
+    def summary(self):
+        duration = "仍在卡顿" if self.duration_ms is None else f"{self.duration_ms:.0f}ms"
+        return f"{self.started:%Y-%m-%d %H:%M:%S}  {duration}  {self.location}"
+
+    def format(self):
+        parts = [self.summary()]
+        for offset_ms, stack in self.stacks:
+            parts.append(f"\n--- 卡顿开始后 {offset_ms:.0f}ms 的GUI线程调用栈 ---\n{stack}")
+        return "\n".join(parts)
+
+
+class StallWatchdog(QObject):
+    """事件循环卡顿监视
+
+    后台线程定期向GUI线程发送心跳（跨线程信号，排队到事件循环中执行），超过阈值没有响应时
+    用sys._current_frames()采集GUI线程的Python调用栈，记录到固定容量的环形缓冲区并写入日志。
+    QColorDialog、菜单的exec_等模态调用运行嵌套的事件循环，会正常响应心跳，不算卡顿。
+    每个心跳间隔后台线程唤醒两次（发送心跳、收到响应），GUI线程处理一个事件；锁屏或屏幕休眠时暂停。
+    """
+
+    # 看门狗线程发出，跨线程时自动排队到GUI线程
+    _ping = pyqtSignal()
+    # 卡顿结束后发出（卡顿期间GUI线程无法处理信号）
+    incident_finished = pyqtSignal(object)
+
+    def __init__(self, threshold_ms=DEFAULT_THRESHOLD_MS, capacity=DEFAULT_CAPACITY, parent=None):
+        """必须在GUI线程中创建"""
+        super(StallWatchdog, self).__init__(parent)
+        self.threshold_ms = threshold_ms
+        self.interval_ms = HEARTBEAT_INTERVAL_MS
+        self.gui_thread_id = threading.get_ident()
+        self.incidents = deque(maxlen=capacity)
+        self.heartbeats = 0
+        self.stalls = 0
+        self.suspended = False
+        self._acked = threading.Event()
+        self._stop = threading.Event()
+        self._active = threading.Event()  # 暂停时后台线程阻塞等待，不再定期唤醒
+        self._active.set()
+        self._thread = None
+        self._ping.connect(self._on_ping)
+
+    def start(self):
+        """开始发送心跳，应在事件循环运行后调用（否则启动过程本身会被记为卡顿）"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stall-watchdog", daemon=True)
+            self._thread.start()
+
+    def _on_ping(self):
+        # 在GUI线程中执行：事件循环处理到了这次心跳
+        self._acked.set()
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            if self._stop.is_set():
+                break
+            self._acked.clear()
+            sent = time.monotonic()
+            self.heartbeats += 1
+            self._ping.emit()
+            if not self._acked.wait(self.threshold_ms / 1000.0):
+                self._on_stall(sent)
+            if self._stop.wait(self.interval_ms / 1000.0):
+                break
+
+    def _on_stall(self, sent):
+        """心跳超时：采集调用栈直到GUI线程恢复响应"""
+        incident = StallIncident(datetime.now() - timedelta(seconds=time.monotonic() - sent))
+        self.incidents.append(incident)
+        self.stalls += 1
+        self._sample(incident, sent)
+        if incident.stacks:
+            logger.warning("事件循环超过%sms没有响应，GUI线程调用栈:\n%s", self.threshold_ms, incident.stacks[0][1])
+
+        while not self._acked.wait(self.threshold_ms / 1000.0):
+            if self._stop.is_set():
+                return
+            if len(incident.stacks) < MAX_STACK_SAMPLES:
+                self._sample(incident, sent)
+        incident.duration_ms = (time.monotonic() - sent) * 1000.0
+        self.incident_finished.emit(incident)
+
+    def _sample(self, incident, sent):
+        frame = sys._current_frames().get(self.gui_thread_id)
+        if frame is None:
+            return
+        frames = traceback.extract_stack(frame)
+        del frame
+        stack = "".join(traceback.format_list(frames))
+        if incident.stacks and incident.stacks[-1][1] == stack:
+            return
+        if not incident.stacks and frames:
+            # 最内层的一帧是卡住的位置
+            innermost = frames[-1]
+            incident.location = f"{os.path.basename(innermost.filename)}:{innermost.lineno} {innermost.name}"
+        incident.stacks.append(((time.monotonic() - sent) * 1000.0, stack))
+
+    def wakeups_per_second(self):
+        """看门狗线程每秒的唤醒次数，用于唤醒统计"""
+        if self._thread is None or self.suspended:
+            return 0.0
+        return 2000.0 / self.interval_ms
+
+    def set_power_saving(self, enabled):
+        """使用电池时延长心跳间隔（下一次心跳后生效）"""
+        self.interval_ms = POWER_SAVING_HEARTBEAT_INTERVAL_MS if enabled else HEARTBEAT_INTERVAL_MS
+
+    def set_suspended(self, suspended):
+        """屏幕休眠或会话锁定时暂停心跳"""
+        self.suspended = suspended
+        if suspended:
+            self._active.clear()
+        else:
+            self._active.set()
+
+    def close(self):
+        self._stop.set()
+        self._active.set()
+        self._acked.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
@@ -0,0 +1,117 @@
+import os
+import platform
+from hardware_backend import HardwareBackend, LatestValueWorker
+
+SYSFS_BACKLIGHT_ROOT = "/sys/class/backlight"
+
+# 背光类型优先级：firmware和platform接口通常比raw接口更可靠
+BACKLIGHT_TYPE_PRIORITY = {"firmware": 0, "platform": 1, "raw": 2}
+
+# 内置面板的输出名称前缀（xrandr输出名）
+INTERNAL_OUTPUT_PREFIXES = ("eDP", "LVDS", "DSI")
+
+# 默认的硬件最低亮度（百分比），过低时部分面板会完全黑屏
+DEFAULT_MIN_PERCENT = 10
+
+
+def read_int(path):
+    with open(path) as f:
+        return int(f.read().strip())
+
+
+def discover_backlights(root=SYSFS_BACKLIGHT_ROOT):
+    """列出可用的背光设备目录，按类型优先级排序"""
+    if not os.path.isdir(root):
+        return []
+
+    devices = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if not os.path.exists(os.path.join(path, "max_brightness")):
+            continue
+        try:
+            with open(os.path.join(path, "type")) as f:
+                backlight_type = f.read().strip()
+        except (OSError, IOError):
+            backlight_type = "raw"
+        devices.append((BACKLIGHT_TYPE_PRIORITY.get(backlight_type, 3), path))
+
+    return [path for _, path in sorted(devices)]
+
+
+class SysfsBacklightBackend(HardwareBackend):
+    """通过 /sys/class/backlight/*/brightness 直接调节笔记本面板背光
+
+    与遮罩相比不需要合成器参与，并且真正降低面板功耗。写入在后台线程中进行，
+    拖动滑动条时只写入最新值。
+    """
+
+    name = "sysfs"
+
+    def __init__(self, device_path, min_percent=DEFAULT_MIN_PERCENT, parent=None):
+        self.device_path = device_path
+        self.brightness_path = os.path.join(device_path, "brightness")
+        self.max_brightness = read_int(os.path.join(device_path, "max_brightness"))
+        if self.max_brightness <= 0:
+            raise ValueError(f"无效的最大亮度: {device_path}")
+
+        # 硬件最低原始值至少为1，避免面板完全关闭
+        self.min_raw = max(1, int(round(self.max_brightness * min_percent / 100.0)))
+        min_level = int(-(-self.min_raw * 100 // self.max_brightness))  # 向上取整
+        super(SysfsBacklightBackend, self).__init__(min_level, parent)
+
+        self.original_raw = read_int(self.brightness_path)
+        self.worker = LatestValueWorker(
+            self._write_raw,
+            name=f"backlight-{os.path.basename(device_path)}",
+            on_applied=self._on_written,
+            on_error=self._on_error,
+        )
+
+    def covers_screen(self, index, name):
+        """背光只对应内置面板"""
+        return any(name.startswith(prefix) for prefix in INTERNAL_OUTPUT_PREFIXES)
+
+    def level_to_raw(self, level):
+        raw = int(round(self.max_brightness * level / 100.0))
+        return max(self.min_raw, min(self.max_brightness, raw))
+
+    def raw_to_level(self, raw):
+        return int(round(raw * 100.0 / self.max_brightness))
+
+    def write_level(self, level):
+        self.worker.submit(self.level_to_raw(level))
+
+    def _write_raw(self, raw):
+        """在工作线程中写入sysfs"""
+        with open(self.brightness_path, "w") as f:
+            f.write(str(raw))
+        return raw
+
+    def _on_written(self, raw, result):
+        self.level_confirmed.emit(self.raw_to_level(raw))
+
+    def _on_error(self, raw, exc):
+        self.write_failed.emit(str(exc))
+
+    def close(self, restore=True):
+        """停止工作线程，restore为True时由工作线程在最后一次写入之后恢复启动前的亮度"""
+        if restore:
+            self.worker.submit(self.original_raw)
+        self.worker.close()
+
+
+def create_backlight_backend(root=SYSFS_BACKLIGHT_ROOT, min_percent=DEFAULT_MIN_PERCENT):
+    """创建第一个可写的sysfs背光后端，不可用时返回None"""
+    if root == SYSFS_BACKLIGHT_ROOT and platform.system() != "Linux":
+        return None
+
+    for path in discover_backlights(root):
+        if not os.access(os.path.join(path, "brightness"), os.W_OK):
+            # 需要udev规则或video组权限才能写入
+            continue
+        try:
+            return SysfsBacklightBackend(path, min_percent)
+        except (OSError, IOError, ValueError):
+            continue
+    return None
@@ -0,0 +1,67 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """整个测试会话共用的QApplication（默认使用offscreen平台）"""
+    pytest.importorskip("PyQt5")
+    from PyQt5.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+class FakeSettings:
+    """只在内存中保存的设置，接口与QSettings的value/setValue/contains相同"""
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+
+    def value(self, key, default=None, type=None):
+        value = self.values.get(key, default)
+        return type(value) if type is not None and value is not None else value
+
+    def setValue(self, key, value):
+        self.values[key] = value
+
+    def contains(self, key):
+        return key in self.values
+
+
+@pytest.fixture
+def settings():
+    return FakeSettings()
+
+
+@pytest.fixture
+def xvfb_connection(qapp):
+    """在临时的Xvfb上建立X11Connection，没有Xvfb或python-xlib时跳过"""
+    pytest.importorskip("Xlib")
+    if shutil.which("Xvfb") is None:
+        pytest.skip("需要Xvfb")
+    from x11_connection import X11Connection
+
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen(["Xvfb", "-displayfd", str(write_fd), "-screen", "0", "1024x768x24",
+                                "-nolisten", "tcp"], pass_fds=(write_fd,),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        number = f.readline().strip()
+    if not number:
+        process.kill()
+        pytest.skip("Xvfb启动失败")
+
+    connection = X11Connection(f":{number}")
+    yield connection
+    connection.close()
+    process.terminate()
+    process.wait()
@@ -0,0 +1,105 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("PyQt5")
+np = pytest.importorskip("numpy")
+
+import adaptive_dimming
+from adaptive_dimming import (AdaptiveDimmer, MAX_SAMPLE_INTERVAL_MS, MAX_STEP, POWER_SAVING_INTERVAL_FACTOR,
+                              SAMPLE_HEIGHT, SAMPLE_WIDTH, grab_sample, remove_overlay)
+from brightness_control import RenderState, MODE_NORMAL
+
+adaptive_dimming.load_numpy()
+
+
+@pytest.fixture
+def dimmer(qapp):
+    control = SimpleNamespace(current_state=RenderState(70, MODE_NORMAL, None, ()))
+    dimmer = AdaptiveDimmer(control, interval=5000, hysteresis=4, min_level=30, max_level=100)
+    dimmer.suggested = []
+    dimmer.level_suggested.connect(dimmer.suggested.append)
+    return dimmer
+
+
+def test_remove_overlay_restores_content():
+    content = np.array([[[0.2, 0.5, 0.9]]], dtype=np.float32)
+    rgba = (40, 20, 0, 128)
+    alpha = rgba[3] / 255.0
+    captured = content * (1 - alpha) + np.array(rgba[:3], dtype=np.float32) / 255.0 * alpha
+
+    assert np.allclose(remove_overlay(captured, rgba), content, atol=1e-5)
+    assert remove_overlay(captured, (0, 0, 0, 0)) is captured
+    assert remove_overlay(captured, (0, 0, 0, 255)) is None
+
+
+@pytest.mark.parametrize("desired, suggested", [
+    (72, []),  # 小于滞回阈值
+    (40, [70 - MAX_STEP]),  # 每次最多调节MAX_STEP
+    (75, [75]),
+    (10, [70 - MAX_STEP]),
+    (500, [70 + MAX_STEP]),
+])
+def test_nudge(dimmer, desired, suggested):
+    dimmer.nudge(desired)
+    assert dimmer.suggested == suggested
+    assert dimmer.adjustments == len(suggested)
+
+
+def test_nudge_clamps_to_limits(dimmer):
+    dimmer.brightness_control.current_state = RenderState(96, MODE_NORMAL, None, ())
+    dimmer.nudge(500)
+    assert dimmer.suggested == [100]
+
+
+@pytest.mark.parametrize("last_cost, power_saving, interval", [
+    (0.001, False, 5000),
+    (0.1, False, 10000),  # 100ms的采样需要10秒间隔才能低于1%
+    (5.0, False, MAX_SAMPLE_INTERVAL_MS),
+    (0.001, True, 5000 * POWER_SAVING_INTERVAL_FACTOR),
+])
+def test_enforce_budget(dimmer, last_cost, power_saving, interval):
+    dimmer.last_cost = last_cost
+    dimmer.set_power_saving(power_saving)
+    assert dimmer.timer.interval() == interval
+
+
+def test_sample_cost_excludes_other_threads(dimmer, monkeypatch):
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            pass
+
+    monkeypatch.setattr(dimmer, "measure", lambda: time.sleep(0.2))
+    thread = threading.Thread(target=spin)
+    thread.start()
+    try:
+        dimmer.sample()
+    finally:
+        stop.set()
+        thread.join()
+    assert dimmer.last_cost < 0.05
+    assert dimmer.timer.interval() == 5000
+
+
+def test_grab_sample_reads_rows_only(qapp):
+    from PyQt5.QtCore import QRect
+    from PyQt5.QtGui import QColor, QPixmap
+
+    grabs = []
+
+    def grab_window(window, x, y, width, height):
+        grabs.append((x, y, width, height))
+        pixmap = QPixmap(width, height)
+        pixmap.fill(QColor(255, 255, 255) if y < 540 else QColor(0, 0, 0))
+        return pixmap
+
+    screen = SimpleNamespace(geometry=lambda: QRect(1920, 0, 1920, 1080), grabWindow=grab_window)
+    rgb = grab_sample(screen)
+    assert rgb.shape == (SAMPLE_HEIGHT, SAMPLE_WIDTH, 3)
+    assert len(grabs) == SAMPLE_HEIGHT
+    assert all(height == 1 and width == 1920 and x == 0 for x, y, width, height in grabs)
+    assert rgb[0].min() == 1.0 and rgb[-1].max() == 0.0
@@ -0,0 +1,119 @@
+import json
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from brightness_control import RenderState, MODE_NORMAL, MODE_BLUE_LIGHT, MODE_HIGH_CONTRAST, temperature_tint
+from app_rules import AppRule, AppRuleEngine, FakeActiveWindowProvider, RuleMatcher, load_rules
+
+BASE_STATE = RenderState(60, MODE_NORMAL, None, ())
+
+
+def rules_from(*entries):
+    return [AppRule.from_dict(entry) for entry in entries]
+
+
+def test_invalid_regex_is_skipped(settings):
+    settings.setValue("app_rules", json.dumps([
+        {"match": "re:mpv(", "level": 100},
+        {"match": "vlc", "level": 90},
+        {"match": "re:[", "level": 80},
+    ]))
+    rules = load_rules(settings)
+    assert [rule.match for rule in rules] == ["vlc"]
+    assert RuleMatcher(rules).match(["vlc"]).changes == {"level": 90}
+
+
+def test_from_dict_rejects_invalid_regex():
+    with pytest.raises(ValueError):
+        AppRule.from_dict({"match": "re:(?P<x>a", "level": 50})
+
+
+def test_backreferences_in_user_patterns():
+    matcher = RuleMatcher(rules_from({"match": "re:(a)b\\1", "level": 10}, {"match": "re:(x)\\1", "level": 20}))
+    assert matcher.match(["aba"]).changes == {"level": 10}
+    assert matcher.match(["xx"]).changes == {"level": 20}
+    assert matcher.match(["abx"]) is None
+
+
+def test_earlier_regex_beats_later_exact():
+    matcher = RuleMatcher(rules_from({"match": "re:fire.*", "level": 10}, {"match": "firefox", "level": 20}))
+    assert matcher.match(["Navigator", "firefox"]).changes == {"level": 10}
+
+
+def test_earlier_exact_beats_later_regex():
+    matcher = RuleMatcher(rules_from({"match": "Firefox", "level": 20}, {"match": "re:fire.*", "level": 10}))
+    assert matcher.match(["Navigator", "firefox"]).changes == {"level": 20}
+    assert matcher.match(["firewall"]).changes == {"level": 10}
+
+
+def test_regex_must_match_whole_class():
+    matcher = RuleMatcher(rules_from({"match": "re:mpv", "level": 100}))
+    assert matcher.match(["mpv"]) is not None
+    assert matcher.match(["mpv-helper"]) is None
+
+
+class FakeControl:
+    """只记录当前状态的亮度控制"""
+
+    def __init__(self, state):
+        self.current_state = state
+        self.applied = []
+
+    def apply_state(self, state):
+        self.current_state = state
+        self.applied.append(state)
+
+
+@pytest.fixture
+def engine(qapp):
+    control = FakeControl(BASE_STATE)
+    provider = FakeActiveWindowProvider()
+    matcher = RuleMatcher(rules_from({"match": "mpv", "level": 100, "temperature": 3400},
+                                     {"match": "vlc", "level": 90}))
+    engine = AppRuleEngine(provider, matcher, control, control.apply_state)
+    yield engine, provider, control
+    engine.close()
+
+
+def test_rule_applies_on_enter_and_restores_on_leave(engine):
+    engine, provider, control = engine
+    provider.activate("mpv", "mpv")
+    assert control.current_state == RenderState(100, MODE_NORMAL, temperature_tint(3400), ())
+
+    provider.activate("mpv-window", "mpv")  # 同一规则不重复应用
+    assert len(control.applied) == 1
+
+    provider.activate("code", "Code")
+    assert control.current_state == BASE_STATE
+    assert engine.active_rule is None
+
+
+def test_manual_change_survives_leaving(engine):
+    engine, provider, control = engine
+    provider.activate("mpv")
+    control.apply_state(control.current_state._replace(level=75))
+
+    provider.activate("code")
+    # 用户修改的亮度保留，规则改动的色温恢复
+    assert control.current_state == BASE_STATE._replace(level=75)
+
+
+def test_manual_change_carries_across_rules(engine):
+    engine, provider, control = engine
+    provider.activate("mpv")
+    control.apply_state(control.current_state._replace(mode=MODE_HIGH_CONTRAST))
+
+    provider.activate("vlc")
+    assert control.current_state == RenderState(90, MODE_HIGH_CONTRAST, None, ())
+    provider.activate("code")
+    assert control.current_state == BASE_STATE._replace(mode=MODE_HIGH_CONTRAST)
+
+
+def test_unchanged_state_is_restored_exactly(engine):
+    engine, provider, control = engine
+    control.current_state = RenderState(40, MODE_BLUE_LIGHT, temperature_tint(5000), ())
+    provider.activate("vlc")
+    provider.activate("code")
+    assert control.current_state == RenderState(40, MODE_BLUE_LIGHT, temperature_tint(5000), ())
@@ -0,0 +1,172 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+import ddc_backlight
+from ddc_backlight import (DDCBacklightBackend, DDCConnection, DDCDiscovery, DDCError, FakeI2CDevice,
+                           VCP_BRIGHTNESS, discover_ddc_buses, output_name_key, screen_output_key)
+
+# 显示器对“读取VCP 0x10”的回复：当前值80，最大值100，最后一个字节是校验和
+BRIGHTNESS_REPLY = bytes([0x6E, 0x88, 0x02, 0x00, 0x10, 0x00, 0x00, 0x64, 0x00, 0x50, 0x90])
+
+
+class ScriptedDevice:
+    """按顺序返回预先写好的回复的I2C设备"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+
+    def read(self, length):
+        return bytearray(self.replies.pop(0)[:length])
+
+    def close(self):
+        pass
+
+
+class ThreadRecordingDevice(FakeI2CDevice):
+    """记录每次写入所在线程的显示器"""
+
+    def __init__(self, *args, **kwargs):
+        super(ThreadRecordingDevice, self).__init__(*args, **kwargs)
+        self.threads = []
+        self.closed = False
+
+    def write(self, data):
+        self.threads.append(threading.current_thread())
+        super(ThreadRecordingDevice, self).write(data)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def no_ddc_delays(monkeypatch):
+    monkeypatch.setattr(ddc_backlight, "DDC_REPLY_DELAY", 0)
+    monkeypatch.setattr(ddc_backlight, "DDC_COMMAND_INTERVAL", 0)
+
+
+def test_set_vcp_framing():
+    device = FakeI2CDevice()
+    DDCConnection(device).set_vcp(VCP_BRIGHTNESS, 0x132)
+    assert device.writes == [bytes([0x51, 0x84, 0x03, 0x10, 0x01, 0x32, 0x9B])]
+    assert device.vcp[VCP_BRIGHTNESS] == [100, 100]
+
+
+def test_get_vcp_framing():
+    device = ScriptedDevice(BRIGHTNESS_REPLY)
+    assert DDCConnection(device).get_vcp(VCP_BRIGHTNESS) == (80, 100)
+    assert device.writes == [bytes([0x51, 0x82, 0x01, 0x10, 0xAC])]
+
+
+def test_fake_device_round_trip():
+    connection = DDCConnection(FakeI2CDevice(brightness=10, maximum=300))
+    connection.set_vcp(VCP_BRIGHTNESS, 260)
+    assert connection.get_vcp(VCP_BRIGHTNESS) == (260, 300)
+
+
+@pytest.mark.parametrize("reply", [
+    BRIGHTNESS_REPLY[:-1] + b"\x00",  # 校验和错误
+    BRIGHTNESS_REPLY[:8],  # 回复不完整
+    BRIGHTNESS_REPLY[:4] + b"\x12" + BRIGHTNESS_REPLY[5:],  # 不是请求的功能码
+    BRIGHTNESS_REPLY[:3] + b"\x01" + BRIGHTNESS_REPLY[4:10] + b"\x91",  # 不支持的功能码
+])
+def test_get_vcp_rejects_bad_reply(reply):
+    with pytest.raises(DDCError):
+        DDCConnection(ScriptedDevice(reply)).get_vcp(VCP_BRIGHTNESS)
+
+
+def test_discovery_uses_device_factory(qapp):
+    found = []
+    discovery = DDCDiscovery(buses=[("/dev/i2c-4", "DP-1"), ("/dev/i2c-5", "HDMI-A-1")],
+                             device_factory=lambda path: FakeI2CDevice(path, brightness=30, maximum=50))
+    discovery.backend_found.connect(found.append)
+    discovery.start()
+    discovery.wait(5)
+    qapp.processEvents()
+
+    assert [(backend.output_name, backend.original_value, backend.maximum) for backend in found] == [
+        ("DP-1", 30, 50), ("HDMI-A-1", 30, 50)]
+    found[0].write_level(50)
+    found[0].worker.close()
+    assert found[0].connection.device.vcp[VCP_BRIGHTNESS] == [25, 50]
+    for backend in found:
+        backend.close(restore=False)
+
+
+@pytest.mark.parametrize("name, key", [
+    ("card0-DP-1", ("DP", 1)),
+    ("card1-HDMI-A-2", ("HDMI", 2)),
+    ("card0-DVI-D-1", ("DVI", 1)),
+    ("card0-eDP-1", ("EDP", 1)),
+    ("HDMI1", ("HDMI", 1)),
+    ("DisplayPort-0", ("DP", 0)),
+    ("eDP", ("EDP", None)),
+])
+def test_output_name_key(name, key):
+    assert output_name_key(name) == key
+
+
+@pytest.mark.parametrize("screen, screens, connector", [
+    # modesetting / Wayland：与DRM同名
+    ("DP-1", ["eDP-1", "DP-1"], "card0-DP-1"),
+    ("HDMI-A-1", ["HDMI-A-1"], "card0-HDMI-A-1"),
+    # intel驱动：没有连字符
+    ("HDMI2", ["eDP1", "HDMI2"], "card0-HDMI-A-2"),
+    # amdgpu/radeon：从0编号
+    ("DisplayPort-0", ["eDP", "DisplayPort-0"], "card0-DP-1"),
+    ("HDMI-A-1", ["DisplayPort-0", "HDMI-A-1"], "card0-HDMI-A-2"),
+    ("HDMI-A-0", ["HDMI-A-0"], "card0-HDMI-A-1"),
+    # NVIDIA：从0编号
+    ("DP-2", ["DP-0", "DP-2"], "card0-DP-3"),
+])
+def test_screen_maps_to_connector(screen, screens, connector):
+    assert screen_output_key(screen, screens) == output_name_key(connector)
+
+
+def test_zero_based_numbering_does_not_match_wrong_connector():
+    assert screen_output_key("DisplayPort-1", ["DisplayPort-1"]) != output_name_key("card0-DP-1")
+
+
+def test_discover_buses(tmp_path):
+    drm = tmp_path / "drm"
+    adapter = tmp_path / "i2c-7"
+    adapter.mkdir()
+    for name, status in (("card0-DP-1", "connected"), ("card0-eDP-1", "connected"),
+                         ("card0-HDMI-A-1", "disconnected")):
+        connector = drm / name
+        connector.mkdir(parents=True)
+        (connector / "status").write_text(f"{status}\n")
+        (connector / "ddc").symlink_to(adapter)
+    (drm / "card1-DP-2" / "i2c-9").mkdir(parents=True)
+    (drm / "card1-DP-2" / "status").write_text("connected\n")
+
+    assert discover_ddc_buses(str(drm)) == [("/dev/i2c-7", "DP-1"), ("/dev/i2c-9", "DP-2")]
+
+
+def test_backend_covers_zero_based_screen(qapp, monkeypatch):
+    screens = [SimpleNamespace(name=lambda name=name: name) for name in ("eDP", "DisplayPort-0", "DisplayPort-1")]
+    monkeypatch.setattr(ddc_backlight.QGuiApplication, "screens", staticmethod(lambda: screens))
+    backend = DDCBacklightBackend(DDCConnection(FakeI2CDevice()), "DP-2", 100)
+    assert [backend.covers_screen(index, screen.name()) for index, screen in enumerate(screens)] == [
+        False, False, True]
+    backend.close(restore=False)
+
+
+def test_close_restores_on_worker_thread(qapp):
+    device = ThreadRecordingDevice(brightness=80, latency=0.02)
+    backend = DDCBacklightBackend(DDCConnection(device), "DP-1", 100)
+    backend.original_value = 80
+    backend.write_level(30)
+    # 关闭时上一次写入可能仍在进行，恢复值排在它之后写入
+    backend.close()
+
+    assert device.vcp[VCP_BRIGHTNESS] == [80, 100]
+    assert device.threads and threading.main_thread() not in device.threads
+    assert device.closed
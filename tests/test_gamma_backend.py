@@ -0,0 +1,119 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from gamma_backend import XRandRGammaBackend, build_ramps, create_gamma_backend
+from hardware_backend import HardwareBackend
+
+# 校准过的伽马表（不是线性的）
+CALIBRATED = ([0, 1000, 30000, 60000], [0, 2000, 32000, 62000], [0, 3000, 34000, 64000])
+LINEAR = ([0, 21845, 43690, 65535],) * 3
+
+
+class FakeDisplay:
+    """记录伽马表写入的假XRandR显示连接"""
+
+    def __init__(self, outputs):
+        self.outputs = outputs  # 输出名 -> CRTC
+        self.ramps = {}
+        self.writes = []
+
+    def xrandr_get_output_info(self, output, timestamp):
+        name = list(self.outputs)[output]
+        return SimpleNamespace(name=name, crtc=self.outputs[name])
+
+    def xrandr_get_crtc_gamma_size(self, crtc):
+        return SimpleNamespace(size=len(self.ramps[crtc][0]))
+
+    def xrandr_get_crtc_gamma(self, crtc):
+        red, green, blue = self.ramps[crtc]
+        return SimpleNamespace(red=red, green=green, blue=blue)
+
+    def xrandr_set_crtc_gamma(self, crtc, size, red, green, blue):
+        self.writes.append(crtc)
+        self.ramps[crtc] = (list(red), list(green), list(blue))
+
+
+class FakeConnection:
+    def __init__(self, display):
+        self.display = display
+        resources = SimpleNamespace(config_timestamp=0, outputs=list(range(len(display.outputs))))
+        self.root = SimpleNamespace(xrandr_get_screen_resources=lambda: resources)
+
+    def flush(self):
+        pass
+
+
+class PanelBackend(HardwareBackend):
+    """只负责内置面板的非后备后端（代替sysfs背光）"""
+
+    def covers_screen(self, index, name):
+        return name.startswith("eDP")
+
+    def write_level(self, level):
+        pass
+
+
+def make_backend(qapp):
+    display = FakeDisplay({"eDP-1": 10, "HDMI-1": 11})
+    display.ramps = {10: tuple(list(ramp) for ramp in LINEAR), 11: tuple(list(ramp) for ramp in CALIBRATED)}
+    return XRandRGammaBackend(FakeConnection(display)), display
+
+
+def test_build_ramps_scales_calibrated_ramps():
+    assert build_ramps(CALIBRATED, (0.5, 0.5, 0.5)) == [
+        [0, 500, 15000, 30000], [0, 1000, 16000, 31000], [0, 1500, 17000, 32000]]
+
+
+def test_writes_only_assigned_crtcs(qapp):
+    backend, display = make_backend(qapp)
+    backend.assign_screens(["HDMI-1"])
+    backend.set_level((50, None))
+
+    assert display.writes == [11]
+    assert display.ramps[10] == LINEAR
+    assert list(display.ramps[11]) == build_ramps(CALIBRATED, (0.5, 0.5, 0.5))
+
+
+def test_released_crtcs_are_restored(qapp):
+    backend, display = make_backend(qapp)
+    backend.assign_screens(["HDMI-1"])
+    backend.set_level((50, None))
+    backend.assign_screens([])
+
+    assert display.ramps[11] == CALIBRATED
+    backend.set_level((40, None))
+    assert display.writes == [11, 11]
+
+
+def test_gamma_is_fallback_behind_other_backends(qapp):
+    from brightness_control import BrightnessControl
+
+    gamma, display = make_backend(qapp)
+    panel = PanelBackend()
+    control = BrightnessControl()
+    control.screens = [{"index": 0, "name": "eDP-1"}, {"index": 1, "name": "HDMI-1"}]
+    # 伽马后端先添加（例如DDC探测较慢），仍然不应接管内置面板
+    control.hardware_backends = [gamma, panel]
+    control._map_screen_backends()
+
+    assert control._screen_backends == {0: panel, 1: gamma}
+    assert gamma.assigned_crtcs == {11}
+    control.cleanup()
+
+
+def test_xvfb_ramps_round_trip(xvfb_connection):
+    backend = create_gamma_backend(xvfb_connection)
+    if backend is None:
+        pytest.skip("Xvfb不支持RandR伽马表")
+    name = next(name for name in backend.crtcs if backend.covers_screen(0, name))
+    original = backend.current_ramps(name)
+
+    backend.assign_screens([name])
+    backend.set_level((50, None))
+    assert list(backend.current_ramps(name)) == build_ramps(original, (0.5, 0.5, 0.5))
+
+    backend.close()
+    assert backend.current_ramps(name) == original
@@ -0,0 +1,109 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from global_hotkeys import (HotkeyManager, FakeHotkeyBackend, load_preset_hotkeys,
+                            ACTION_STEP_UP, ACTION_STEP_DOWN, preset_action)
+
+
+class FakeRoot:
+    """模拟XGrabKey：已被占用的按键通过onerror异步报告BadAccess"""
+
+    def __init__(self, taken):
+        from Xlib import error
+
+        self.taken = taken
+        self.grabs = set()
+        self.bad_access = error.BadAccess.__new__(error.BadAccess)
+
+    def grab_key(self, keycode, modifiers, owner_events, pointer_mode, keyboard_mode, onerror=None):
+        if keycode in self.taken:
+            onerror(self.bad_access, None)
+        else:
+            self.grabs.add((keycode, modifiers))
+
+    def ungrab_key(self, keycode, modifiers):
+        self.grabs.discard((keycode, modifiers))
+
+
+class FakeConnection:
+    def __init__(self, taken=()):
+        self.root = FakeRoot(taken)
+        self.display = SimpleNamespace(keysym_to_keycode=lambda keysym: keysym & 0xff, sync=lambda: None)
+
+    def add_handler(self, event_type, callback):
+        pass
+
+    def remove_handler(self, event_type, callback):
+        pass
+
+    def flush(self):
+        pass
+
+
+def test_load_preset_hotkeys(settings):
+    settings.setValue("hotkey_presets", json.dumps({"夜间模式": "Ctrl+Alt+N", "护眼模式": 3}))
+    assert load_preset_hotkeys(settings) == {"夜间模式": "Ctrl+Alt+N"}
+
+
+@pytest.mark.parametrize("raw", ["[\"Ctrl+Alt+N\"]", "\"Ctrl+Alt+N\"", "{", ""])
+def test_load_preset_hotkeys_ignores_malformed(settings, raw):
+    settings.setValue("hotkey_presets", raw)
+    assert load_preset_hotkeys(settings) == {}
+
+
+def test_x11_register_reports_bad_access(qapp):
+    pytest.importorskip("Xlib")
+    from Xlib import XK
+    from global_hotkeys import X11HotkeyBackend
+
+    up = XK.string_to_keysym("Up") & 0xff
+    connection = FakeConnection(taken={up})
+    backend = X11HotkeyBackend(connection)
+
+    assert not backend.register(ACTION_STEP_UP, "Ctrl+Alt+Up")
+    assert backend.register(preset_action("夜间模式"), "Ctrl+Alt+N")
+    assert {keycode for keycode, _ in connection.root.grabs} == {XK.string_to_keysym("N") & 0xff}
+
+
+def test_bind_returns_failed_hotkeys(qapp):
+    backend = FakeHotkeyBackend()
+    backend.register = lambda action, hotkey: hotkey != "Ctrl+Alt+Down"
+    manager = HotkeyManager(backend)
+    assert manager.bind("Ctrl+Alt+Up", "Ctrl+Alt+Down", {"夜间模式": "Ctrl+Alt+N"}) == ["Ctrl+Alt+Down"]
+
+
+def test_auto_repeat_is_coalesced_per_frame(qapp):
+    from types import SimpleNamespace
+    from PyQt5.QtTest import QTest
+    from PyQt5.QtWidgets import QSlider
+    from main import BrightnessApp
+
+    backend = FakeHotkeyBackend()
+    manager = HotkeyManager(backend, step=5)
+    steps = []
+    manager.brightness_step.connect(steps.append)
+
+    # 与BrightnessApp.setup_global_hotkeys相同，经由滑动条应用并限制在滑动条范围内
+    slider = QSlider()
+    slider.setRange(10, 100)
+    slider.setValue(70)
+    app = SimpleNamespace(main_window=SimpleNamespace(brightness_slider=slider))
+    app.set_slider_brightness = lambda value: BrightnessApp.set_slider_brightness(app, value)
+    manager.brightness_step.connect(lambda delta: BrightnessApp.step_brightness(app, delta))
+
+    backend.trigger(ACTION_STEP_UP, 30)
+    assert steps == []
+    QTest.qWait(50)
+    assert steps == [30 * 5]
+    assert (manager.events_received, manager.applications) == (30, 1)
+    assert slider.value() == 100
+
+    backend.trigger(ACTION_STEP_DOWN, 3)
+    QTest.qWait(50)
+    assert steps == [30 * 5, -3 * 5]
+    assert slider.value() == 85
+    manager.close()
@@ -0,0 +1,98 @@
+import socket
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from brightness_control import BrightnessControl, MODE_BLUE_LIGHT
+from metrics import MetricsExporter, METRIC_PREFIX, brightness_control_metrics, parse_metrics
+
+
+def scrape_in_thread(qapp, connect, request):
+    """在线程中像抓取工具一样读取指标，同时在GUI线程处理导出方的事件"""
+    reply = []
+
+    def run():
+        with connect() as client:
+            client.sendall(request)
+            chunks = []
+            while True:
+                chunk = client.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            reply.append(b"".join(chunks).decode("utf-8"))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while thread.is_alive() and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.001)
+    thread.join(1)
+    assert reply, "抓取超时"
+    return reply[0]
+
+
+def metric_types(text):
+    return {line.split()[2]: line.split()[3] for line in text.splitlines() if line.startswith("# TYPE ")}
+
+
+@pytest.fixture
+def exporter(qapp):
+    control = BrightnessControl()
+    exporter = MetricsExporter()
+    exporter.add_collector(lambda: brightness_control_metrics(control))
+    yield exporter, control
+    exporter.close()
+    control.cleanup()
+
+
+def test_local_socket_scrape(qapp, tmp_path, exporter):
+    exporter, control = exporter
+    path = str(tmp_path / "metrics.sock")
+    assert exporter.listen_local(path)
+
+    def connect():
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(path)
+        return client
+
+    text = scrape_in_thread(qapp, connect, b"\n")
+    types = metric_types(text)
+    assert types[METRIC_PREFIX + "level_percent"] == "gauge"
+    assert types[METRIC_PREFIX + "overlay_paints_total"] == "counter"
+    assert types[METRIC_PREFIX + "metrics_scrapes_total"] == "counter"
+    values = parse_metrics(text)
+    assert values[METRIC_PREFIX + "level_percent"] == 100
+    assert values[METRIC_PREFIX + 'mode{mode="normal"}'] == 1
+
+    control.set_brightness(40)
+    control.toggle_blue_light_filter(True)
+    values = parse_metrics(scrape_in_thread(qapp, connect, b"\n"))
+    assert values[METRIC_PREFIX + "level_percent"] == 40
+    assert values[METRIC_PREFIX + f'mode{{mode="{MODE_BLUE_LIGHT}"}}'] == 1
+    assert values[METRIC_PREFIX + "metrics_scrapes_total"] == 2
+    assert values[METRIC_PREFIX + "overlay_paints_total"] >= 1
+
+
+def test_http_scrape_on_ephemeral_port(qapp, exporter):
+    exporter, control = exporter
+    assert exporter.listen_tcp(0)
+    port = exporter.tcp_server.serverPort()
+
+    reply = scrape_in_thread(qapp, lambda: socket.create_connection(("127.0.0.1", port)),
+                             b"GET /metrics HTTP/1.0\r\nHost: localhost\r\n\r\n")
+    head, _, body = reply.partition("\r\n\r\n")
+    assert head.startswith("HTTP/1.0 200 OK")
+    assert "text/plain; version=0.0.4" in head
+    assert parse_metrics(body)[METRIC_PREFIX + "suspended"] == 0
+
+
+def test_listen_failure_is_logged(qapp, tmp_path, caplog):
+    exporter = MetricsExporter()
+    with caplog.at_level("WARNING", logger="metrics"):
+        assert not exporter.listen_local(str(tmp_path / "missing" / "metrics.sock"))
+    assert "无法监听指标套接字" in caplog.text
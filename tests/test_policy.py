@@ -0,0 +1,91 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from policy import LayeredSettings, PolicyManager
+
+
+class FakeWidget:
+    def __init__(self):
+        self.values = []
+
+    def setChecked(self, value):
+        self.values.append(value)
+
+
+@pytest.fixture
+def policy(qapp, tmp_path):
+    path = tmp_path / "policy.json"
+
+    def write(document):
+        path.write_text(json.dumps(document))
+        return manager.reload()
+
+    manager = PolicyManager(str(path))
+    manager.write = write
+    yield manager
+    manager.watcher.removePaths(manager.watcher.directories())
+
+
+def fake_main_window(settings):
+    return SimpleNamespace(settings=settings, autostart_checkbox=FakeWidget(),
+                           apply_policy_limits=lambda: None, update_policy_controls=lambda: None)
+
+
+def test_unlocked_key_returns_to_program_default(policy, settings):
+    from main_window import MainWindow
+
+    window = fake_main_window(LayeredSettings(settings, policy))
+    MainWindow.on_policy_changed(window, policy.policy, policy.write({"locked": {"auto_start": True}}))
+    MainWindow.on_policy_changed(window, policy.policy, policy.write({}))
+    assert window.autostart_checkbox.values == [True, False]
+
+
+def test_unlocked_key_returns_to_user_value(policy, settings):
+    from main_window import MainWindow
+
+    settings.setValue("auto_start", True)
+    window = fake_main_window(LayeredSettings(settings, policy))
+    MainWindow.on_policy_changed(window, policy.policy, policy.write({"locked": {"auto_start": False}}))
+    MainWindow.on_policy_changed(window, policy.policy, policy.write({}))
+    assert window.autostart_checkbox.values == [False, True]
+
+
+def test_startup_autostart_respects_locked_policy(policy, settings):
+    from main import BrightnessApp
+
+    calls = []
+    app = SimpleNamespace(settings=LayeredSettings(settings, policy),
+                          enable_autostart=lambda: calls.append("enable"),
+                          disable_autostart=lambda: calls.append("disable"))
+    policy.write({"locked": {"auto_start": True}})
+    BrightnessApp.check_autostart(app)
+    assert calls == ["enable"]
+
+
+def test_directory_created_after_startup_is_watched(qapp, tmp_path):
+    directory = tmp_path / "etc" / "screen-brightness-tool"
+    manager = PolicyManager(str(directory / "policy.json"))
+    changes = []
+    manager.policy_changed.connect(lambda policy, changed: changes.append(changed))
+    assert manager.watcher.directories() == [str(tmp_path)]
+
+    def process_until(condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            qapp.processEvents()
+            time.sleep(0.01)
+        return condition()
+
+    # 策略目录（连同缺失的上级目录）创建后改为监听策略目录
+    directory.mkdir(parents=True)
+    assert process_until(lambda: manager.watcher.directories() == [str(directory)])
+
+    (directory / "policy.json").write_text(json.dumps({"min_brightness": 30}))
+    assert process_until(lambda: changes)
+    assert manager.policy.min_brightness == 30
+    manager.watcher.removePaths(manager.watcher.directories() + manager.watcher.files())
@@ -0,0 +1,87 @@
+import pytest
+
+pytest.importorskip("PyQt5")
+
+import brightness_control
+from brightness_control import BrightnessControl, CHECK_INTERVAL_MS, POWER_SAVING_CHECK_INTERVAL_MS
+from power_supply import PowerMonitor, create_power_monitor, has_battery, on_battery
+
+
+def make_supply(root, name, **attributes):
+    """在伪造的 /sys/class/power_supply 下创建一个电源设备"""
+    path = root / name
+    path.mkdir(parents=True)
+    for key, value in attributes.items():
+        (path / key).write_text(f"{value}\n")
+    return path
+
+
+def test_desktop_without_battery(tmp_path):
+    make_supply(tmp_path, "AC", type="Mains", online=0)
+    assert not has_battery(str(tmp_path))
+    assert not on_battery(str(tmp_path))
+    assert create_power_monitor(str(tmp_path)) is None
+
+
+def test_missing_root(tmp_path):
+    assert not on_battery(str(tmp_path / "missing"))
+
+
+def test_adapter_online_state(tmp_path):
+    make_supply(tmp_path, "BAT0", type="Battery", status="Discharging")
+    adapter = make_supply(tmp_path, "AC", type="Mains", online=1)
+    assert not on_battery(str(tmp_path))
+    (adapter / "online").write_text("0\n")
+    assert on_battery(str(tmp_path))
+
+
+def test_usb_c_adapter_counts_as_ac(tmp_path):
+    make_supply(tmp_path, "BAT0", type="Battery", status="Charging")
+    make_supply(tmp_path, "ucsi-source-psy-USBC000:001", type="USB", online=1)
+    assert not on_battery(str(tmp_path))
+
+
+def test_battery_status_without_adapter(tmp_path):
+    battery = make_supply(tmp_path, "BAT0", type="Battery", status="Discharging")
+    assert on_battery(str(tmp_path))
+    (battery / "status").write_text("Charging\n")
+    assert not on_battery(str(tmp_path))
+
+
+def test_peripheral_batteries_ignored(tmp_path):
+    make_supply(tmp_path, "hidpp_battery_0", type="Battery", scope="Device", status="Discharging")
+    assert not has_battery(str(tmp_path))
+    assert not on_battery(str(tmp_path))
+
+
+def test_monitor_emits_on_change(qapp, tmp_path):
+    make_supply(tmp_path, "BAT0", type="Battery", status="Discharging")
+    adapter = make_supply(tmp_path, "AC", type="Mains", online=1)
+    monitor = PowerMonitor(str(tmp_path))
+    changes = []
+    monitor.on_battery_changed.connect(changes.append)
+
+    monitor.refresh()
+    (adapter / "online").write_text("0\n")
+    monitor.refresh()
+    monitor.refresh()
+    assert changes == [True]
+    assert monitor.refreshes == 3
+    monitor.close()
+
+
+@pytest.mark.parametrize("battery_opacity_overlays", [False, True])
+def test_power_saving_keeps_overlays_unless_opted_in(qapp, monkeypatch, battery_opacity_overlays):
+    monkeypatch.setattr(brightness_control, "window_opacity_supported", lambda: True)
+    control = BrightnessControl(battery_opacity_overlays=battery_opacity_overlays)
+    overlays = list(control._overlay)
+
+    control.set_power_saving(True)
+    assert control.check_interval == POWER_SAVING_CHECK_INTERVAL_MS
+    assert control.opacity_overlays == battery_opacity_overlays
+    assert (control._overlay == overlays) == (not battery_opacity_overlays)
+
+    control.set_power_saving(False)
+    assert control.check_interval == CHECK_INTERVAL_MS
+    assert not control.opacity_overlays
+    control.cleanup()
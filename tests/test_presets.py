@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from brightness_control import (BrightnessControl, RenderState, MODE_BLUE_LIGHT, MODE_NORMAL,
+                                COMPILE_CACHE_SIZE, rect_to_tuple, temperature_tint, tint_temperature)
+from presets import PresetManager, Preset, PRESET_NORMAL, PRESET_EYE_PROTECT, PRESET_NIGHT
+
+TINTED_AREA_STATE = RenderState(60, MODE_BLUE_LIGHT, temperature_tint(3400), ((0, 0, 100, 100),))
+
+
+def test_tint_temperature_round_trip():
+    assert tint_temperature(None) == 6500
+    for kelvin in range(1900, 6500, 37):
+        tint = temperature_tint(kelvin)
+        assert temperature_tint(tint_temperature(tint)) == tint
+
+
+def test_normal_preset_clears_tint_and_areas(settings):
+    presets = PresetManager(settings)
+    state = presets.resolve(PRESET_NORMAL, TINTED_AREA_STATE)
+    assert state == RenderState(100, MODE_BLUE_LIGHT, None, ())
+
+
+def test_builtin_presets_keep_filter_mode(settings):
+    presets = PresetManager(settings, eye_protect_intensity=65)
+    assert presets.resolve(PRESET_EYE_PROTECT, TINTED_AREA_STATE) == TINTED_AREA_STATE._replace(level=65)
+    assert presets.resolve(PRESET_NIGHT, TINTED_AREA_STATE).mode == MODE_BLUE_LIGHT
+
+
+def test_custom_preset_saves_temperature(settings):
+    presets = PresetManager(settings)
+    presets.add(Preset("阅读", 80, MODE_NORMAL, tint_temperature(TINTED_AREA_STATE.tint), (), False))
+
+    reloaded = PresetManager(settings)
+    assert json.loads(settings.value("presets"))[0]["temperature"] == 3400
+    state = reloaded.resolve("阅读", RenderState(100, MODE_BLUE_LIGHT, None, ((0, 0, 5, 5),)))
+    assert state == RenderState(80, MODE_NORMAL, TINTED_AREA_STATE.tint, ())
+
+
+def test_precompiled_states_survive_slider_drag(qapp):
+    control = BrightnessControl()
+    geometry = rect_to_tuple(control._overlay[0].geometry())
+    preset_state = RenderState(40, MODE_NORMAL, temperature_tint(3400), ())
+    control.precompile([preset_state])
+    compiled = control._compile(preset_state, geometry)
+
+    for level in range(101):
+        control._compile(RenderState(level, MODE_NORMAL, None, ()), geometry)
+
+    assert len(control._compile_cache) <= COMPILE_CACHE_SIZE
+    assert control._compile(preset_state, geometry) is compiled
+    control.cleanup()
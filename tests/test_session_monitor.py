@@ -0,0 +1,145 @@
+import shutil
+import subprocess
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5")
+QtDBus = pytest.importorskip("PyQt5.QtDBus")
+
+from brightness_control import BrightnessControl
+from session_monitor import SessionMonitor, LOGIND_SESSION, PROPERTIES_INTERFACE, REASON_LOCKED
+
+SESSION_PATH = "/org/freedesktop/login1/session/_32"
+
+
+class FakeBus:
+    """只接受部分信号连接的假D-Bus连接"""
+
+    def __init__(self, accepted=(), connected=True):
+        self.accepted = accepted
+        self.connected = connected
+
+    def isConnected(self):
+        return self.connected
+
+    def connect(self, service, path, interface, name, slot):
+        return interface in self.accepted
+
+
+class FakeInterface:
+    reply = None
+
+    def __init__(self, service, path, interface, bus):
+        pass
+
+    def isValid(self):
+        return True
+
+    def call(self, method, *args):
+        return self.reply
+
+
+@pytest.fixture
+def logind_reply(monkeypatch):
+    monkeypatch.setattr(QtDBus, "QDBusInterface", FakeInterface)
+    monkeypatch.setenv("XDG_SESSION_ID", "2")
+
+    def set_reply(reply):
+        FakeInterface.reply = reply
+    return set_reply
+
+
+def method_reply(*arguments):
+    call = QtDBus.QDBusMessage.createMethodCall("org.freedesktop.login1", "/org/freedesktop/login1",
+                                                "org.freedesktop.login1.Manager", "GetSession")
+    return call.createReply(list(arguments))
+
+
+def test_session_path_from_reply(logind_reply):
+    logind_reply(method_reply(QtDBus.QDBusObjectPath("/org/freedesktop/login1/session/_32")))
+    assert SessionMonitor._logind_session_path(None) == "/org/freedesktop/login1/session/_32"
+
+
+def test_session_path_ignores_error_reply(logind_reply):
+    # 经过总线的错误回复把错误信息作为第一个参数
+    error = method_reply().createErrorReply("org.freedesktop.login1.NoSuchSession", "No session '2' known")
+    error.setArguments(["No session '2' known"])
+    logind_reply(error)
+    assert SessionMonitor._logind_session_path(None) == ""
+
+
+def test_session_path_ignores_non_path_reply(logind_reply):
+    logind_reply(method_reply("No session '2' known"))
+    assert SessionMonitor._logind_session_path(None) == ""
+    logind_reply(method_reply(2))
+    assert SessionMonitor._logind_session_path(None) == ""
+
+
+def test_screensaver_source_needs_screensaver_connection(qapp, monkeypatch):
+    monkeypatch.setattr(SessionMonitor, "_logind_session_path", staticmethod(lambda bus: ""))
+    monitor = SessionMonitor()
+    assert monitor.watch_dbus(FakeBus(accepted=(LOGIND_SESSION,)), FakeBus())
+    assert monitor.sources == ["logind-lock"]
+
+    monitor = SessionMonitor()
+    assert monitor.watch_dbus(FakeBus(connected=False), FakeBus(accepted=("org.gnome.ScreenSaver",)))
+    assert monitor.sources == ["screensaver"]
+
+
+def test_screensaver_inactive_clears_lock(qapp):
+    monitor = SessionMonitor()
+    monitor.set_reason(REASON_LOCKED, True)
+    monitor._on_screensaver_active(True)
+    monitor._on_screensaver_active(False)
+    assert not monitor.suspended
+
+
+@pytest.fixture
+def private_bus(qapp):
+    """在临时的dbus-daemon上建立监听和发送两个连接，没有dbus-daemon时跳过"""
+    if shutil.which("dbus-daemon") is None:
+        pytest.skip("需要dbus-daemon")
+    process = subprocess.Popen(["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    address = process.stdout.readline().strip()
+    if not address:
+        process.kill()
+        pytest.skip("dbus-daemon启动失败")
+
+    bus = QtDBus.QDBusConnection.connectToBus(address, "session-monitor-test")
+    sender = QtDBus.QDBusConnection.connectToBus(address, "session-monitor-test-sender")
+    yield bus, sender
+    QtDBus.QDBusConnection.disconnectFromBus("session-monitor-test")
+    QtDBus.QDBusConnection.disconnectFromBus("session-monitor-test-sender")
+    process.terminate()
+    process.wait()
+
+
+def send_signal(qapp, sender, path, interface, name, arguments=(), until=None):
+    message = QtDBus.QDBusMessage.createSignal(path, interface, name)
+    message.setArguments(list(arguments))
+    assert sender.send(message)
+    deadline = time.monotonic() + 5
+    while not until() and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.005)
+    assert until()
+
+
+def test_locker_unlock_commits_pending_state(qapp, private_bus):
+    bus, sender = private_bus
+    monitor = SessionMonitor()
+    assert monitor.watch_dbus(bus, bus)
+    control = BrightnessControl()
+    monitor.suspended_changed.connect(control.set_suspended)
+
+    send_signal(qapp, sender, SESSION_PATH, LOGIND_SESSION, "Lock", until=lambda: control.suspended)
+    control.set_brightness(40)
+    assert control.state.level == 100
+
+    # 锁屏程序解锁：只有LockedHint变为false，没有Unlock信号
+    send_signal(qapp, sender, SESSION_PATH, PROPERTIES_INTERFACE, "PropertiesChanged",
+                [LOGIND_SESSION, {"LockedHint": False}, []], until=lambda: not control.suspended)
+    assert control.state.level == 40
+    control.cleanup()
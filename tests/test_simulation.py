@@ -0,0 +1,92 @@
+from datetime import datetime, time as dtime
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from clock import VirtualClock
+from circadian import parse_keyframes, DEFAULT_KEYFRAMES
+from presets import PRESET_EYE_PROTECT, PRESET_NORMAL
+from simulation import Simulation
+
+
+def berlin():
+    zoneinfo = pytest.importorskip("zoneinfo")
+    try:
+        return zoneinfo.ZoneInfo("Europe/Berlin")
+    except zoneinfo.ZoneInfoNotFoundError:
+        pytest.skip("需要时区数据")
+
+
+def schedule_transitions(simulation):
+    return [(when, value) for when, kind, value in simulation.transitions if kind == "schedule"]
+
+
+def test_timers_fire_in_deadline_then_start_order():
+    clock = VirtualClock(datetime(2026, 1, 1))
+    fired = []
+    for name, interval in (("a", 30), ("b", 20), ("c", 20)):
+        timer = clock.create_timer()
+        timer.timeout.connect(lambda name=name: fired.append((name, clock.monotonic_ms)))
+        timer.start(interval)
+    once = clock.create_timer()
+    once.setSingleShot(True)
+    once.timeout.connect(lambda: fired.append(("once", clock.monotonic_ms)))
+    once.start(25)
+
+    clock.advance(60)
+    assert fired == [("b", 20), ("c", 20), ("once", 25), ("a", 30), ("b", 40), ("c", 40),
+                     ("a", 60), ("b", 60), ("c", 60)]
+    assert not once.isActive()
+    assert clock.now() == datetime(2026, 1, 1, 0, 0, 0, 60000)
+
+
+def test_suspend_moves_wall_time_only():
+    clock = VirtualClock(datetime(2026, 1, 1, 12, 0))
+    timer = clock.create_timer()
+    timer.start(60000)
+    clock.suspend(3600000)
+    assert clock.now() == datetime(2026, 1, 1, 13, 0)
+    assert timer.remainingTime() == 60000
+
+
+def test_schedule_ending_at_midnight():
+    simulation = Simulation(datetime(2026, 6, 1, 20, 0), window=(dtime(22, 0), dtime(0, 0)))
+    simulation.run_until(datetime(2026, 6, 2, 2, 0))
+    assert schedule_transitions(simulation) == [
+        (datetime(2026, 6, 1, 22, 0), PRESET_EYE_PROTECT),
+        (datetime(2026, 6, 2, 0, 0), PRESET_NORMAL),
+    ]
+    assert simulation.violations == []
+
+
+def test_schedule_end_in_skipped_dst_hour():
+    # 2026-03-29 02:00 直接跳到 03:00，02:30 不存在
+    simulation = Simulation(datetime(2026, 3, 28, 20, 0), berlin(), window=(dtime(22, 0), dtime(2, 30)))
+    simulation.run_until(datetime(2026, 3, 29, 6, 0))
+    assert schedule_transitions(simulation) == [
+        (datetime(2026, 3, 28, 22, 0), PRESET_EYE_PROTECT),
+        (datetime(2026, 3, 29, 3, 0), PRESET_NORMAL),
+    ]
+    assert simulation.violations == []
+
+
+def test_sleep_across_schedule_boundary():
+    simulation = Simulation(datetime(2026, 6, 1, 20, 0), window=(dtime(22, 0), dtime(6, 0)))
+    simulation.sleep(datetime(2026, 6, 1, 21, 30), 180)
+    simulation.run_until(datetime(2026, 6, 2, 0, 0))
+    # 唤醒时立即检查，补上休眠期间错过的切换
+    assert schedule_transitions(simulation) == [(datetime(2026, 6, 2, 0, 30), PRESET_EYE_PROTECT)]
+    assert simulation.violations == []
+
+
+@pytest.mark.parametrize("circadian", [False, True])
+def test_simulated_day_has_no_violations(circadian):
+    keyframes = parse_keyframes(DEFAULT_KEYFRAMES) if circadian else None
+    window = None if circadian else (dtime(22, 0), dtime(6, 0))
+    simulation = Simulation(datetime(2026, 10, 24, 0, 0), berlin(), window, keyframes=keyframes)
+    simulation.sleep(datetime(2026, 10, 24, 20, 0), 600)
+    simulation.run_until(datetime(2026, 10, 26, 0, 0))  # 包括10月25日的夏令时结束
+    assert simulation.probes > 24 * 60
+    assert simulation.transitions
+    assert simulation.violations == []
@@ -0,0 +1,151 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("PyQt5")
+pytest.importorskip("Xlib")
+
+from special_windows import X11SpecialWindowProvider
+
+MENU, NORMAL, CLIENT_LIST, WINDOW_TYPE = 1, 2, 3, 4
+ATOMS = {"_NET_WM_WINDOW_TYPE_MENU": MENU, "_NET_WM_WINDOW_TYPE_NORMAL": NORMAL,
+         "_NET_CLIENT_LIST_STACKING": CLIENT_LIST, "_NET_WM_WINDOW_TYPE": WINDOW_TYPE}
+
+
+class FakeWindow:
+    def __init__(self, window_id, window_type, rect=(0, 0, 10, 10)):
+        self.id = window_id
+        self.window_type = window_type
+        self.rect = rect
+
+    def get_full_property(self, atom, property_type):
+        return SimpleNamespace(value=[self.window_type])
+
+    def get_geometry(self):
+        return SimpleNamespace(width=self.rect[2], height=self.rect[3])
+
+    def translate_coords(self, root, x, y):
+        return SimpleNamespace(x=-self.rect[0], y=-self.rect[1])
+
+    def change_attributes(self, event_mask):
+        pass
+
+
+class FakeRoot:
+    id = 0
+
+    def __init__(self):
+        self.clients = []
+
+    def get_full_property(self, atom, property_type):
+        return SimpleNamespace(value=[window.id for window in self.clients])
+
+    def query_tree(self):
+        return SimpleNamespace(children=[])
+
+
+class FakeConnection:
+    def __init__(self):
+        self.root = FakeRoot()
+        self.windows = {}
+        self.display = SimpleNamespace(create_resource_object=lambda kind, window_id: self.windows[window_id])
+        self.handlers = {}
+
+    def atom(self, name):
+        return ATOMS.get(name, 100 + len(name))
+
+    def add_handler(self, event_type, handler):
+        self.handlers[event_type] = handler
+
+    def remove_handler(self, event_type, handler):
+        self.handlers.pop(event_type, None)
+
+    def select_root_events(self, mask):
+        pass
+
+    def send(self, event_type, window, **fields):
+        from Xlib import X
+
+        handler = self.handlers[getattr(X, event_type)]
+        handler(SimpleNamespace(window=window, send_event=False, **fields))
+
+
+@pytest.fixture
+def connection(qapp):
+    return FakeConnection()
+
+
+def test_destroyed_override_windows_are_forgotten(connection):
+    provider = X11SpecialWindowProvider(connection)
+    for window_id in range(10, 20):
+        window = FakeWindow(window_id, MENU if window_id % 2 else NORMAL)
+        connection.send("MapNotify", window, override=True)
+        connection.send("UnmapNotify", window)
+        connection.send("DestroyNotify", window)
+    assert provider._special == {}
+    assert provider._rects == {}
+    assert provider._override == []
+    provider.close()
+
+
+def test_destroyed_client_is_forgotten(connection):
+    menu = FakeWindow(5, MENU, (20, 30, 40, 50))
+    connection.windows[menu.id] = menu
+    connection.root.clients.append(menu)
+    provider = X11SpecialWindowProvider(connection)
+    assert provider.rects == [(20, 30, 40, 50)]
+
+    connection.send("DestroyNotify", menu)
+    assert provider._special == {}
+    assert provider.rects == []
+    provider.close()
+
+
+def process_until(qapp, condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.005)
+    return condition()
+
+
+def test_xvfb_menu_window_rects(qapp, xvfb_connection):
+    from Xlib import X, Xatom, display
+
+    provider = X11SpecialWindowProvider(xvfb_connection)
+    emitted = []
+    provider.rects_changed.connect(emitted.append)
+
+    # 另开一个客户端连接，像普通程序一样创建菜单
+    client = display.Display(xvfb_connection.display.get_display_name())
+    root = client.screen().root
+    window_type = client.intern_atom("_NET_WM_WINDOW_TYPE")
+
+    def override_window(x, y, width, height, type_name):
+        window = root.create_window(x, y, width, height, 0, X.CopyFromParent, override_redirect=True)
+        window.change_property(window_type, Xatom.ATOM, 32, [client.intern_atom(type_name)])
+        return window
+
+    plain = override_window(0, 0, 30, 30, "_NET_WM_WINDOW_TYPE_NORMAL")
+    menu = override_window(10, 20, 100, 50, "_NET_WM_WINDOW_TYPE_MENU")
+    plain.map()
+    menu.map()
+    client.sync()
+    assert process_until(qapp, lambda: len(emitted) == 1)
+    assert emitted == [[(10, 20, 100, 50)]]
+
+    menu.configure(x=200, y=300)
+    client.sync()
+    assert process_until(qapp, lambda: len(emitted) == 2)
+    assert emitted[-1] == [(200, 300, 100, 50)]
+
+    menu.destroy()
+    plain.destroy()
+    client.sync()
+    assert process_until(qapp, lambda: len(emitted) == 3)
+    assert emitted[-1] == []
+    assert provider._special == {} and provider._override == []
+
+    provider.close()
+    client.close()
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from stall_watchdog import StallWatchdog
+
+
+def block_gui_thread():
+    time.sleep(0.3)
+
+
+def process_until(qapp, condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.005)
+    return condition()
+
+
+@pytest.fixture
+def watchdog(qapp):
+    watchdog = StallWatchdog(threshold_ms=50, capacity=2)
+    watchdog.interval_ms = 20
+    watchdog.finished = []
+    watchdog.incident_finished.connect(watchdog.finished.append)
+    watchdog.start()
+    yield watchdog
+    watchdog.close()
+
+
+def stall_once(qapp, watchdog):
+    from PyQt5.QtCore import QTimer
+
+    count = len(watchdog.finished)
+    # 排队到事件循环中执行，与真实的卡顿一样由某个槽函数阻塞GUI线程
+    QTimer.singleShot(0, block_gui_thread)
+    assert process_until(qapp, lambda: len(watchdog.finished) > count), "没有记录卡顿"
+    return watchdog.finished[-1]
+
+
+def test_stall_records_blocking_frame(qapp, watchdog, caplog):
+    assert process_until(qapp, lambda: watchdog.heartbeats >= 3)
+    assert watchdog.stalls == 0
+
+    with caplog.at_level("WARNING", logger="stall_watchdog"):
+        incident = stall_once(qapp, watchdog)
+    assert incident.location.startswith("test_stall_watchdog.py:")
+    assert incident.location.endswith(" block_gui_thread")
+    assert "block_gui_thread" in incident.stacks[0][1]
+    assert incident.duration_ms >= 50
+    assert list(watchdog.incidents) == [incident]
+    assert "block_gui_thread" in caplog.text
+
+
+def test_incidents_are_capped_at_capacity(qapp, watchdog):
+    incidents = [stall_once(qapp, watchdog) for _ in range(3)]
+    assert watchdog.stalls == 3
+    assert list(watchdog.incidents) == incidents[1:]
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from brightness_control import RenderState, MODE_NORMAL, MODE_BLUE_LIGHT, MODE_HIGH_CONTRAST
+from hardware_backend import LatestValueWorker
+from sysfs_backlight import SysfsBacklightBackend, create_backlight_backend, discover_backlights
+
+
+def make_device(root, name, max_brightness=1000, brightness=700, backlight_type="raw"):
+    """在伪造的 /sys/class/backlight 下创建一个背光设备"""
+    path = root / name
+    path.mkdir(parents=True)
+    (path / "max_brightness").write_text(f"{max_brightness}\n")
+    (path / "brightness").write_text(f"{brightness}\n")
+    if backlight_type is not None:
+        (path / "type").write_text(f"{backlight_type}\n")
+    return path
+
+
+def read_brightness(path):
+    return int((path / "brightness").read_text())
+
+
+def test_discover_orders_by_type(tmp_path):
+    make_device(tmp_path, "acpi_video0", backlight_type="firmware")
+    make_device(tmp_path, "intel_backlight", backlight_type="raw")
+    make_device(tmp_path, "nvidia_0", backlight_type=None)  # 没有type属性视为raw
+    (tmp_path / "broken").mkdir()  # 没有max_brightness的目录被忽略
+
+    names = [path.rsplit("/", 1)[1] for path in discover_backlights(str(tmp_path))]
+    assert names == ["acpi_video0", "intel_backlight", "nvidia_0"]
+
+
+def test_discover_missing_root(tmp_path):
+    assert discover_backlights(str(tmp_path / "missing")) == []
+
+
+def test_write_and_restore(qapp, tmp_path):
+    path = make_device(tmp_path, "intel_backlight")
+    backend = create_backlight_backend(str(tmp_path), min_percent=10)
+    assert isinstance(backend, SysfsBacklightBackend)
+    assert backend.min_level == 10
+
+    confirmed = []
+    backend.level_confirmed.connect(confirmed.append)
+    backend.set_level(50)
+    deadline = time.monotonic() + 5
+    while not confirmed and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.001)
+    assert confirmed == [50]
+    assert read_brightness(path) == 500
+
+    # 恢复值由工作线程写入
+    backend.close()
+    assert read_brightness(path) == 700
+
+
+def test_level_clamped_to_minimum(qapp, tmp_path):
+    make_device(tmp_path, "intel_backlight", max_brightness=255)
+    backend = SysfsBacklightBackend(str(tmp_path / "intel_backlight"), min_percent=10)
+    assert backend.level_to_raw(0) == 26
+    assert backend.level_to_raw(100) == 255
+    backend.close(restore=False)
+
+
+def test_split_state_only_in_normal_mode(qapp, tmp_path):
+    make_device(tmp_path, "intel_backlight")
+    backend = SysfsBacklightBackend(str(tmp_path / "intel_backlight"), min_percent=10)
+
+    assert backend.split_state(RenderState(50, MODE_NORMAL, None, ())) == (50, RenderState(100, MODE_NORMAL, None, ()))
+    # 低于硬件最低亮度的部分由遮罩补足
+    assert backend.split_state(RenderState(5, MODE_NORMAL, None, ())) == (10, RenderState(50, MODE_NORMAL, None, ()))
+    # 滤镜模式和区域模式完全由遮罩实现
+    for state in (RenderState(50, MODE_BLUE_LIGHT, None, ()), RenderState(50, MODE_HIGH_CONTRAST, None, ()),
+                  RenderState(50, MODE_NORMAL, None, ((0, 0, 10, 10),))):
+        assert backend.split_state(state) == (100, state)
+    backend.close(restore=False)
+
+
+def test_write_error_reported(qapp, tmp_path):
+    path = make_device(tmp_path, "intel_backlight")
+    backend = SysfsBacklightBackend(str(path))
+    errors = []
+    backend.write_failed.connect(errors.append)
+    (path / "brightness").unlink()
+    (path / "brightness").mkdir()  # 写入时出现OSError
+
+    backend.set_level(40)
+    backend.worker.close()
+    qapp.processEvents()
+    assert backend.worker.errors == 1
+    assert len(errors) == 1
+    backend.close(restore=False)
+
+
+def test_worker_survives_unexpected_errors(caplog):
+    written = []
+    failed = threading.Event()
+
+    def apply(value):
+        if value == 1:
+            raise RuntimeError("boom")
+        written.append(value)
+
+    worker = LatestValueWorker(apply, name="test-worker", on_error=lambda value, exc: failed.set())
+    worker.submit(1)
+    assert failed.wait(1.0)
+    worker.submit(2)
+    worker.close()
+
+    assert written == [2]
+    assert worker.errors == 1 and worker.applied == 1
+    assert "RuntimeError: boom" in caplog.text
@@ -0,0 +1,134 @@
+import itertools
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+import usage_journal
+from brightness_control import RenderState, MODE_NORMAL, MODE_BLUE_LIGHT, SOURCE_USER, SOURCE_SCHEDULE
+from usage_journal import (UsageJournal, EVENT_START, EVENT_STOP, HEADER, RECORD, iter_records,
+                           journal_files, summarize)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """每次取时间前进一秒的毫秒时钟"""
+    ticks = itertools.count(1000000, 1000)
+    monkeypatch.setattr(UsageJournal, "_now", staticmethod(lambda: next(ticks)))
+
+
+def write_session(path, states, **kwargs):
+    journal = UsageJournal(str(path), flush_interval=0.01, **kwargs)
+    for state, source in states:
+        journal.record_state(state, source)
+    journal.close()
+    return journal
+
+
+def state(level, mode=MODE_NORMAL):
+    return RenderState(level, mode, None, ())
+
+
+def all_records(path):
+    return [record for file_path in journal_files(str(path)) for record in iter_records(file_path)]
+
+
+def test_round_trip(tmp_path, clock):
+    path = tmp_path / "usage.bin"
+    tint = (255, 120, 0, 40)
+    write_session(path, [(state(80), SOURCE_USER), (RenderState(60, MODE_BLUE_LIGHT, tint, ((0, 0, 5, 5),)),
+                                                   SOURCE_SCHEDULE)])
+    assert all_records(path) == [
+        (1000000, EVENT_START, 0, 0, 0, 0, 0, 0, 0),
+        (1001000, SOURCE_USER, 80, 0, 0, 0, 0, 0, 0),
+        (1002000, SOURCE_SCHEDULE, 60, 2, 1, *tint),
+        (1003000, EVENT_STOP, 0, 0, 0, 0, 0, 0, 0),
+    ]
+
+
+def test_rotation_keeps_order(tmp_path, clock):
+    path = tmp_path / "usage.bin"
+    journal = write_session(path, [(state(level), SOURCE_USER) for level in range(10, 20)],
+                            max_bytes=HEADER.size + 4 * RECORD.size, backups=2)
+    files = journal_files(str(path))
+    assert [name.rsplit("/", 1)[1] for name in files] == ["usage.bin.2", "usage.bin.1", "usage.bin"]
+    assert journal.rotations == 3
+
+    # 最旧的历史文件已删除，剩下的记录按时间顺序排列
+    levels = [record[2] for record in all_records(path)]
+    assert levels == [13, 14, 15, 16, 17, 18, 19, 0]
+    timestamps = [record[0] for record in all_records(path)]
+    assert timestamps == sorted(timestamps)
+
+
+def test_truncated_record_is_ignored(tmp_path, clock):
+    path = tmp_path / "usage.bin"
+    write_session(path, [(state(70), SOURCE_USER)])
+    with open(path, "ab") as f:
+        f.write(RECORD.pack(1009000, SOURCE_USER, 30, 0, 0, 0, 0, 0, 0)[:7])
+
+    assert [record[2] for record in iter_records(str(path))] == [0, 70, 0]
+    assert summarize(str(path))["records"] == 3
+
+
+def test_invalid_file(tmp_path):
+    path = tmp_path / "usage.bin"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        list(iter_records(str(path)))
+
+
+def test_summarize(tmp_path, clock):
+    path = tmp_path / "usage.bin"
+    # 与上一条相同的状态不记录
+    write_session(path, [(state(80), SOURCE_USER), (state(60, MODE_BLUE_LIGHT), SOURCE_SCHEDULE),
+                         (state(60, MODE_BLUE_LIGHT), SOURCE_USER)])
+    write_session(path, [(state(50), SOURCE_USER)])
+
+    summary = summarize(str(path))
+    assert summary == {
+        "records": 7,
+        "seconds_at_level": {80: 1.0, 60: 1.0, 50: 1.0},
+        "seconds_in_mode": {MODE_NORMAL: 2.0, MODE_BLUE_LIGHT: 1.0},
+        "changes_by_source": {"user": 2, "schedule": 1},
+        "sessions": 2,
+    }
+    assert summarize(str(path), since=1004000)["sessions"] == 1
+
+
+def test_vectorized_summary_matches_loop(tmp_path, clock):
+    np = pytest.importorskip("numpy")
+    path = tmp_path / "usage.bin"
+    for session in range(3):
+        states = [(state(20 + (i * 7 + session) % 80, (MODE_NORMAL, MODE_BLUE_LIGHT)[i % 2]),
+                   (SOURCE_USER, SOURCE_SCHEDULE)[i % 3 == 0]) for i in range(50)]
+        write_session(path, states, max_bytes=HEADER.size + 32 * RECORD.size, backups=10)
+
+    for since in (None, 1060000):
+        loop = usage_journal._summarize_records(str(path), since)
+        vectorized = usage_journal._summarize_arrays(str(path), since, np)
+        assert vectorized.keys() == loop.keys()
+        for key, value in loop.items():
+            assert vectorized[key] == (pytest.approx(value) if isinstance(value, dict) else value)
+
+
+def test_empty_journal(tmp_path):
+    summary = summarize(str(tmp_path / "missing.bin"))
+    assert summary["records"] == 0
+    assert summary["seconds_at_level"] == {}
+
+
+def test_crashed_session_ends_at_next_start(tmp_path, clock):
+    np = pytest.importorskip("numpy")
+    path = tmp_path / "usage.bin"
+    write_session(path, [(state(80), SOURCE_USER)])
+    # 上次会话没有退出记录：最后一个状态只持续到下一次启动之前的最后一条记录
+    with open(path, "ab") as f:
+        f.write(RECORD.pack(1010000, EVENT_START, 0, 0, 0, 0, 0, 0, 0))
+        f.write(RECORD.pack(1011000, SOURCE_USER, 40, 0, 0, 0, 0, 0, 0))
+    write_session(path, [(state(90), SOURCE_USER)])
+
+    for summary in (usage_journal._summarize_records(str(path), None),
+                    usage_journal._summarize_arrays(str(path), None, np)):
+        assert summary["seconds_at_level"] == {80: 1.0, 90: 1.0}
+        assert summary["sessions"] == 3
@@ -0,0 +1,145 @@
+from PyQt5.QtCore import Qt, QObject, QEvent
+from PyQt5.QtGui import QPalette, QColor
+from PyQt5.QtWidgets import QApplication
+
+THEME_LIGHT = "light"
+THEME_DARK = "dark"
+
+DARK_STYLESHEET = """
+    QGroupBox {
+        border: 1px solid #555;
+        border-radius: 5px;
+        margin-top: 10px;
+        padding-top: 15px;
+    }
+    QGroupBox::title {
+        subcontrol-origin: margin;
+        subcontrol-position: top left;
+        padding: 0 8px;
+        color: #ddd;
+    }
+    QPushButton {
+        background-color: #444;
+        border: 1px solid #555;
+        border-radius: 3px;
+        color: #ddd;
+        padding: 5px;
+    }
+    QPushButton:hover {
+        background-color: #555;
+    }
+    QPushButton:pressed {
+        background-color: #666;
+    }
+    QSlider::groove:horizontal {
+        height: 8px;
+        background: #444;
+        border-radius: 4px;
+    }
+    QSlider::handle:horizontal {
+        background: #ddd;
+        border: 1px solid #777;
+        width: 18px;
+        border-radius: 9px;
+        margin: -5px 0;
+    }
+    QCheckBox {
+        color: #ddd;
+    }
+    QLabel {
+        color: #ddd;
+    }
+    QComboBox {
+        background-color: #444;
+        color: #ddd;
+        border: 1px solid #555;
+        border-radius: 3px;
+        padding: 2px 5px;
+    }
+    QTimeEdit {
+        background-color: #444;
+        color: #ddd;
+        border: 1px solid #555;
+        border-radius: 3px;
+        padding: 2px 5px;
+    }
+"""
+
+LIGHT_STYLESHEET = """
+    QGroupBox::title {
+        padding: 0 8px;
+    }
+"""
+
+
+def dark_palette():
+    """暗色调色板"""
+    palette = QPalette()
+    palette.setColor(QPalette.Window, QColor(53, 53, 53))
+    palette.setColor(QPalette.WindowText, Qt.white)
+    palette.setColor(QPalette.Base, QColor(35, 35, 35))
+    palette.setColor(QPalette.AlternateBase, QColor(53, 53, 53))
+    palette.setColor(QPalette.ToolTipBase, QColor(25, 25, 25))
+    palette.setColor(QPalette.ToolTipText, Qt.white)
+    palette.setColor(QPalette.Text, Qt.white)
+    palette.setColor(QPalette.Button, QColor(53, 53, 53))
+    palette.setColor(QPalette.ButtonText, Qt.white)
+    palette.setColor(QPalette.BrightText, Qt.red)
+    palette.setColor(QPalette.Link, QColor(42, 130, 218))
+    palette.setColor(QPalette.Highlight, QColor(42, 130, 218))
+    palette.setColor(QPalette.HighlightedText, Qt.black)
+    return palette
+
+
+class ThemeManager(QObject):
+    """预先准备好的亮色/暗色主题，切换时只替换缓存的调色板和样式表
+
+    调色板设置在整个程序上（对话框和托盘菜单跟随主题，调色板变化只需重绘可见的窗口）；
+    样式表只设置在注册的窗口上，由子部件继承，因此悬浮窗、菜单等自带样式的窗口不会被重新应用样式。
+    窗口隐藏时不立即重新应用样式，等到下次显示前再应用，所以切换时只有可见的窗口被重新应用样式。
+    """
+
+    def __init__(self, parent=None):
+        super(ThemeManager, self).__init__(parent)
+        app = QApplication.instance()
+        self.themes = {
+            THEME_LIGHT: (app.style().standardPalette(), LIGHT_STYLESHEET),
+            THEME_DARK: (dark_palette(), DARK_STYLESHEET),
+        }
+        self.theme = None
+        self.windows = []
+        self._applied = {}  # 窗口 -> 已应用的主题
+        self.switches = 0
+        self.deferred = 0  # 因窗口隐藏而推迟的应用次数
+
+    def add_window(self, window):
+        """注册使用主题样式表的顶层窗口"""
+        self.windows.append(window)
+        window.installEventFilter(self)
+        if self.theme is not None:
+            self._apply_to(window)
+
+    def set_theme(self, theme):
+        if theme == self.theme:
+            return
+        self.theme = theme
+        self.switches += 1
+        QApplication.instance().setPalette(self.themes[theme][0])
+        for window in self.windows:
+            # 从未显示过的窗口还没有应用样式，设置样式表几乎没有开销
+            if window.isVisible() or not window.testAttribute(Qt.WA_WState_Polished):
+                self._apply_to(window)
+            else:
+                self.deferred += 1
+
+    def _apply_to(self, window):
+        if self._applied.get(window) == self.theme:
+            return
+        self._applied[window] = self.theme
+        window.setStyleSheet(self.themes[self.theme][1])
+
+    def eventFilter(self, watched, event):
+        # 显示事件在窗口实际出现之前送达，此时应用推迟的主题不会看到旧样式
+        if event.type() == QEvent.Show and self.theme is not None and self._applied.get(watched) != self.theme:
+            self._apply_to(watched)
+        return False
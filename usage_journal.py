@@ -0,0 +1,312 @@
+import os
+import sys
+import mmap
+import time
+import struct
+import threading
+from collections import deque, Counter
+from brightness_control import (MODE_NORMAL, MODE_HIGH_CONTRAST, MODE_BLUE_LIGHT,
+                                SOURCE_USER, SOURCE_PRESET, SOURCE_SCHEDULE, SOURCE_RULE)
+
+# 文件头：魔数、版本、记录大小，补齐到一条记录的长度
+JOURNAL_MAGIC = b"SBTJRNL\x00"
+JOURNAL_VERSION = 1
+HEADER = struct.Struct("<8sHH4x")
+
+# 定长记录：时间戳(毫秒)、事件、亮度、模式、区域数、色调(r, g, b, a)，共16字节
+RECORD = struct.Struct("<qBBBB4B")
+
+# 事件类型：0-3与brightness_control中的SOURCE_*相同，表示状态变化的来源
+EVENT_START = 0xF0  # 程序启动，之前的会话如果没有正常结束，其最后一段时间不计入
+EVENT_STOP = 0xF1  # 程序退出
+
+EVENT_NAMES = {
+    SOURCE_USER: "user",
+    SOURCE_PRESET: "preset",
+    SOURCE_SCHEDULE: "schedule",
+    SOURCE_RULE: "rule",
+    EVENT_START: "start",
+    EVENT_STOP: "stop",
+}
+
+MODE_CODES = {MODE_NORMAL: 0, MODE_HIGH_CONTRAST: 1, MODE_BLUE_LIGHT: 2}
+MODE_NAMES = {code: mode for mode, code in MODE_CODES.items()}
+
+# 每个文件最多约6.5万条记录，保留24个历史文件
+DEFAULT_MAX_BYTES = 1024 * 1024
+DEFAULT_BACKUPS = 24
+
+# 后台线程写入的间隔（秒）
+FLUSH_INTERVAL = 1.0
+
+NO_TINT = (0, 0, 0, 0)
+
+
+def pack_state(timestamp_ms, event, state):
+    """把渲染状态打包为一条定长记录"""
+    return RECORD.pack(timestamp_ms, event, state.level, MODE_CODES.get(state.mode, 0),
+                       min(255, len(state.areas)), *(state.tint or NO_TINT))
+
+
+class UsageJournal:
+    """只追加的二进制使用记录
+
+    每次状态变化只在内存队列中追加一条16字节的记录（deque.append是原子操作，
+    不加锁），由后台线程定期批量写入文件，不会给set_brightness增加可测的延迟。
+    文件超过max_bytes时轮转为 path.1、path.2 ...
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS,
+                 flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.max_bytes = max(HEADER.size + RECORD.size, max_bytes)
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.records_written = 0
+        self.rotations = 0
+        self._last_state = None
+        self._pending = deque()
+        self._stop = threading.Event()
+        self._active = threading.Event()  # 暂停时后台线程阻塞等待，不再定期唤醒
+        self._active.set()
+        self._file = None
+
+        self._pending.append(RECORD.pack(self._now(), EVENT_START, 0, 0, 0, *NO_TINT))
+        self._thread = threading.Thread(target=self._run, name="usage-journal", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _now():
+        return int(time.time() * 1000)
+
+    def record_state(self, state, source=SOURCE_USER):
+        """记录一次状态变化（BrightnessControl的状态监听者），与上一条相同的状态不记录"""
+        if state == self._last_state:
+            return
+        self._last_state = state
+        self._pending.append(pack_state(self._now(), source, state))
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            if self._stop.wait(self.flush_interval):
+                break
+            self._drain()
+        self._drain()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, RECORD.size))
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+    def _drain(self):
+        """把队列中的记录批量写入文件（在后台线程中调用）"""
+        if not self._pending:
+            return
+        try:
+            if self._file is None:
+                self._open()
+            while self._pending:
+                room = max(1, (self.max_bytes - self._file.tell()) // RECORD.size)
+                batch = []
+                while self._pending and len(batch) < room:
+                    batch.append(self._pending.popleft())
+                self._file.write(b"".join(batch))
+                self.records_written += len(batch)
+                if self._file.tell() >= self.max_bytes:
+                    self._rotate()
+                    self._open()
+            self._file.flush()
+        except OSError:
+            # 磁盘不可写时丢弃记录，不影响亮度调节
+            self._pending.clear()
+
+    def set_suspended(self, suspended):
+        """屏幕休眠或会话锁定时暂停后台线程的定期写入（已排队的记录在恢复或关闭时写入）"""
+        if suspended:
+            self._active.clear()
+        else:
+            self._active.set()
+
+    def close(self):
+        """写入退出记录并等待后台线程写完"""
+        self._pending.append(RECORD.pack(self._now(), EVENT_STOP, 0, 0, 0, *NO_TINT))
+        self._stop.set()
+        self._active.set()
+        self._thread.join()
+
+
+def journal_files(path):
+    """按时间顺序返回记录文件：最旧的历史文件在前，当前文件在最后"""
+    files = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        files.append(f"{path}.{index}")
+        index += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+# 与RECORD相同布局的NumPy结构化类型，用于向量化读取
+RECORD_FIELDS = [("timestamp", "<i8"), ("event", "u1"), ("level", "u1"), ("mode", "u1"),
+                 ("areas", "u1"), ("tint", "u1", (4,))]
+
+
+def _record_count(data, size, path):
+    """检查文件头，返回完整记录的条数（忽略写入中断留下的不完整记录）"""
+    magic, version, record_size = HEADER.unpack_from(data, 0)
+    if magic != JOURNAL_MAGIC or record_size != RECORD.size:
+        raise ValueError(f"不是有效的使用记录文件: {path}")
+    return (size - HEADER.size) // RECORD.size
+
+
+def iter_records(path):
+    """以内存映射方式读取单个记录文件，逐条返回 (时间戳, 事件, 亮度, 模式, 区域数, r, g, b, a)"""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            end = HEADER.size + _record_count(data, size, path) * RECORD.size
+            view = memoryview(data)[HEADER.size:end]
+            try:
+                yield from RECORD.iter_unpack(view)
+            finally:
+                view.release()
+
+
+def read_records(path, np):
+    """以内存映射方式把单个记录文件读为NumPy结构化数组（字段见RECORD_FIELDS）"""
+    dtype = np.dtype(RECORD_FIELDS)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            return np.empty(0, dtype)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            count = _record_count(data, size, path)
+            # 复制出来后才能关闭映射
+            return np.frombuffer(data, dtype, count, HEADER.size).copy()
+
+
+def summarize(path, since=None):
+    """汇总使用记录
+
+    有NumPy时向量化计算，否则逐条统计，两者结果相同。
+
+    Args:
+        path: 当前记录文件路径（历史文件自动包含）
+        since: 只统计该时间（毫秒时间戳）之后的记录
+
+    Returns:
+        {"records", "seconds_at_level", "seconds_in_mode", "changes_by_source", "sessions"}
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return _summarize_records(path, since)
+    return _summarize_arrays(path, since, np)
+
+
+def _summarize_arrays(path, since, np):
+    files = [read_records(file_path, np) for file_path in journal_files(path)]
+    records = np.concatenate(files) if files else np.empty(0, np.dtype(RECORD_FIELDS))
+    if since is not None:
+        records = records[records["timestamp"] >= since]
+
+    timestamps = records["timestamp"]
+    events = records["event"]
+    is_state = (events != EVENT_START) & (events != EVENT_STOP)
+
+    # 每条状态记录一直持续到下一条记录，遇到启动记录（上次会话异常结束）时不计入
+    spans = is_state[:-1] & (events[1:] != EVENT_START)
+    elapsed = np.maximum(0, np.diff(timestamps))[spans] / 1000.0
+    levels = records["level"][:-1][spans]
+    modes = records["mode"][:-1][spans]
+
+    def totals(codes):
+        seen = np.bincount(codes, minlength=256)
+        sums = np.bincount(codes, weights=elapsed, minlength=256)
+        return {int(code): float(sums[code]) for code in np.flatnonzero(seen)}
+
+    changes = np.bincount(events[is_state], minlength=256)
+    return {
+        "records": int(len(records)),
+        "seconds_at_level": totals(levels),
+        "seconds_in_mode": {MODE_NAMES.get(code, code): seconds for code, seconds in totals(modes).items()},
+        "changes_by_source": {EVENT_NAMES.get(int(event), int(event)): int(changes[event])
+                              for event in np.flatnonzero(changes)},
+        "sessions": int(np.count_nonzero(events == EVENT_START)),
+    }
+
+
+def _summarize_records(path, since):
+    """没有NumPy时逐条统计"""
+    seconds_at_level = Counter()
+    seconds_in_mode = Counter()
+    changes_by_source = Counter()
+    records = sessions = 0
+    current = None  # (开始时间, 亮度, 模式)
+
+    for file_path in journal_files(path):
+        for timestamp, event, level, mode, *_ in iter_records(file_path):
+            if since is not None and timestamp < since:
+                continue
+            records += 1
+            if current is not None and event != EVENT_START:
+                elapsed = max(0, timestamp - current[0]) / 1000.0
+                seconds_at_level[current[1]] += elapsed
+                seconds_in_mode[MODE_NAMES.get(current[2], current[2])] += elapsed
+
+            if event == EVENT_START:
+                sessions += 1
+                current = None
+            elif event == EVENT_STOP:
+                current = None
+            else:
+                changes_by_source[EVENT_NAMES.get(event, event)] += 1
+                current = (timestamp, level, mode)
+
+    return {
+        "records": records,
+        "seconds_at_level": dict(seconds_at_level),
+        "seconds_in_mode": dict(seconds_in_mode),
+        "changes_by_source": dict(changes_by_source),
+        "sessions": sessions,
+    }
+
+
+if __name__ == "__main__":
+    # 用法: python usage_journal.py <记录文件路径>
+    start = time.perf_counter()
+    summary = summarize(sys.argv[1])
+    elapsed = (time.perf_counter() - start) * 1000.0
+
+    print(f"记录: {summary['records']}，会话: {summary['sessions']}，汇总耗时 {elapsed:.1f}ms")
+    print("各亮度时长（小时）:")
+    for level, seconds in sorted(summary["seconds_at_level"].items()):
+        print(f"  {level:3d}%  {seconds / 3600.0:8.2f}")
+    print("各模式时长（小时）:")
+    for mode, seconds in sorted(summary["seconds_in_mode"].items()):
+        print(f"  {mode:<14}{seconds / 3600.0:8.2f}")
+    print("状态变化来源:", summary["changes_by_source"])
@@ -0,0 +1,95 @@
+import os
+import platform
+from PyQt5.QtCore import QObject, QSocketNotifier, QTimer
+
+
+class X11Connection(QObject):
+    """共享的X11连接
+
+    通过QSocketNotifier监听X连接的文件描述符，在GUI线程中以事件驱动的方式
+    分发X事件，无需轮询。依赖可选的python-xlib，不可用时instance()返回None。
+    """
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        """获取共享连接，非X11环境或缺少python-xlib时返回None"""
+        if cls._instance is None:
+            if platform.system() != "Linux" or not os.environ.get("DISPLAY"):
+                return None
+            try:
+                cls._instance = cls()
+            except Exception:
+                # 缺少python-xlib或无法连接X服务器
+                return None
+        return cls._instance
+
+    def __init__(self, display_name=None, parent=None):
+        super(X11Connection, self).__init__(parent)
+        from Xlib import display
+
+        self.display = display.Display(display_name)
+        self.root = self.display.screen().root
+        self._root_event_mask = 0
+        self._handlers = {}  # X事件类型 -> 回调列表
+        self._atoms = {}
+
+        self.notifier = QSocketNotifier(self.display.fileno(), QSocketNotifier.Read, self)
+        self.notifier.activated.connect(self.process_events)
+
+    def atom(self, name):
+        """获取（并缓存）X原子"""
+        atom = self._atoms.get(name)
+        if atom is None:
+            atom = self.display.intern_atom(name)
+            self._atoms[name] = atom
+        return atom
+
+    def add_handler(self, event_type, callback):
+        """注册某种X事件的回调"""
+        self._handlers.setdefault(event_type, []).append(callback)
+
+    def remove_handler(self, event_type, callback):
+        """移除X事件回调"""
+        handlers = self._handlers.get(event_type, [])
+        if callback in handlers:
+            handlers.remove(callback)
+
+    def select_root_events(self, event_mask):
+        """在根窗口上追加监听的事件掩码"""
+        if self._root_event_mask & event_mask == event_mask:
+            return
+        self._root_event_mask |= event_mask
+        self.root.change_attributes(event_mask=self._root_event_mask)
+        self.flush()
+
+    def compositor_running(self):
+        """是否有合成管理器在运行（_NET_WM_CM_Sn 选择的所有者存在）"""
+        from Xlib import X
+
+        owner = self.display.get_selection_owner(self.atom(f"_NET_WM_CM_S{self.display.get_default_screen()}"))
+        return owner != X.NONE
+
+    def flush(self):
+        """发送缓冲的请求
+
+        Xlib在等待请求回复时可能已把事件读入内部缓冲区，此时套接字不再可读，
+        因此在事件循环空闲时再处理一次已缓冲的事件。
+        """
+        self.display.flush()
+        QTimer.singleShot(0, self.process_events)
+
+    def process_events(self, *args):
+        """处理所有已到达的X事件"""
+        while self.display.pending_events():
+            event = self.display.next_event()
+            for callback in list(self._handlers.get(event.type, ())):
+                callback(event)
+
+    def close(self):
+        """关闭连接"""
+        self.notifier.setEnabled(False)
+        self.display.close()
+        if X11Connection._instance is self:
+            X11Connection._instance = None